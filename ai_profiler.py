@@ -0,0 +1,110 @@
+import cProfile
+import json
+import os
+import pstats
+import time
+import zlib
+
+# AI_PROFILE=1 turns profiling on at startup; F4 in the hub toggles it
+PROFILE_ENV = 'AI_PROFILE'
+THRESHOLD_ENV = 'AI_PROFILE_THRESHOLD_MS'
+DIRECTORY_ENV = 'AI_PROFILE_DIR'
+DEFAULT_THRESHOLD_MS = 200
+DEFAULT_DIRECTORY = 'profiles'
+
+
+def function_label(func):
+    filename, line, name = func
+    if filename == '~':
+        # Built-ins are reported as ('~', 0, '<built-in method ...>')
+        return name.strip('<>')
+    return f"{os.path.basename(filename)}:{name}:{line}"
+
+
+def collapsed_stacks(stats):
+    """Flame graph lines 'caller;callee;... microseconds' from profile stats.
+
+    cProfile only records caller/callee pairs, so the time of a function
+    called from several places is shared between its callers in proportion
+    to the time each call site spent in it. Recursion is cut at the first
+    repeat of a function on the stack.
+    """
+    entries = stats.stats
+    callees = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            callees.setdefault(caller, []).append((func, cumulative))
+
+    lines = {}
+
+    def walk(func, stack, share):
+        _, _, own_time, cumulative, _ = entries[func]
+        stack = stack + [function_label(func)]
+        microseconds = int(own_time * share * 1e6)
+        if microseconds:
+            key = ';'.join(stack)
+            lines[key] = lines.get(key, 0) + microseconds
+        for callee, edge_time in callees.get(func, ()):
+            if function_label(callee) in stack or not entries[callee][3]:
+                continue
+            walk(callee, stack, share * edge_time / entries[callee][3])
+
+    roots = [func for func, entry in entries.items() if not entry[4]]
+    for root in roots:
+        walk(root, [], 1.0)
+    return [f"{stack} {count}" for stack, count in sorted(lines.items())]
+
+
+class DecisionProfiler:
+    """Profiles AI searches and keeps the ones slower than a threshold.
+
+    Every kept search is written as <game>-<time>-<position hash> with a
+    .prof file for pstats/snakeviz, a .folded file of collapsed stacks for
+    flamegraph.pl or speedscope, and a .json file with the tags.
+    """
+    def __init__(self, enabled=False, threshold_ms=DEFAULT_THRESHOLD_MS, directory=DEFAULT_DIRECTORY):
+        self.enabled = enabled
+        self.threshold = threshold_ms / 1000
+        self.directory = directory
+        self.captured = 0
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        return cls(environ.get(PROFILE_ENV, '') not in ('', '0'),
+                   float(environ.get(THRESHOLD_ENV, DEFAULT_THRESHOLD_MS)),
+                   environ.get(DIRECTORY_ENV, DEFAULT_DIRECTORY))
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        return self.enabled
+
+    def call(self, game, kind, position, function, args):
+        """Run function(*args) under the profiler and return its result"""
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            return function(*args)
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.threshold:
+                self.save(profile, game, kind, position, elapsed)
+
+    def save(self, profile, game, kind, position, elapsed):
+        os.makedirs(self.directory, exist_ok=True)
+        position_text = json.dumps(position, default=str)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        name = f"{game}-{stamp}-{zlib.crc32(position_text.encode()):08x}"
+        path = os.path.join(self.directory, name)
+
+        stats = pstats.Stats(profile)
+        stats.dump_stats(path + '.prof')
+        with open(path + '.folded', 'w') as file:
+            file.write('\n'.join(collapsed_stacks(stats)) + '\n')
+        with open(path + '.json', 'w') as file:
+            json.dump({'game': game, 'kind': kind, 'position': position_text,
+                       'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'elapsed_ms': round(1000 * elapsed, 3)}, file, indent=2)
+        self.captured += 1
+        return path
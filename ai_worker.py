@@ -0,0 +1,240 @@
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+from ai_profiler import DecisionProfiler
+from metrics import AI_MOVE_SECONDS
+
+# Requests the player is waiting on run before pondering
+PRIORITY_MOVE = 0
+PRIORITY_PONDER = 1
+
+# One JSON line per finished search, written once enable_search_log() is called
+log = logging.getLogger('ai_worker')
+SEARCH_LOG_PATH = 'search_stats.log'
+SEARCH_LOG_BYTES = 1024 * 1024
+SEARCH_LOG_BACKUPS = 3
+
+# Searches that raise are logged with their traceback, to stderr unless logging is configured
+error_log = logging.getLogger('ai_errors')
+
+
+def enable_search_log(path=SEARCH_LOG_PATH, max_bytes=SEARCH_LOG_BYTES, backups=SEARCH_LOG_BACKUPS):
+    """Log the stats of every search to a file rolled over at max_bytes"""
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+
+
+class AIRequest:
+    """One search submitted to the AI worker"""
+    def __init__(self, owner_id, key, generation, function, args, priority=PRIORITY_MOVE, owner_name=None,
+                 measured=True):
+        self.owner_id = owner_id
+        self.owner_name = owner_name
+        self.priority = priority
+        self.key = key              # position the search was asked for
+        self.generation = generation
+        self.function = function
+        self.args = args
+        self.result = None
+        self.error = None
+        self.stats = None           # the AI's SearchStats for this search, if it keeps any
+        self.measured = measured    # False for housekeeping work kept out of the metrics and search log
+        self.done = False
+        self.cancelled = False
+        self.submitted_at = time.perf_counter()
+        self.finished_at = None
+
+
+class AIWorker:
+    """Background thread that runs AI searches for every game.
+
+    Games submit a search together with a key for the position it was asked
+    for and poll the returned request from their update(). Cancelling an
+    owner drops its queued and running requests: whatever they return is
+    thrown away. Ponder requests only run when no move request is queued.
+    A search that raises is logged once; asking the same owner for the same
+    key again fails at once until the owner is cancelled, so a game polling
+    every frame does not rerun a failing engine.
+    """
+    def __init__(self):
+        self.requests = queue.PriorityQueue()
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+        self.generations = {}
+        self.thread = None
+        self.active = None
+        # (owner id, key) -> exception of searches that failed
+        self.failed = {}
+        # Opt-in capture of slow searches, see ai_profiler
+        self.profiler = DecisionProfiler.from_env()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="ai-worker", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.requests.put((-1, next(self.sequence), None))
+            self.thread = None
+
+    def submit(self, owner, key, function, *args, priority=PRIORITY_MOVE, measured=True):
+        """Queue function(*args) for owner; the args must be copies of the game state.
+
+        Work that is not a search, such as warming tables up, passes
+        measured=False so it stays out of the move-time metrics.
+        """
+        with self.lock:
+            generation = self.generations.get(id(owner), 0)
+            error = self.failed.get((id(owner), key))
+        request = AIRequest(id(owner), key, generation, function, args, priority, type(owner).__name__, measured)
+        if error is not None:
+            request.error = error
+            request.done = True
+            return request
+        self.start()
+        self.requests.put((priority, next(self.sequence), request))
+        return request
+
+    def cancel(self, owner):
+        """Drop every pending request of owner, e.g. on Reset or Back"""
+        with self.lock:
+            self.generations[id(owner)] = self.generations.get(id(owner), 0) + 1
+            for failed in [failed for failed in self.failed if failed[0] == id(owner)]:
+                del self.failed[failed]
+
+    def cancel_request(self, request):
+        """Drop a single request"""
+        request.cancelled = True
+
+    def is_current(self, request):
+        with self.lock:
+            return request.generation == self.generations.get(request.owner_id, 0)
+
+    def is_busy(self):
+        return self.active is not None or not self.requests.empty()
+
+    def run(self):
+        while True:
+            _, _, request = self.requests.get()
+            if request is None:
+                break
+            if request.cancelled or not self.is_current(request):
+                request.cancelled = True
+                request.done = True
+                continue
+
+            self.active = request
+            started = time.perf_counter()
+            try:
+                if self.profiler.enabled:
+                    request.result = self.profiler.call(request.owner_name, self.kind(request), request.key,
+                                                        request.function, request.args)
+                else:
+                    request.result = request.function(*request.args)
+                # Engines replace their stats object on every search
+                request.stats = getattr(getattr(request.function, '__self__', None), 'stats', None)
+            except Exception as error:
+                request.error = error
+                error_log.exception("%s %s search for %r failed", request.owner_name, self.kind(request), request.key)
+                with self.lock:
+                    self.failed[(request.owner_id, request.key)] = error
+            request.finished_at = time.perf_counter()
+            self.active = None
+            if request.measured:
+                AI_MOVE_SECONDS.observe(request.finished_at - started, game=request.owner_name,
+                                        kind=self.kind(request))
+                if request.stats is not None:
+                    self.log_stats(request)
+
+            if not self.is_current(request):
+                request.cancelled = True
+            request.done = True
+
+    def kind(self, request):
+        return 'move' if request.priority == PRIORITY_MOVE else 'ponder'
+
+    def log_stats(self, request):
+        if not log.isEnabledFor(logging.INFO):
+            return
+        record = {'game': request.owner_name, 'kind': self.kind(request)}
+        record.update(request.stats.as_dict())
+        log.info(json.dumps(record, default=str))
+
+    def take_result(self, request, key):
+        """Return (finished, result) for a polled request.
+
+        A request that was cancelled, failed, or was asked for another
+        position than key comes back finished with a None result.
+        """
+        if not request.done:
+            return False, None
+        if request.cancelled or request.error is not None or request.key != key:
+            return True, None
+        if not self.is_current(request):
+            return True, None
+        return True, request.result
+
+
+class Ponderer:
+    """Searches the AI's answers to likely human replies during the human's turn.
+
+    Answers that finish are kept per reply position, with the search stats
+    that produced them. When the human plays a covered reply the game takes
+    the answer straight away; a reply still being searched is adopted as
+    the game's real request.
+    """
+    def __init__(self, worker, owner):
+        self.worker = worker
+        self.owner = owner
+        self.position = None
+        self.requests = {}
+        self.results = {}
+        self.stats = {}
+
+    def start(self, position, make_replies):
+        """Ponder once per position; make_replies() lists (key, function, args)"""
+        if position == self.position:
+            return
+        self.stop()
+        self.position = position
+        for key, function, args in make_replies():
+            self.requests[key] = self.worker.submit(self.owner, key, function, *args,
+                                                    priority=PRIORITY_PONDER)
+
+    def collect(self):
+        """Move finished ponder searches into the result cache"""
+        for key, request in list(self.requests.items()):
+            finished, result = self.worker.take_result(request, key)
+            if finished:
+                del self.requests[key]
+                if result is not None:
+                    self.results[key] = result
+                    self.stats[key] = request.stats
+
+    def answer(self, key):
+        """Return (True, move) when the reply at key was already searched"""
+        self.collect()
+        if key in self.results:
+            return True, self.results[key]
+        return False, None
+
+    def adopt(self, key):
+        """Hand over a ponder search still running for key, or None"""
+        return self.requests.pop(key, None)
+
+    def stop(self):
+        for request in self.requests.values():
+            self.worker.cancel_request(request)
+        self.requests = {}
+        self.results = {}
+        self.stats = {}
+        self.position = None
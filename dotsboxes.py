@@ -1,191 +1,162 @@
+import time
 import pygame
-import random
+from engines.dots import MCTS_MIN_BOXES, DotsAndBoxesAI
+from ai_worker import AIWorker, Ponderer
+from fonts import render_text
+from game_log import dots_move, dots_values, game_recorder
 
-class DotsAndBoxesAI:
-    def __init__(self, rows=4, cols=4):
-        self.rows = rows
-        self.cols = cols
-        
-    def get_best_move(self, horizontal_lines, vertical_lines, boxes):
-        """Simple AI that prioritizes completing boxes or safe moves"""
-        # First, try to complete any boxes
-        completing_moves = self.find_completing_moves(horizontal_lines, vertical_lines, boxes)
-        if completing_moves:
-            return random.choice(completing_moves)
-        
-        # Then, try to find safe moves (moves that don't give opponent a box)
-        safe_moves = self.find_safe_moves(horizontal_lines, vertical_lines, boxes)
-        if safe_moves:
-            return random.choice(safe_moves)
-        
-        # Otherwise, make any available move
-        all_moves = self.get_all_available_moves(horizontal_lines, vertical_lines)
-        if all_moves:
-            return random.choice(all_moves)
-        
-        return None
-    
-    def find_completing_moves(self, horizontal_lines, vertical_lines, boxes):
-        """Find moves that complete a box"""
-        completing_moves = []
-        
-        for row in range(self.rows):
-            for col in range(self.cols):
-                if boxes[row][col] == 0:  # Empty box
-                    sides = self.count_box_sides(row, col, horizontal_lines, vertical_lines)
-                    if sides == 3:  # One side missing
-                        # Find the missing side
-                        missing_move = self.find_missing_side(row, col, horizontal_lines, vertical_lines)
-                        if missing_move:
-                            completing_moves.append(missing_move)
-        
-        return completing_moves
-    
-    def find_safe_moves(self, horizontal_lines, vertical_lines, boxes):
-        """Find moves that don't create a 3-sided box for opponent"""
-        safe_moves = []
-        all_moves = self.get_all_available_moves(horizontal_lines, vertical_lines)
-        
-        for move in all_moves:
-            if self.is_safe_move(move, horizontal_lines, vertical_lines, boxes):
-                safe_moves.append(move)
-        
-        return safe_moves
-    
-    def is_safe_move(self, move, horizontal_lines, vertical_lines, boxes):
-        """Check if a move doesn't create a 3-sided box"""
-        move_type, row, col = move
-        
-        # Temporarily make the move
-        if move_type == 'horizontal':
-            horizontal_lines[row][col] = True
-        else:
-            vertical_lines[row][col] = True
-        
-        # Check if this creates any 3-sided boxes
-        creates_opportunity = False
-        for box_row in range(self.rows):
-            for box_col in range(self.cols):
-                if boxes[box_row][box_col] == 0:
-                    sides = self.count_box_sides(box_row, box_col, horizontal_lines, vertical_lines)
-                    if sides == 3:
-                        creates_opportunity = True
-                        break
-            if creates_opportunity:
-                break
-        
-        # Undo the move
-        if move_type == 'horizontal':
-            horizontal_lines[row][col] = False
-        else:
-            vertical_lines[row][col] = False
-        
-        return not creates_opportunity
-    
-    def count_box_sides(self, row, col, horizontal_lines, vertical_lines):
-        """Count how many sides of a box are drawn"""
-        sides = 0
-        
-        # Top side
-        if horizontal_lines[row][col]:
-            sides += 1
-        # Bottom side
-        if horizontal_lines[row + 1][col]:
-            sides += 1
-        # Left side
-        if vertical_lines[row][col]:
-            sides += 1
-        # Right side
-        if vertical_lines[row][col + 1]:
-            sides += 1
-        
-        return sides
-    
-    def find_missing_side(self, row, col, horizontal_lines, vertical_lines):
-        """Find which side is missing from a 3-sided box"""
-        if not horizontal_lines[row][col]:
-            return ('horizontal', row, col)
-        if not horizontal_lines[row + 1][col]:
-            return ('horizontal', row + 1, col)
-        if not vertical_lines[row][col]:
-            return ('vertical', row, col)
-        if not vertical_lines[row][col + 1]:
-            return ('vertical', row, col + 1)
-        return None
-    
-    def get_all_available_moves(self, horizontal_lines, vertical_lines):
-        """Get all available moves"""
-        moves = []
-        
-        # Horizontal lines
-        for row in range(self.rows + 1):
-            for col in range(self.cols):
-                if not horizontal_lines[row][col]:
-                    moves.append(('horizontal', row, col))
-        
-        # Vertical lines
-        for row in range(self.rows):
-            for col in range(self.cols + 1):
-                if not vertical_lines[row][col]:
-                    moves.append(('vertical', row, col))
-        
-        return moves
+# Board sizes offered by the Size button (boxes per side)
+BOARD_SIZES = [3, 4, 5, 6, 8, 10, 12, 16, 20]
+
+# Pondering starts once the human has at most this many turn-ending lines
+PONDER_LIMIT = 16
 
 class DotsAndBoxesGame:
-    def __init__(self, screen, colors):
+    def __init__(self, screen, colors, rows=4, cols=4, ai_worker=None):
         self.screen = screen
         self.colors = colors
-        self.ai = DotsAndBoxesAI()
+        self.rows = rows
+        self.cols = cols
+        self.ai = DotsAndBoxesAI(rows, cols)
+        self.ai_worker = ai_worker or AIWorker()
+        self.ai_request = None
+        # Stats of the AI's last decision, shown by the hub's overlay
+        self.search_stats = None
+        self.ponderer = Ponderer(self.ai_worker, self)
+        self.reset_game()
+    
+    def set_board_size(self, rows, cols):
+        """Switch to another board size and start a new game"""
+        self.rows = rows
+        self.cols = cols
+        old_ai = self.ai
+        self.ai = DotsAndBoxesAI(rows, cols)
         self.reset_game()
+        # On the AI worker, so a search still running on the old AI finishes first
+        self.ai_worker.submit(self, 'close', old_ai.close, measured=False)
+    
+    def close(self):
+        """Stop the AI's worker processes when the hub shuts down"""
+        self.cancel_ai()
+        self.ai.close()
     
     def reset_game(self):
-        self.rows = 4
-        self.cols = 4
+        self.cancel_ai()
         self.horizontal_lines = [[False for _ in range(self.cols)] for _ in range(self.rows + 1)]
         self.vertical_lines = [[False for _ in range(self.cols + 1)] for _ in range(self.rows)]
         self.boxes = [[0 for _ in range(self.cols)] for _ in range(self.rows)]
         self.current_player = 1  # 1 = human, 2 = AI
         self.scores = [0, 0]  # [human, AI]
         self.game_over = False
+        self.started_at = time.time()
+        self.record = game_recorder.start_game('dots_and_boxes', self.record_position)
+        self.update_layout()
+        # Rebuilt on the next draw
+        self.board_surface = None
+        self.pending_updates = []
+        self.redraw = True
+    
+    def update_layout(self):
+        """Position the board and size dots and lines for the current board size"""
+        self.board_card_size = 450
+        self.board_card_x = (self.screen.get_width() - self.board_card_size) // 2
+        self.board_card_y = 130
+        
+        self.cell_size = 360 // max(self.rows, self.cols)
+        self.board_width = self.cell_size * self.cols
+        self.board_height = self.cell_size * self.rows
+        self.board_x = self.board_card_x + (self.board_card_size - self.board_width) // 2
+        self.board_y = self.board_card_y + (self.board_card_size - self.board_height) // 2
+        self.dot_radius = max(2, min(8, self.cell_size // 8))
+        self.line_thickness = max(2, min(4, self.cell_size // 12))
+        
+        # Clicks closer than this to a line select it
+        self.click_tolerance = max(4, self.cell_size // 4)
+        self.board_rect = pygame.Rect(self.board_x - self.click_tolerance, self.board_y - self.click_tolerance,
+                                      self.board_width + 2 * self.click_tolerance,
+                                      self.board_height + 2 * self.click_tolerance)
+    
+    def line_at(self, pos):
+        """Find the line under a screen position from its offset within the cell"""
+        if not self.board_rect.collidepoint(pos):
+            return None
+        
+        cell = self.cell_size
+        rel_x = pos[0] - self.board_x
+        rel_y = pos[1] - self.board_y
+        col = min(max(rel_x // cell, 0), self.cols - 1)
+        row = min(max(rel_y // cell, 0), self.rows - 1)
+        offset_x = rel_x - col * cell
+        offset_y = rel_y - row * cell
+        
+        # Nearest side of the cell
+        distance, move = min(
+            (abs(offset_y), ('horizontal', row, col)),
+            (abs(cell - offset_y), ('horizontal', row + 1, col)),
+            (abs(offset_x), ('vertical', row, col)),
+            (abs(cell - offset_x), ('vertical', row, col + 1)),
+        )
+        if distance > self.click_tolerance:
+            return None
+        return move
+    
+    def is_line_drawn(self, move_type, row, col):
+        if move_type == 'horizontal':
+            return self.horizontal_lines[row][col]
+        return self.vertical_lines[row][col]
+    
+    def line_endpoints(self, move_type, row, col):
+        """Screen coordinates of a line, stopping at the edge of the dots"""
+        x = self.board_x + col * self.cell_size
+        y = self.board_y + row * self.cell_size
+        if move_type == 'horizontal':
+            return (x + self.dot_radius, y), (x + self.cell_size - self.dot_radius, y)
+        return (x, y + self.dot_radius), (x, y + self.cell_size - self.dot_radius)
+    
+    def record_position(self):
+        return dots_values(self.rows, self.cols, self.horizontal_lines, self.vertical_lines,
+                           self.boxes, self.current_player)
+    
+    def snapshot(self):
+        """The game as small integers for the session file; the scores follow from the boxes"""
+        return self.record_position() + [int(self.started_at)]
+    
+    def restore(self, values):
+        rows, cols = values[0], values[1]
+        if (rows, cols) != (self.rows, self.cols):
+            self.set_board_size(rows, cols)
+        else:
+            self.reset_game()
+        flags = iter(values[2:])
+        self.horizontal_lines = [[bool(next(flags)) for _ in range(cols)] for _ in range(rows + 1)]
+        self.vertical_lines = [[bool(next(flags)) for _ in range(cols + 1)] for _ in range(rows)]
+        self.boxes = [[next(flags) for _ in range(cols)] for _ in range(rows)]
+        self.current_player = next(flags)
+        self.started_at = next(flags)
+        self.scores = [sum(row.count(1) for row in self.boxes), sum(row.count(2) for row in self.boxes)]
+        self.game_over = self.is_game_over()
+        self.record = game_recorder.start_game('dots_and_boxes', self.record_position)
     
     def handle_click(self, pos):
         if hasattr(self, 'reset_button') and self.reset_button.collidepoint(pos):
             self.reset_game()
             return
         
-        if self.game_over or self.current_player == 2:
+        if hasattr(self, 'size_button') and self.size_button.collidepoint(pos):
+            next_size = BOARD_SIZES[0]
+            for size in BOARD_SIZES:
+                if size > self.rows:
+                    next_size = size
+                    break
+            self.set_board_size(next_size, next_size)
             return
         
-        if not hasattr(self, 'board_rect') or not self.board_rect.collidepoint(pos):
+        if self.game_over or self.current_player == 2:
             return
         
-        # Check horizontal lines
-        for row in range(self.rows + 1):
-            for col in range(self.cols):
-                if not self.horizontal_lines[row][col]:
-                    line_x1 = self.board_x + col * self.cell_size + 8
-                    line_x2 = self.board_x + (col + 1) * self.cell_size - 8
-                    line_y = self.board_y + row * self.cell_size
-                    
-                    line_rect = pygame.Rect(line_x1, line_y - 3, line_x2 - line_x1, 6)
-                    
-                    if line_rect.collidepoint(pos):
-                        self.make_move('horizontal', row, col)
-                        return
-        
-        # Check vertical lines
-        for row in range(self.rows):
-            for col in range(self.cols + 1):
-                if not self.vertical_lines[row][col]:
-                    line_x = self.board_x + col * self.cell_size
-                    line_y1 = self.board_y + row * self.cell_size + 8
-                    line_y2 = self.board_y + (row + 1) * self.cell_size - 8
-                    
-                    line_rect = pygame.Rect(line_x - 3, line_y1, 6, line_y2 - line_y1)
-                    
-                    if line_rect.collidepoint(pos):
-                        self.make_move('vertical', row, col)
-                        return
+        move = self.line_at(pos)
+        if move and not self.is_line_drawn(*move):
+            self.make_move(*move)
     
     def make_move(self, move_type, row, col):
         """Make a move in dots and boxes"""
@@ -193,9 +164,10 @@ class DotsAndBoxesGame:
             self.horizontal_lines[row][col] = True
         else:
             self.vertical_lines[row][col] = True
+        self.pending_updates.append(('line', move_type, row, col))
         
         # Check for completed boxes
-        boxes_completed = self.check_completed_boxes()
+        boxes_completed = self.check_completed_boxes(move_type, row, col)
         
         if boxes_completed > 0:
             self.scores[self.current_player - 1] += boxes_completed
@@ -203,148 +175,231 @@ class DotsAndBoxesGame:
         else:
             # Switch players
             self.current_player = 2 if self.current_player == 1 else 1
+        self.record.move(dots_move(self.rows, self.cols, move_type, row, col))
         
         # Check if game is over
         if self.is_game_over():
             self.game_over = True
     
-    def check_completed_boxes(self):
-        """Check for newly completed boxes and mark them"""
-        completed = 0
+    def check_completed_boxes(self, move_type, row, col):
+        """Check the boxes on either side of a new line and mark completed ones"""
+        if move_type == 'horizontal':
+            neighbours = [(row - 1, col), (row, col)]
+        else:
+            neighbours = [(row, col - 1), (row, col)]
         
-        for row in range(self.rows):
-            for col in range(self.cols):
-                if self.boxes[row][col] == 0:  # Empty box
-                    # Check if all four sides are drawn
-                    if (self.horizontal_lines[row][col] and 
-                        self.horizontal_lines[row + 1][col] and
-                        self.vertical_lines[row][col] and 
-                        self.vertical_lines[row][col + 1]):
-                        
-                        self.boxes[row][col] = self.current_player
-                        completed += 1
+        completed = 0
+        for box_row, box_col in neighbours:
+            if not (0 <= box_row < self.rows and 0 <= box_col < self.cols):
+                continue
+            if self.boxes[box_row][box_col] == 0:  # Empty box
+                # Check if all four sides are drawn
+                if (self.horizontal_lines[box_row][box_col] and 
+                    self.horizontal_lines[box_row + 1][box_col] and
+                    self.vertical_lines[box_row][box_col] and 
+                    self.vertical_lines[box_row][box_col + 1]):
+                    
+                    self.boxes[box_row][box_col] = self.current_player
+                    self.pending_updates.append(('box', box_row, box_col))
+                    completed += 1
         
         return completed
     
     def is_game_over(self):
         """Check if all boxes are completed"""
-        for row in range(self.rows):
-            for col in range(self.cols):
-                if self.boxes[row][col] == 0:
-                    return False
-        return True
+        return sum(self.scores) == self.rows * self.cols
+    
+    def cancel_ai(self):
+        """Drop the AI search in progress, if any"""
+        self.ai_worker.cancel(self)
+        self.ai_request = None
+        self.ponderer.stop()
+    
+    def is_ai_thinking(self):
+        return self.ai_request is not None
+    
+    def position_key(self, horizontal_lines=None, vertical_lines=None):
+        horizontal_lines = horizontal_lines or self.horizontal_lines
+        vertical_lines = vertical_lines or self.vertical_lines
+        return (self.rows, self.cols,
+                tuple(tuple(row) for row in horizontal_lines),
+                tuple(tuple(row) for row in vertical_lines))
+    
+    def hover_rects(self):
+        """Screen areas whose look depends on the mouse position"""
+        if not hasattr(self, 'reset_button'):
+            return []
+        return [self.board_rect.inflate(2 * self.dot_radius, 2 * self.dot_radius),
+                self.reset_button, self.size_button]
+    
+    def animation_rects(self):
+        return []
+    
+    def likely_replies(self):
+        """Searches for the AI's answer to every line that ends the human's turn.
+
+        Lines that complete a box are skipped since the human moves again.
+        Nothing is pondered while more than PONDER_LIMIT such lines are left,
+        nor on boards large enough for MCTS, where every answer takes a
+        search of about a second.
+        """
+        if self.rows * self.cols >= MCTS_MIN_BOXES:
+            return []
+        replies = []
+        for move_type, row, col in self.ai.get_all_available_moves(self.horizontal_lines, self.vertical_lines):
+            horizontal_lines = [line[:] for line in self.horizontal_lines]
+            vertical_lines = [line[:] for line in self.vertical_lines]
+            if move_type == 'horizontal':
+                horizontal_lines[row][col] = True
+                neighbours = [(row - 1, col), (row, col)]
+            else:
+                vertical_lines[row][col] = True
+                neighbours = [(row, col - 1), (row, col)]
+            
+            completes_box = any(
+                0 <= box_row < self.rows and 0 <= box_col < self.cols and
+                self.ai.count_box_sides(box_row, box_col, horizontal_lines, vertical_lines) == 4
+                for box_row, box_col in neighbours
+            )
+            if completes_box:
+                continue
+            
+            key = self.position_key(horizontal_lines, vertical_lines)
+            boxes = [line[:] for line in self.boxes]
+            replies.append((key, self.ai.get_best_move, (horizontal_lines, vertical_lines, boxes)))
+            if len(replies) > PONDER_LIMIT:
+                return []
+        return replies
     
     def update(self):
         """Update dots and boxes AI logic"""
+        if self.current_player == 1 and not self.game_over:
+            # Ponder while the human decides
+            self.ponderer.start(self.position_key(), self.likely_replies)
+            self.ponderer.collect()
+        
         if self.current_player == 2 and not self.game_over:
-            # AI move
-            best_move = self.ai.get_best_move(
-                self.horizontal_lines, self.vertical_lines, self.boxes
-            )
+            # AI move, searched on the background worker
+            key = self.position_key()
+            if self.ai_request is None:
+                # Answer at once if this reply was pondered, else reuse its running search
+                found, best_move = self.ponderer.answer(key)
+                if found:
+                    self.search_stats = self.ponderer.stats.get(key)
+                else:
+                    self.ai_request = self.ponderer.adopt(key) or self.ai_worker.submit(
+                        self, key, self.ai.get_best_move,
+                        [row[:] for row in self.horizontal_lines],
+                        [row[:] for row in self.vertical_lines],
+                        [row[:] for row in self.boxes]
+                    )
+                self.ponderer.stop()
+                if not found:
+                    return
+            else:
+                finished, best_move = self.ai_worker.take_result(self.ai_request, key)
+                if not finished:
+                    return
+                if best_move is not None:
+                    self.search_stats = self.ai_request.stats
+                self.ai_request = None
+            self.redraw = True
             
             if best_move:
                 move_type, row, col = best_move
                 self.make_move(move_type, row, col)
     
+    def build_board_surface(self):
+        """Start a fresh board surface with the dots, queueing every drawn line and box"""
+        pad = self.dot_radius
+        self.board_surface = pygame.Surface((self.board_width + 2 * pad, self.board_height + 2 * pad))
+        self.board_surface.fill(self.colors['card_bg'])
+        self.board_surface_pos = (self.board_x - pad, self.board_y - pad)
+        
+        for row in range(self.rows + 1):
+            for col in range(self.cols + 1):
+                dot_pos = (pad + col * self.cell_size, pad + row * self.cell_size)
+                pygame.draw.circle(self.board_surface, self.colors['text_primary'], dot_pos, self.dot_radius)
+        
+        self.pending_updates = []
+        for row in range(self.rows + 1):
+            for col in range(self.cols):
+                if self.horizontal_lines[row][col]:
+                    self.pending_updates.append(('line', 'horizontal', row, col))
+        for row in range(self.rows):
+            for col in range(self.cols + 1):
+                if self.vertical_lines[row][col]:
+                    self.pending_updates.append(('line', 'vertical', row, col))
+        for row in range(self.rows):
+            for col in range(self.cols):
+                if self.boxes[row][col]:
+                    self.pending_updates.append(('box', row, col))
+    
+    def apply_board_updates(self, caption_font):
+        """Draw newly placed lines and captured boxes onto the board surface"""
+        surface_x, surface_y = self.board_surface_pos
+        
+        for update in self.pending_updates:
+            if update[0] == 'line':
+                start, end = self.line_endpoints(*update[1:])
+                start = (start[0] - surface_x, start[1] - surface_y)
+                end = (end[0] - surface_x, end[1] - surface_y)
+                pygame.draw.line(self.board_surface, self.colors['accent_purple'], start, end, self.line_thickness)
+                # Rounded ends
+                pygame.draw.circle(self.board_surface, self.colors['accent_purple'], start, self.line_thickness // 2)
+                pygame.draw.circle(self.board_surface, self.colors['accent_purple'], end, self.line_thickness // 2)
+            else:
+                _, row, col = update
+                box_size = self.cell_size - 2 * self.dot_radius
+                box_rect = pygame.Rect(self.board_x + col * self.cell_size + self.dot_radius - surface_x,
+                                       self.board_y + row * self.cell_size + self.dot_radius - surface_y,
+                                       box_size, box_size)
+                
+                if self.boxes[row][col] == 1:  # Human box
+                    box_color, label, label_color = (255, 150, 150), "P", (200, 0, 0)
+                else:  # AI box
+                    box_color, label, label_color = (150, 150, 255), "AI", (0, 0, 200)
+                pygame.draw.rect(self.board_surface, box_color, box_rect, border_radius=min(8, box_size // 4))
+                
+                # Label only when it fits in the box
+                text = render_text(caption_font, label, label_color)
+                if text.get_width() < box_size and text.get_height() < box_size:
+                    text_rect = text.get_rect(center=box_rect.center)
+                    self.board_surface.blit(text, text_rect)
+        
+        self.pending_updates = []
+    
     def draw(self, mouse_pos, body_font, title_font, subheading_font, caption_font):
         # Title
-        title_surface = title_font.render("Dots and Boxes", True, self.colors['text_white'])
+        title_surface = render_text(title_font, "Dots and Boxes", self.colors['text_white'])
         title_rect = title_surface.get_rect(centerx=self.screen.get_width() // 2, y=50)
         self.screen.blit(title_surface, title_rect)
         
         # Subtitle with scores
-        subtitle_surface = body_font.render(f"Strategic AI | Player: {self.scores[0]} | AI: {self.scores[1]}", True, self.colors['text_white'])
+        subtitle_surface = render_text(body_font, f"Strategic AI | Player: {self.scores[0]} | AI: {self.scores[1]}", self.colors['text_white'])
         subtitle_rect = subtitle_surface.get_rect(centerx=self.screen.get_width() // 2, y=90)
         self.screen.blit(subtitle_surface, subtitle_rect)
         
         # Game board card with rounded corners
-        board_card_size = 450
-        board_card_x = (self.screen.get_width() - board_card_size) // 2
-        board_card_y = 130
-        board_card_rect = pygame.Rect(board_card_x, board_card_y, board_card_size, board_card_size)
-        
+        board_card_rect = pygame.Rect(self.board_card_x, self.board_card_y, self.board_card_size, self.board_card_size)
         pygame.draw.rect(self.screen, self.colors['card_bg'], board_card_rect, border_radius=30)
         
-        # Game board
-        board_size = 360
-        board_x = board_card_x + (board_card_size - board_size) // 2
-        board_y = board_card_y + (board_card_size - board_size) // 2
-        cell_size = board_size // self.cols
-        dot_radius = 8
-        line_thickness = 4
+        # Dots, lines and boxes are kept on one surface that only changes when a line is placed
+        if self.board_surface is None:
+            self.build_board_surface()
+        if self.pending_updates:
+            self.apply_board_updates(caption_font)
+        self.screen.blit(self.board_surface, self.board_surface_pos)
         
-        # Draw boxes
-        for row in range(self.rows):
-            for col in range(self.cols):
-                box_x = board_x + col * cell_size + dot_radius
-                box_y = board_y + row * cell_size + dot_radius
-                box_size = cell_size - 2 * dot_radius
-                box_rect = pygame.Rect(box_x, box_y, box_size, box_size)
-                
-                if self.boxes[row][col] == 1:  # Human box
-                # Light red with slight transparency
-                 pygame.draw.rect(self.screen, (255, 150, 150, 150), box_rect, border_radius=8)
-                 text = caption_font.render("P", True, (200, 0, 0))  # Dark red text for contrast
-                 text_rect = text.get_rect(center=box_rect.center)
-                 self.screen.blit(text, text_rect)
-                elif self.boxes[row][col] == 2:  # AI box
-    # Light blue with slight transparency
-                 pygame.draw.rect(self.screen, (150, 150, 255, 150), box_rect, border_radius=8)
-                 text = caption_font.render("AI", True, (0, 0, 200))  # Dark blue text for contrast
-                 text_rect = text.get_rect(center=box_rect.center)
-                 self.screen.blit(text, text_rect)
-        # Draw dots
-        for row in range(self.rows + 1):
-            for col in range(self.cols + 1):
-                dot_x = board_x + col * cell_size
-                dot_y = board_y + row * cell_size
-                pygame.draw.circle(self.screen, self.colors['text_primary'], (dot_x, dot_y), dot_radius)
-        
-        # Draw lines with rounded ends
-        for row in range(self.rows + 1):
-            for col in range(self.cols):
-                line_x1 = board_x + col * cell_size + dot_radius
-                line_x2 = board_x + (col + 1) * cell_size - dot_radius
-                line_y = board_y + row * cell_size
-                
-                line_rect = pygame.Rect(line_x1, line_y - line_thickness // 2, 
-                                      line_x2 - line_x1, line_thickness)
-                
-                is_hovered = line_rect.collidepoint(mouse_pos) and not self.horizontal_lines[row][col]
-                
-                if self.horizontal_lines[row][col]:
-                    pygame.draw.line(self.screen, self.colors['accent_purple'], 
-                                   (line_x1, line_y), (line_x2, line_y), line_thickness)
-                    # Rounded ends
-                    pygame.draw.circle(self.screen, self.colors['accent_purple'], (line_x1, line_y), line_thickness//2)
-                    pygame.draw.circle(self.screen, self.colors['accent_purple'], (line_x2, line_y), line_thickness//2)
-                elif is_hovered and not self.game_over and self.current_player == 1:
-                    pygame.draw.line(self.screen, (200, 200, 200), 
-                                   (line_x1, line_y), (line_x2, line_y), line_thickness)
-        
-        for row in range(self.rows):
-            for col in range(self.cols + 1):
-                line_x = board_x + col * cell_size
-                line_y1 = board_y + row * cell_size + dot_radius
-                line_y2 = board_y + (row + 1) * cell_size - dot_radius
-                
-                line_rect = pygame.Rect(line_x - line_thickness // 2, line_y1, 
-                                      line_thickness, line_y2 - line_y1)
-                
-                is_hovered = line_rect.collidepoint(mouse_pos) and not self.vertical_lines[row][col]
-                
-                if self.vertical_lines[row][col]:
-                    pygame.draw.line(self.screen, self.colors['accent_purple'], 
-                                   (line_x, line_y1), (line_x, line_y2), line_thickness)
-                    # Rounded ends
-                    pygame.draw.circle(self.screen, self.colors['accent_purple'], (line_x, line_y1), line_thickness//2)
-                    pygame.draw.circle(self.screen, self.colors['accent_purple'], (line_x, line_y2), line_thickness//2)
-                elif is_hovered and not self.game_over and self.current_player == 1:
-                    pygame.draw.line(self.screen, (200, 200, 200), 
-                                   (line_x, line_y1), (line_x, line_y2), line_thickness)
+        # Hovered line preview
+        if not self.game_over and self.current_player == 1:
+            hovered = self.line_at(mouse_pos)
+            if hovered and not self.is_line_drawn(*hovered):
+                start, end = self.line_endpoints(*hovered)
+                pygame.draw.line(self.screen, (200, 200, 200), start, end, self.line_thickness)
         
         # Game status
-        status_y = board_card_y + board_card_size + 30
+        status_y = self.board_card_y + self.board_card_size + 30
         if self.game_over:
             if self.scores[0] > self.scores[1]:
                 status = "Congratulations! You Win!"
@@ -363,25 +418,30 @@ class DotsAndBoxesGame:
                 status = "Your turn - Click a line to draw it"
                 status_color = self.colors['text_white']
         
-        status_surface = subheading_font.render(status, True, status_color)
+        status_surface = render_text(subheading_font, status, status_color)
         status_rect = status_surface.get_rect(centerx=self.screen.get_width() // 2, y=status_y)
         self.screen.blit(status_surface, status_rect)
         
-        # Reset button with rounded corners
-        reset_button = pygame.Rect(self.screen.get_width() // 2 - 60, status_y + 50, 120, 40)
+        # Reset and size buttons with rounded corners
+        reset_button = pygame.Rect(self.screen.get_width() // 2 - 130, status_y + 50, 120, 40)
         reset_hovered = reset_button.collidepoint(mouse_pos)
         
         reset_color = self.colors['button_hover'] if reset_hovered else self.colors['button_primary']
         pygame.draw.rect(self.screen, reset_color, reset_button, border_radius=25)
         
-        reset_text = body_font.render("Reset", True, self.colors['text_white'])
+        reset_text = render_text(body_font, "Reset", self.colors['text_white'])
         reset_text_rect = reset_text.get_rect(center=reset_button.center)
         self.screen.blit(reset_text, reset_text_rect)
         
+        size_button = pygame.Rect(self.screen.get_width() // 2 + 10, status_y + 50, 120, 40)
+        size_hovered = size_button.collidepoint(mouse_pos)
+        
+        size_color = self.colors['button_hover'] if size_hovered else self.colors['button_primary']
+        pygame.draw.rect(self.screen, size_color, size_button, border_radius=25)
+        
+        size_text = render_text(body_font, f"Size: {self.rows}x{self.cols}", self.colors['text_white'])
+        size_text_rect = size_text.get_rect(center=size_button.center)
+        self.screen.blit(size_text, size_text_rect)
+        
         self.reset_button = reset_button
-        self.board_rect = pygame.Rect(board_x - 20, board_y - 20, board_size + 40, board_size + 40)
-        self.cell_size = cell_size
-        self.board_x = board_x
-        self.board_y = board_y
-
-print("DotsAndBoxes module loaded successfully!")
\ No newline at end of file
+        self.size_button = size_button
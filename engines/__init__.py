@@ -0,0 +1,2 @@
+# Game AI engines. Nothing in this package imports pygame, so the engines
+# start fast from the command line and can run in worker processes.
@@ -0,0 +1,23 @@
+import importlib
+import sys
+
+# Command name -> engine module; modules are imported only when used
+GAMES = {
+    'tictactoe': 'engines.tictactoe',
+    'connect4': 'engines.connect_four',
+    '2048': 'engines.game2048',
+    'dots': 'engines.dots',
+}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in GAMES:
+        print(f"usage: python -m engines {{{','.join(GAMES)}}} [--position POSITION] [options]")
+        return 2
+    module = importlib.import_module(GAMES[argv[0]])
+    return module.main(argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+
+from engines import connect_four, game2048
+from engines.connect_four import MAX_TABLE_ENTRIES, ConnectFourAI, ConnectFourState
+from engines.game2048 import DIRECTIONS, Game2048AI, Game2048State
+from engines.search import Search
+
+# Binary position files: magic, one game byte, then fixed-size records.
+# Connect Four packs its 42 cells at two bits each, row by row from the
+# top; 2048 packs its 16 tiles as four-bit exponents of two.
+MAGIC = b'POS1'
+GAME_BYTES = {'connect4': 0, '2048': 1}
+RECORD_SIZE = {'connect4': 11, '2048': 8}
+HEADER_SIZE = len(MAGIC) + 1
+
+CHUNK_SIZE = 256
+# Chunks queued per worker; with the chunk size this bounds the memory used
+CHUNKS_PER_WORKER = 2
+
+
+def pack_connect4(board):
+    data = bytearray(RECORD_SIZE['connect4'])
+    for index, cell in enumerate(cell for row in board for cell in row):
+        data[index // 4] |= cell << 2 * (index % 4)
+    return bytes(data)
+
+
+def unpack_connect4(data):
+    cells = [(data[index // 4] >> 2 * (index % 4)) & 3 for index in range(42)]
+    board = [cells[row * 7:row * 7 + 7] for row in range(6)]
+    # Player 1 moves first
+    return board, 1 + sum(1 for cell in cells if cell) % 2
+
+
+def pack_2048(grid):
+    data = bytearray(RECORD_SIZE['2048'])
+    for index, value in enumerate(value for row in grid for value in row):
+        exponent = value.bit_length() - 1 if value else 0
+        if value & (value - 1):
+            raise ValueError(f"{value} is not a power of two")
+        if exponent > 15:
+            raise ValueError("binary 2048 positions hold tiles up to 32768")
+        data[index // 2] |= exponent << 4 * (index % 2)
+    return bytes(data)
+
+
+def unpack_2048(data):
+    exponents = [(data[index // 2] >> 4 * (index % 2)) & 15 for index in range(16)]
+    return [[1 << value if value else 0 for value in exponents[row * 4:row * 4 + 4]] for row in range(4)]
+
+
+def parse_text(game, text):
+    """A position written as in the corpus: Connect Four columns played or 2048 tile values"""
+    if not isinstance(text, str):
+        raise ValueError("a position is a string")
+    if game == 'connect4':
+        return connect_four.parse_position(text)
+    return game2048.parse_position(text)
+
+
+# Worker side: one AI per process, its table kept from chunk to chunk
+
+worker_ais = {}
+
+
+def analyse_position(game, position, depth):
+    """Per-move scores and the best move for the side to move"""
+    ai = worker_ais.get(game)
+    if game == 'connect4':
+        if ai is None:
+            ai = worker_ais[game] = ConnectFourAI()
+        if len(ai.transposition_table) > MAX_TABLE_ENTRIES:
+            ai.transposition_table.clear()
+        board, player = position
+        scores = [None] * ai.cols
+        for col, score in Search(ai.transposition_table).move_scores(ConnectFourState(ai, board, player),
+                                                                      depth or ai.depth):
+            scores[col] = score
+        legal = [col for col in range(ai.cols) if scores[col] is not None]
+        best = max(legal, key=lambda col: scores[col]) if legal else None
+        return {'player': player, 'scores': scores, 'best': best}
+
+    if ai is None:
+        ai = worker_ais[game] = Game2048AI()
+    scores = dict.fromkeys(DIRECTIONS)
+    for (direction, _), score in Search().expectimax_move_scores(Game2048State(ai, position), depth or ai.depth):
+        scores[direction] = round(score, 3)
+    legal = [direction for direction in DIRECTIONS if scores[direction] is not None]
+    best = max(legal, key=lambda direction: scores[direction]) if legal else None
+    return {'scores': scores, 'best': best}
+
+
+def ignore_interrupts():
+    # Ctrl+C stops the parent, which then shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def analyse_chunk(job):
+    """Output lines for one chunk; a position that cannot be read gets an error line"""
+    game, depth, start, kind, payload = job
+    lines = []
+    if kind == 'binary':
+        size = RECORD_SIZE[game]
+        unpack = unpack_connect4 if game == 'connect4' else unpack_2048
+        items = [(None, payload[offset:offset + size]) for offset in range(0, len(payload), size)]
+    else:
+        items = payload
+    for index, (position_id, raw) in enumerate(items, start):
+        result = {'index': index}
+        if position_id is not None:
+            result['id'] = position_id
+        try:
+            position = unpack(raw) if kind == 'binary' else parse_text(game, raw)
+            result.update(analyse_position(game, position, depth))
+        except (ValueError, TypeError) as error:
+            result['error'] = str(error)
+        lines.append(json.dumps(result) + '\n')
+    return ''.join(lines)
+
+
+# Reading: chunks of raw positions from a given position on
+
+def input_kind(path):
+    with open(path, 'rb') as file:
+        return 'binary' if file.read(len(MAGIC)) == MAGIC else 'jsonl'
+
+
+def binary_chunks(path, game, skip, chunk_size):
+    size = RECORD_SIZE[game]
+    with open(path, 'rb') as file:
+        header = file.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise ValueError(f"{path} is not a position file")
+        if header[len(MAGIC)] != GAME_BYTES[game]:
+            raise ValueError(f"{path} does not hold {game} positions")
+        # Fixed-size records, so resuming is a seek
+        file.seek(HEADER_SIZE + skip * size)
+        index = skip
+        while True:
+            payload = file.read(chunk_size * size)
+            if len(payload) < size:
+                return
+            payload = payload[:len(payload) - len(payload) % size]
+            yield index, payload
+            index += len(payload) // size
+
+
+def read_line(line):
+    """(id, position) of a JSONL line; a line that is not JSON has no position"""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None, None
+    if isinstance(record, dict):
+        return record.get('id'), record.get('position')
+    return None, record
+
+
+def jsonl_chunks(path, skip, chunk_size):
+    """Lines are {"position": ..., "id": ...} objects or bare position strings; blank lines are ignored"""
+    index = 0
+    items = []
+    with open(path) as file:
+        for line in file:
+            if not line.strip():
+                continue
+            if index >= skip:
+                items.append(read_line(line))
+                if len(items) == chunk_size:
+                    yield index - len(items) + 1, items
+                    items = []
+            index += 1
+    if items:
+        yield index - len(items), items
+
+
+def completed_output(path):
+    """Whole lines already written and the offset where they end"""
+    count = 0
+    end = 0
+    offset = 0
+    with open(path, 'rb') as file:
+        while True:
+            block = file.read(1 << 20)
+            if not block:
+                break
+            newlines = block.count(b'\n')
+            if newlines:
+                count += newlines
+                end = offset + block.rfind(b'\n') + 1
+            offset += len(block)
+    return count, end
+
+
+def analyse_file(input_path, output_path, game, depth, workers, chunk_size, restart):
+    """Stream positions through the worker pool and append results in input order"""
+    done = 0
+    if not restart and os.path.exists(output_path):
+        done, end = completed_output(output_path)
+        # A line cut short by the interruption is written again
+        with open(output_path, 'r+b') as file:
+            file.truncate(end)
+        if done:
+            print(f"Resuming after {done} positions")
+
+    kind = input_kind(input_path)
+    if kind == 'binary':
+        chunks = binary_chunks(input_path, game, done, chunk_size)
+    else:
+        chunks = jsonl_chunks(input_path, done, chunk_size)
+
+    started = time.perf_counter()
+    analysed = 0
+    with Pool(workers, ignore_interrupts) as pool, open(output_path, 'w' if restart else 'a') as output:
+        in_flight = deque()
+
+        def write_oldest():
+            text = in_flight.popleft().get()
+            output.write(text)
+            output.flush()
+            return text.count('\n')
+
+        for start, payload in chunks:
+            in_flight.append(pool.apply_async(analyse_chunk, ((game, depth, start, kind, payload),)))
+            if len(in_flight) >= CHUNKS_PER_WORKER * workers:
+                analysed += write_oldest()
+        while in_flight:
+            analysed += write_oldest()
+    elapsed = time.perf_counter() - started
+    rate = analysed / elapsed if elapsed else 0.0
+    print(f"Analysed {analysed} positions in {elapsed:.1f} s ({rate:.1f} positions/s); "
+          f"{done + analysed} in {output_path}")
+    return done + analysed
+
+
+def pack_file(input_path, output_path, game):
+    """Convert a JSONL position file to the binary format.
+
+    Records are numbered like the JSONL positions, so a position that
+    cannot be packed stops the conversion with its line number, and the
+    output is only replaced once every position is packed.
+    """
+    pack = pack_connect4 if game == 'connect4' else pack_2048
+    count = 0
+    temporary = output_path + '.tmp'
+    try:
+        with open(input_path) as file, open(temporary, 'wb') as output:
+            output.write(MAGIC + bytes([GAME_BYTES[game]]))
+            for line_number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    position = parse_text(game, read_line(line)[1])
+                    output.write(pack(position[0] if game == 'connect4' else position))
+                except ValueError as error:
+                    raise ValueError(f"{input_path} line {line_number}: {error}") from None
+                count += 1
+        os.replace(temporary, output_path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    print(f"Packed {count} positions into {output_path}")
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='engines.analyse',
+                                     description="Score every move of many Connect Four or 2048 positions")
+    parser.add_argument('input', help="JSONL positions, or a binary file written by --pack")
+    parser.add_argument('output', help="JSONL scores, one line per position in input order")
+    parser.add_argument('--game', choices=list(GAME_BYTES), required=True)
+    parser.add_argument('--depth', type=int, help="search depth (default: the AI's own)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="positions sent to a worker at once")
+    parser.add_argument('--restart', action='store_true', help="overwrite the output instead of resuming it")
+    parser.add_argument('--pack', action='store_true', help="convert JSONL input to the binary format and stop")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.pack:
+            pack_file(args.input, args.output, args.game)
+        else:
+            analyse_file(args.input, args.output, args.game, args.depth, args.workers,
+                         args.chunk_size, args.restart)
+    except (OSError, ValueError) as error:
+        print(error)
+        return 2
+    except KeyboardInterrupt:
+        print(f"Interrupted; run again to resume {args.output}")
+        return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
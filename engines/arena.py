@@ -0,0 +1,289 @@
+import argparse
+import ast
+import json
+import math
+import random
+import sys
+import time
+from multiprocessing import Pool
+
+from engines.connect_four import ConnectFourAI, best_column
+from engines.dots import DotsAndBoxesAI, apply_move, empty_lines, parse_size
+from engines.tictactoe import TicTacToeAI
+
+# Random opening moves played before the AIs take over, so deterministic
+# engines do not replay one game over and over
+OPENING_PLIES = {'tictactoe': 1, 'connect4': 4, 'dots': 6}
+
+# z for two-sided 95% confidence intervals
+Z_95 = 1.96
+
+
+def parse_variant(text):
+    """Variant from 'default', 'random' or key=value,... AI attribute overrides"""
+    if text in ('default', 'random'):
+        return text, {}
+    settings = {}
+    for item in text.split(','):
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise ValueError(f"variant settings look like depth=4,time_limit=0.1, not {item!r}")
+        try:
+            settings[key.strip()] = ast.literal_eval(value.strip())
+        except (ValueError, SyntaxError):
+            settings[key.strip()] = value.strip()
+    return 'ai', settings
+
+
+def make_player(game, variant, size, seed):
+    """Engine for one side with the variant settings applied, or None for random play"""
+    kind, settings = variant
+    if kind == 'random':
+        return None
+    if game == 'tictactoe':
+        ai = TicTacToeAI()
+    elif game == 'connect4':
+        ai = ConnectFourAI()
+    else:
+        ai = DotsAndBoxesAI(*size)
+        if ai.mcts:
+            ai.mcts.random.seed(seed)
+    for key, value in settings.items():
+        if not hasattr(ai, key):
+            raise ValueError(f"{type(ai).__name__} has no setting {key!r}")
+        setattr(ai, key, value)
+    return ai
+
+
+# Game loops. Each takes the two players (index 0 moves first), a seeded
+# random generator and the number of random opening plies, and returns
+# (winner index or None for a draw, plies, think times per side).
+
+def play_tictactoe(players, rng, opening, size):
+    checker = TicTacToeAI()
+    board = [''] * 9
+    marks = ['X', 'O']
+    times = ([], [])
+    side = 0
+    plies = 0
+    while not checker.check_winner(board) and not checker.is_board_full(board):
+        ai = players[side]
+        if plies < opening or ai is None:
+            index = rng.choice([cell for cell in range(9) if not board[cell]])
+        else:
+            # The engine always plays O
+            view = board if side == 1 else [{'X': 'O', 'O': 'X'}.get(cell, '') for cell in board]
+            started = time.perf_counter()
+            index = ai.get_best_move(view)
+            times[side].append(time.perf_counter() - started)
+        board[index] = marks[side]
+        side = 1 - side
+        plies += 1
+    winner = checker.check_winner(board)
+    return (marks.index(winner) if winner else None), plies, times
+
+
+def play_connect4(players, rng, opening, size):
+    checker = ConnectFourAI()
+    board = [[0] * checker.cols for _ in range(checker.rows)]
+    times = ([], [])
+    side = 0
+    plies = 0
+    while not checker.check_winner(board) and not checker.is_board_full(board):
+        ai = players[side]
+        if plies < opening or ai is None:
+            col = rng.choice(checker.get_valid_moves(board))
+        else:
+            started = time.perf_counter()
+            col = best_column(ai, board, side + 1)
+            times[side].append(time.perf_counter() - started)
+        checker.drop_piece(board, checker.get_next_open_row(board, col), col, side + 1)
+        side = 1 - side
+        plies += 1
+    winner = checker.check_winner(board)
+    return (winner - 1 if winner else None), plies, times
+
+
+def play_dots(players, rng, opening, size):
+    rows, cols = size
+    checker = DotsAndBoxesAI(rows, cols)
+    horizontal_lines, vertical_lines = empty_lines(rows, cols)
+    boxes = [[0] * cols for _ in range(rows)]
+    scores = [0, 0]
+    times = ([], [])
+    side = 0
+    plies = 0
+    while sum(scores) < rows * cols:
+        ai = players[side]
+        if plies < opening or ai is None:
+            move = rng.choice(checker.get_all_available_moves(horizontal_lines, vertical_lines))
+        else:
+            # The engine always owns the boxes marked 2
+            view = boxes if side == 1 else [[3 - owner if owner else 0 for owner in row] for row in boxes]
+            started = time.perf_counter()
+            move = ai.get_best_move(horizontal_lines, vertical_lines, view)
+            times[side].append(time.perf_counter() - started)
+        completed = apply_move(checker, horizontal_lines, vertical_lines, boxes, move, side + 1)
+        scores[side] += completed
+        if not completed:
+            side = 1 - side
+        plies += 1
+    winner = None
+    if scores[0] != scores[1]:
+        winner = 0 if scores[0] > scores[1] else 1
+    return winner, plies, times
+
+
+GAMES = {
+    'tictactoe': play_tictactoe,
+    'connect4': play_connect4,
+    'dots': play_dots,
+}
+
+
+def play_game(job):
+    """Play one arena game in a worker process and return its result record"""
+    game, variants, size, index, seed, opening = job
+    # Games come in pairs with the same opening and the sides swapped
+    a_first = index % 2 == 0
+    # Engines that break ties at random use the global generator
+    random.seed(seed)
+    a = make_player(game, variants[0], size, seed)
+    b = make_player(game, variants[1], size, seed)
+    players = (a, b) if a_first else (b, a)
+
+    winner, plies, times = GAMES[game](players, random.Random(seed), opening, size)
+    a_side = 0 if a_first else 1
+    if winner is None:
+        result = 'draw'
+    else:
+        result = 'a' if winner == a_side else 'b'
+    return {
+        'game': index,
+        'seed': seed,
+        'a_first': a_first,
+        'result': result,
+        'plies': plies,
+        'think_a': [round(t, 6) for t in times[a_side]],
+        'think_b': [round(t, 6) for t in times[1 - a_side]],
+    }
+
+
+def jobs(game, variants, size, games, seed, opening):
+    for index in range(games):
+        yield game, variants, size, index, seed + index // 2, opening
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(fraction * len(ordered))) - 1)]
+
+
+def elo_difference(score):
+    """Elo gap implied by an expected score, clamped away from 0 and 1"""
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def think_times(times):
+    """(moves timed, average, p99) of per-move think times"""
+    if not times:
+        return 0, 0.0, 0.0
+    return len(times), sum(times) / len(times), percentile(times, 0.99)
+
+
+def summarize(records):
+    """Win, draw and loss rates for A, its score and Elo with 95% intervals, and think times"""
+    games = len(records)
+    wins = sum(1 for record in records if record['result'] == 'a')
+    draws = sum(1 for record in records if record['result'] == 'draw')
+    losses = games - wins - draws
+    score = (wins + 0.5 * draws) / games if games else 0.5
+    variance = 0.0
+    if games:
+        variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 +
+                    losses * score ** 2) / games
+    margin = Z_95 * math.sqrt(variance / games) if games else 0.5
+    think_a = [t for record in records for t in record['think_a']]
+    think_b = [t for record in records for t in record['think_b']]
+    return {
+        'games': games,
+        'wins': wins,
+        'draws': draws,
+        'losses': losses,
+        'score': score,
+        'score_interval': (max(score - margin, 0.0), min(score + margin, 1.0)),
+        'elo': elo_difference(score),
+        'elo_interval': (elo_difference(score - margin), elo_difference(score + margin)),
+        'think_a': think_times(think_a),
+        'think_b': think_times(think_b),
+    }
+
+
+def format_summary(summary, names):
+    games = summary['games'] or 1
+    low, high = summary['score_interval']
+    elo_low, elo_high = summary['elo_interval']
+    lines = [
+        f"{summary['games']} games: A wins {summary['wins']} ({100 * summary['wins'] / games:.1f}%), "
+        f"draws {summary['draws']} ({100 * summary['draws'] / games:.1f}%), "
+        f"B wins {summary['losses']} ({100 * summary['losses'] / games:.1f}%)",
+        f"A score {summary['score']:.3f} (95% CI {low:.3f} - {high:.3f})",
+        f"A vs B Elo {summary['elo']:+.0f} (95% CI {elo_low:+.0f} - {elo_high:+.0f})",
+    ]
+    for label, name in zip(('a', 'b'), names):
+        moves, average, p99 = summary['think_' + label]
+        if moves:
+            lines.append(f"{label.upper()} ({name}) think time over {moves} moves: "
+                         f"average {1000 * average:.2f} ms, p99 {1000 * p99:.2f} ms")
+    return '\n'.join(lines)
+
+
+def run(game, variants, size, games, seed, opening, workers, output):
+    """Play the tournament over a process pool, streaming records to output"""
+    records = []
+    with open(output, 'w') as stream, Pool(workers) as pool:
+        for record in pool.imap_unordered(play_game, jobs(game, variants, size, games, seed, opening),
+                                          chunksize=4):
+            stream.write(json.dumps(record) + '\n')
+            stream.flush()
+            records.append(record)
+            if len(records) % 100 == 0:
+                print(f"{len(records)}/{games} games", file=sys.stderr)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='engines.arena',
+                                     description="Play two AI variants against each other headlessly")
+    parser.add_argument('game', choices=sorted(GAMES))
+    parser.add_argument('a', help="variant A: default, random, or AI settings like depth=4,time_limit=0.1")
+    parser.add_argument('b', help="variant B, as for A")
+    parser.add_argument('--games', type=int, default=1000, help="games to play, sides alternating")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first pair of games")
+    parser.add_argument('--opening', type=int, default=None, help="random opening plies")
+    parser.add_argument('--size', default='4x4', help="Dots and Boxes board as ROWSxCOLS")
+    parser.add_argument('--output', default='arena_results.jsonl', help="file the game records stream to")
+    args = parser.parse_args(argv)
+
+    try:
+        variants = (parse_variant(args.a), parse_variant(args.b))
+        size = parse_size(args.size)
+        for variant in variants:
+            make_player(args.game, variant, size, args.seed)
+    except ValueError as error:
+        parser.error(str(error))
+    opening = OPENING_PLIES[args.game] if args.opening is None else args.opening
+
+    started = time.perf_counter()
+    records = run(args.game, variants, size, args.games, args.seed, opening, args.workers, args.output)
+    print(format_summary(summarize(records), (args.a, args.b)))
+    print(f"Played in {time.perf_counter() - started:.1f} s, records in {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
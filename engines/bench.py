@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from engines import connect_four, dots, game2048, tictactoe
+from engines.connect_four import ConnectFourAI, ConnectFourState, best_column
+from engines.dots import DotsAndBoxesAI
+from engines.dots_mcts import DotsState
+from engines.game2048 import Game2048AI, Game2048State
+from engines.tictactoe import TicTacToeAI, TicTacToeState
+
+BENCH_DIR = 'benchmarks'
+CORPUS_PATH = os.path.join(BENCH_DIR, 'corpus.json')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+
+# Plies walked by perft from every corpus position
+PERFT_DEPTH = {'tictactoe': 5, 'connect4': 4, '2048': 3, 'dots': 3}
+
+# Summary metrics and whether a larger value is better
+METRICS = {'time_to_move_ms': False, 'nps': True, 'perft_nps': True}
+
+
+def perft(state, depth):
+    """Count the positions reached in depth plies; a chance layer counts as a ply"""
+    if depth == 0 or state.is_terminal():
+        return 1
+    total = 0
+    for move in state.legal_moves():
+        state.apply(move)
+        if hasattr(state, 'chance_outcomes'):
+            total += chance_perft(state, depth - 1)
+        else:
+            total += perft(state, depth - 1)
+        state.undo(move)
+    return total
+
+
+def chance_perft(state, depth):
+    outcomes = state.chance_outcomes()
+    if depth == 0 or not outcomes:
+        return 1
+    total = 0
+    for _, outcome in outcomes:
+        state.apply_chance(outcome)
+        total += perft(state, depth - 1)
+        state.undo_chance(outcome)
+    return total
+
+
+# Per game: load(entry) -> position, search(position) -> (ai, move) with a
+# fresh AI, and state(position) -> protocol state for perft
+
+def load_tictactoe(entry):
+    return tictactoe.parse_position(entry['position'])
+
+
+def search_tictactoe(board):
+    ai = TicTacToeAI()
+    return ai, ai.get_best_move(board[:])
+
+
+def state_tictactoe(board):
+    player = 'X' if board.count('X') == board.count('O') else 'O'
+    return TicTacToeState(board[:], player)
+
+
+def load_connect4(entry):
+    return connect_four.parse_position(entry['position'])
+
+
+def search_connect4(position):
+    board, player = position
+    ai = ConnectFourAI()
+    return ai, best_column(ai, [row[:] for row in board], player)
+
+
+def state_connect4(position):
+    board, player = position
+    return ConnectFourState(ConnectFourAI(), [row[:] for row in board], player)
+
+
+def load_2048(entry):
+    return game2048.parse_position(entry['position'])
+
+
+def search_2048(grid):
+    ai = Game2048AI()
+    return ai, ai.get_best_move([row[:] for row in grid])
+
+
+def state_2048(grid):
+    return Game2048State(Game2048AI(), [row[:] for row in grid])
+
+
+def load_dots(entry):
+    rows, cols = dots.parse_size(entry['size'])
+    horizontal_lines, vertical_lines = dots.parse_position(entry['position'], rows, cols)
+    return rows, cols, horizontal_lines, vertical_lines
+
+
+def search_dots(position):
+    rows, cols, horizontal_lines, vertical_lines = position
+    ai = DotsAndBoxesAI(rows, cols)
+    boxes = [[0] * cols for _ in range(rows)]
+    return ai, ai.get_best_move([row[:] for row in horizontal_lines],
+                                [row[:] for row in vertical_lines], boxes)
+
+
+def state_dots(position):
+    rows, cols, horizontal_lines, vertical_lines = position
+    layout = DotsAndBoxesAI(rows, cols).endgame.layout
+    boxes = [[0] * cols for _ in range(rows)]
+    return DotsState.from_lines(layout, horizontal_lines, vertical_lines, boxes, 2)
+
+
+GAMES = {
+    'tictactoe': (load_tictactoe, search_tictactoe, state_tictactoe),
+    'connect4': (load_connect4, search_connect4, state_connect4),
+    '2048': (load_2048, search_2048, state_2048),
+    'dots': (load_dots, search_dots, state_dots),
+}
+
+
+def bench_position(game, entry, repeat):
+    """Best-of-repeat time to move, search nodes and perft speed for one position"""
+    load, search, make_state = GAMES[game]
+    position = load(entry)
+
+    best_time = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        ai, move = search(position)
+        elapsed = time.perf_counter() - started
+        if best_time is None or elapsed < best_time:
+            best_time = elapsed
+    nodes = ai.stats.nodes
+    if isinstance(move, tuple):
+        # Dots moves, as they read back from JSON
+        move = list(move)
+
+    started = time.perf_counter()
+    perft_nodes = perft(make_state(position), PERFT_DEPTH[game])
+    perft_time = time.perf_counter() - started
+
+    return {
+        'id': entry['id'],
+        'move': move,
+        'time_ms': round(1000 * best_time, 3),
+        'nodes': nodes,
+        'nps': round(nodes / best_time) if best_time else 0,
+        'perft_depth': PERFT_DEPTH[game],
+        'perft_nodes': perft_nodes,
+        'perft_nps': round(perft_nodes / perft_time) if perft_time else 0,
+    }
+
+
+def bench_game(game, entries, repeat):
+    positions = [bench_position(game, entry, repeat) for entry in entries]
+    total_time = sum(position['time_ms'] for position in positions) / 1000
+    total_nodes = sum(position['nodes'] for position in positions)
+    perft_rates = [position['perft_nps'] for position in positions]
+    return {
+        'positions': positions,
+        'time_to_move_ms': round(1000 * total_time / len(positions), 3),
+        'nps': round(total_nodes / total_time) if total_time else 0,
+        'perft_nps': round(sum(perft_rates) / len(perft_rates)),
+    }
+
+
+def run(corpus, games, repeat):
+    results = {
+        'corpus_version': corpus['version'],
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': repeat,
+        'games': {},
+    }
+    for game in games:
+        results['games'][game] = bench_game(game, corpus[game], repeat)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Lines describing every change against the baseline and the list of regressions"""
+    if baseline['corpus_version'] != results['corpus_version']:
+        raise ValueError(f"baseline is for corpus version {baseline['corpus_version']}, "
+                         f"not {results['corpus_version']}")
+    lines = []
+    regressions = []
+    for game, current in results['games'].items():
+        previous = baseline['games'].get(game)
+        if previous is None:
+            lines.append(f"{game}: not in the baseline")
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = previous[metric], current[metric]
+            change = (new - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            line = f"{game} {metric}: {old} -> {new} ({change:+.1%})"
+            if worse > threshold:
+                line += "  REGRESSION"
+                regressions.append(line)
+            lines.append(line)
+
+        # Perft counts are exact; a change means move generation changed
+        old_positions = {position['id']: position for position in previous['positions']}
+        for position in current['positions']:
+            old = old_positions.get(position['id'])
+            if old is None:
+                continue
+            if old['perft_nodes'] != position['perft_nodes']:
+                line = (f"{game} {position['id']}: perft {old['perft_nodes']} -> "
+                        f"{position['perft_nodes']}  MISMATCH")
+                regressions.append(line)
+                lines.append(line)
+            elif old['move'] != position['move']:
+                lines.append(f"{game} {position['id']}: move {old['move']} -> {position['move']}")
+    return lines, regressions
+
+
+def format_results(results):
+    lines = []
+    for game, summary in results['games'].items():
+        lines.append(f"{game}: {summary['time_to_move_ms']:.2f} ms per move, "
+                     f"{summary['nps']} nodes/s, perft {summary['perft_nps']} nodes/s")
+        for position in summary['positions']:
+            lines.append(f"  {position['id']:<28} {position['time_ms']:>10.2f} ms "
+                         f"{position['nodes']:>9} nodes  move {position['move']}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='engines.bench',
+                                     description="Benchmark every AI on the position corpus")
+    parser.add_argument('--games', nargs='+', choices=list(GAMES), default=list(GAMES))
+    parser.add_argument('--repeat', type=int, default=5, help="searches per position, the fastest counts")
+    parser.add_argument('--corpus', default=CORPUS_PATH)
+    parser.add_argument('--output', default='bench_results.json', help="JSON results file")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.3,
+                        help="relative slowdown counted as a regression (default 0.3)")
+    parser.add_argument('--save-baseline', action='store_true', help="write the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    with open(args.corpus) as file:
+        corpus = json.load(file)
+    results = run(corpus, args.games, args.repeat)
+    print(format_results(results))
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    except OSError:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    try:
+        lines, regressions = compare(results, baseline, args.threshold)
+    except ValueError as error:
+        print(error)
+        return 2
+    print('\n'.join(lines))
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+import argparse
+import sys
+
+from engines.search import Search, SearchStats
+
+
+WIN_SCORE = 1000000
+
+# Centre columns first, so alpha-beta finds good moves early
+SEARCH_ORDER = [3, 2, 4, 1, 5, 0, 6]
+
+# Transposition table entries kept between searches before the table is cleared
+MAX_TABLE_ENTRIES = 100000
+
+
+def board_key(board):
+    """Compact hashable key of a board: one byte per cell"""
+    return b''.join(map(bytes, board))
+
+
+class ConnectFourState:
+    """Connect Four position for the shared search; piece 2 is the AI"""
+    def __init__(self, ai, board, player):
+        self.ai = ai
+        self.board = board
+        self.player = player
+        self.rows = len(board)
+        self.cols = len(board[0])
+        self.heights = [sum(1 for row in range(self.rows) if board[row][col]) for col in range(self.cols)]
+        self.moves = sum(self.heights)
+        self.last_won = ai.check_winner(board) != 0
+        self.history = []
+
+    def copy(self):
+        return ConnectFourState(self.ai, [row[:] for row in self.board], self.player)
+
+    def legal_moves(self):
+        return [col for col in SEARCH_ORDER if self.heights[col] < self.rows]
+
+    def apply(self, col):
+        row = self.rows - 1 - self.heights[col]
+        self.board[row][col] = self.player
+        self.heights[col] += 1
+        self.moves += 1
+        self.history.append(self.last_won)
+        self.last_won = self.wins_at(row, col)
+        self.player = 3 - self.player
+
+    def undo(self, col):
+        self.heights[col] -= 1
+        self.board[self.rows - 1 - self.heights[col]][col] = 0
+        self.moves -= 1
+        self.last_won = self.history.pop()
+        self.player = 3 - self.player
+
+    def wins_at(self, row, col):
+        """Whether the piece just placed at (row, col) completes four"""
+        board = self.board
+        piece = board[row][col]
+        for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            count = 1
+            for sign in (1, -1):
+                r, c = row + sign * d_row, col + sign * d_col
+                while 0 <= r < self.rows and 0 <= c < self.cols and board[r][c] == piece:
+                    count += 1
+                    r += sign * d_row
+                    c += sign * d_col
+            if count >= 4:
+                return True
+        return False
+
+    def is_terminal(self):
+        return self.last_won or self.moves == self.rows * self.cols
+
+    def key(self):
+        return board_key(self.board)
+
+    def evaluate(self):
+        """Score for the side to move from the AI-centred board evaluation"""
+        if self.last_won:
+            # The player who just moved won
+            return -WIN_SCORE
+        if self.moves == self.rows * self.cols:
+            return 0
+        score = self.ai.evaluate_board(self.board)
+        return score if self.player == 2 else -score
+
+
+class ConnectFourAI:
+    def __init__(self, depth=5, time_limit=None):
+        self.rows = 6
+        self.cols = 7
+        # Plies searched, counting the AI's move; with a time limit the
+        # search deepens up to this depth until time runs out
+        self.depth = depth
+        self.time_limit = time_limit
+        # (board, depth) -> (value, bound, best move), kept between searches
+        # so pondering warm-starts the real search
+        self.transposition_table = {}
+        self.stats = SearchStats()
+    
+    def board_key(self, board):
+        return board_key(board)
+    
+    def get_best_move(self, board):
+        if len(self.transposition_table) > MAX_TABLE_ENTRIES:
+            self.transposition_table.clear()
+        
+        valid_moves = self.get_valid_moves(board)
+        if not valid_moves:
+            return 3
+        
+        # Check for immediate winning moves
+        for col in valid_moves:
+            row = self.get_next_open_row(board, col)
+            temp_board = [row[:] for row in board]
+            self.drop_piece(temp_board, row, col, 2)
+            if self.check_winner(temp_board) == 2:
+                self.stats = self.forced_move_stats(col)
+                return col
+        
+        # Check for blocking moves
+        for col in valid_moves:
+            row = self.get_next_open_row(board, col)
+            temp_board = [row[:] for row in board]
+            self.drop_piece(temp_board, row, col, 1)
+            if self.check_winner(temp_board) == 1:
+                self.stats = self.forced_move_stats(col)
+                return col
+        
+        # Alpha-beta search for the best strategic move
+        search = Search(self.transposition_table, self.time_limit)
+        best_col, _ = search.best_move(ConnectFourState(self, board, 2), self.depth)
+        self.stats = search.stats
+        return best_col
+    
+    def forced_move_stats(self, col):
+        """Stats for a win or block found without searching"""
+        stats = SearchStats()
+        stats.best_move = col
+        stats.pv = [col]
+        return stats.finish()
+    
+    def get_valid_moves(self, board):
+        return [col for col in range(self.cols) if board[0][col] == 0]
+    
+    def get_next_open_row(self, board, col):
+        for row in range(self.rows - 1, -1, -1):
+            if board[row][col] == 0:
+                return row
+        return -1
+    
+    def drop_piece(self, board, row, col, piece):
+        board[row][col] = piece
+    
+    def check_winner(self, board):
+        # Check horizontal
+        for row in range(self.rows):
+            for col in range(self.cols - 3):
+                if board[row][col] != 0 and board[row][col] == board[row][col+1] == board[row][col+2] == board[row][col+3]:
+                    return board[row][col]
+        
+        # Check vertical
+        for row in range(self.rows - 3):
+            for col in range(self.cols):
+                if board[row][col] != 0 and board[row][col] == board[row+1][col] == board[row+2][col] == board[row+3][col]:
+                    return board[row][col]
+        
+        # Check diagonal (positive slope)
+        for row in range(self.rows - 3):
+            for col in range(self.cols - 3):
+                if board[row][col] != 0 and board[row][col] == board[row+1][col+1] == board[row+2][col+2] == board[row+3][col+3]:
+                    return board[row][col]
+        
+        # Check diagonal (negative slope)
+        for row in range(3, self.rows):
+            for col in range(self.cols - 3):
+                if board[row][col] != 0 and board[row][col] == board[row-1][col+1] == board[row-2][col+2] == board[row-3][col+3]:
+                    return board[row][col]
+        
+        return 0
+    
+    def is_board_full(self, board):
+        return all(board[0][col] != 0 for col in range(self.cols))
+    
+    def evaluate_board(self, board):
+        score = 0
+        
+        # Center column preference
+        center_col = self.cols // 2
+        center_count = sum(1 for row in range(self.rows) if board[row][center_col] == 2)
+        score += center_count * 3
+        
+        # Evaluate windows of 4
+        for row in range(self.rows):
+            for col in range(self.cols - 3):
+                window = [board[row][col+i] for i in range(4)]
+                score += self.evaluate_window(window)
+        
+        return score
+    
+    def evaluate_window(self, window):
+        score = 0
+        ai_count = window.count(2)
+        player_count = window.count(1)
+        empty_count = window.count(0)
+        
+        if ai_count == 4:
+            score += 100
+        elif ai_count == 3 and empty_count == 1:
+            score += 5
+        elif ai_count == 2 and empty_count == 2:
+            score += 2
+        
+        if player_count == 3 and empty_count == 1:
+            score -= 4
+        
+        return score
+
+
+def parse_position(text, ai=None):
+    """Board from the columns played so far (1-7), the human (1) moving first.
+
+    Returns (board, player to move).
+    """
+    ai = ai or ConnectFourAI()
+    board = [[0 for _ in range(ai.cols)] for _ in range(ai.rows)]
+    player = 1
+    for char in text:
+        if char.isspace():
+            continue
+        if char not in '1234567':
+            raise ValueError("a Connect Four position is the columns played, 1-7")
+        col = int(char) - 1
+        row = ai.get_next_open_row(board, col)
+        if row < 0:
+            raise ValueError(f"column {col + 1} is full")
+        ai.drop_piece(board, row, col, player)
+        player = 3 - player
+    return board, player
+
+
+def format_board(board):
+    symbols = {0: '.', 1: 'X', 2: 'O'}
+    rows = [' '.join(symbols[cell] for cell in row) for row in board]
+    rows.append(' '.join(str(col + 1) for col in range(len(board[0]))))
+    return '\n'.join(rows)
+
+
+def best_column(ai, board, player):
+    """Best column for player; the AI always searches as piece 2"""
+    if player == 1:
+        board = [[3 - cell if cell else 0 for cell in row] for row in board]
+    return ai.get_best_move(board)
+
+
+def play(ai):
+    """Play as X (player 1) against the AI in the terminal"""
+    board = [[0 for _ in range(ai.cols)] for _ in range(ai.rows)]
+    player = 1
+    while not ai.check_winner(board) and not ai.is_board_full(board):
+        if player == 1:
+            print(format_board(board))
+            try:
+                col = int(input("Your column (1-7): ")) - 1
+            except ValueError:
+                continue
+            if col not in ai.get_valid_moves(board):
+                continue
+        else:
+            col = ai.get_best_move(board)
+            print(f"AI plays {col + 1}")
+        ai.drop_piece(board, ai.get_next_open_row(board, col), col, player)
+        player = 3 - player
+
+    print(format_board(board))
+    winner = ai.check_winner(board)
+    print({1: "You win!", 2: "AI wins!"}.get(winner, "It's a draw!"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='engines connect4',
+                                     description="Play Connect Four against the AI or ask for its move")
+    parser.add_argument('--position', help="columns played so far (1-7), first player first; "
+                                           "prints the best column for the side to move")
+    args = parser.parse_args(argv)
+
+    ai = ConnectFourAI()
+    if args.position is None:
+        try:
+            play(ai)
+        except (EOFError, KeyboardInterrupt):
+            print()
+        return 0
+    try:
+        board, player = parse_position(args.position, ai)
+    except ValueError as error:
+        parser.error(str(error))
+    if ai.check_winner(board) or ai.is_board_full(board):
+        print("none")
+        return 0
+    print(best_column(ai, board, player) + 1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+import argparse
+import random
+import sys
+
+from engines.dots_endgame import DotsAndBoxesEndgame, DotsBoxesLayout
+from engines.dots_tablebase import DotsTablebase
+from engines.dots_mcts import DotsAndBoxesMCTS, DotsState
+from engines.search import Search, SearchStats
+
+# Boards with at least this many boxes are played by MCTS before the endgame
+MCTS_MIN_BOXES = 25
+
+# Positions with at most this many free edges are searched exactly
+EXACT_SEARCH_EDGES = 12
+
+# Seconds the chain and loop endgame solver may search before playing its
+# cheap fallback move; on large boards its node limit alone takes far longer
+ENDGAME_TIME_LIMIT = 1.0
+
+class DotsAndBoxesAI:
+    def __init__(self, rows=4, cols=4, mcts_workers=1):
+        self.rows = rows
+        self.cols = cols
+        self.endgame = DotsAndBoxesEndgame(rows, cols, time_limit=ENDGAME_TIME_LIMIT)
+        # Solved small boards are looked up directly (None if not generated)
+        self.tablebase = DotsTablebase.open(rows, cols)
+        self.mcts = None
+        if rows * cols >= MCTS_MIN_BOXES:
+            self.mcts = DotsAndBoxesMCTS(rows, cols, playouts=2000, time_limit=1.0,
+                                         workers=mcts_workers)
+        # Free edges at or below which the AI searches to the end
+        self.exact_search_edges = EXACT_SEARCH_EDGES
+        self.stats = SearchStats()
+    
+    def warm_up(self):
+        """Page the tablebase in before the first game needs it"""
+        if self.tablebase:
+            self.tablebase.prefetch()
+    
+    def close(self):
+        """Stop the MCTS worker processes, if any"""
+        if self.mcts:
+            self.mcts.close()
+        
+    def get_best_move(self, horizontal_lines, vertical_lines, boxes):
+        """The tablebase move on solved boards, else the exact chain and loop endgame,
+        a full search when few edges are left, MCTS on large boards, and finally
+        completing boxes or safe moves"""
+        move = self.choose_move(horizontal_lines, vertical_lines, boxes)
+        self.stats.best_move = move
+        if not self.stats.pv and move:
+            self.stats.pv = [move]
+        self.stats.finish()
+        return move
+    
+    def choose_move(self, horizontal_lines, vertical_lines, boxes):
+        self.stats = SearchStats()
+        
+        # Perfect play from the tablebase when this board size is solved
+        if self.tablebase:
+            self.stats.nodes = 1
+            return self.tablebase.get_best_move(horizontal_lines, vertical_lines)
+        
+        # Once no safe moves are left, play the chains and loops exactly
+        endgame_move = self.endgame.get_best_move(horizontal_lines, vertical_lines)
+        if endgame_move:
+            self.stats.nodes = self.endgame.nodes
+            return endgame_move
+        
+        # Few edges left: search every move to the end of the game
+        state = DotsState.from_lines(self.endgame.layout, horizontal_lines, vertical_lines, boxes, 2)
+        if 0 < state.free <= self.exact_search_edges:
+            search = Search()
+            edge, _ = search.best_move(state, state.free)
+            self.stats = search.stats
+            self.stats.pv = [self.endgame.layout.edge_to_move(pv_edge) for pv_edge in self.stats.pv]
+            return self.endgame.layout.edge_to_move(edge)
+        
+        # Large boards are out of reach for exact search
+        if self.mcts:
+            move = self.mcts.get_best_move(horizontal_lines, vertical_lines, boxes)
+            self.stats.nodes = self.mcts.last_playouts
+            return move
+        
+        # First, try to complete any boxes
+        completing_moves = self.find_completing_moves(horizontal_lines, vertical_lines, boxes)
+        if completing_moves:
+            return random.choice(completing_moves)
+        
+        # Then, try to find safe moves (moves that don't give opponent a box)
+        safe_moves = self.find_safe_moves(horizontal_lines, vertical_lines, boxes)
+        if safe_moves:
+            return random.choice(safe_moves)
+        
+        # Otherwise, make any available move
+        all_moves = self.get_all_available_moves(horizontal_lines, vertical_lines)
+        if all_moves:
+            return random.choice(all_moves)
+        
+        return None
+    
+    def find_completing_moves(self, horizontal_lines, vertical_lines, boxes):
+        """Find moves that complete a box"""
+        completing_moves = []
+        
+        for row in range(self.rows):
+            for col in range(self.cols):
+                if boxes[row][col] == 0:  # Empty box
+                    sides = self.count_box_sides(row, col, horizontal_lines, vertical_lines)
+                    if sides == 3:  # One side missing
+                        # Find the missing side
+                        missing_move = self.find_missing_side(row, col, horizontal_lines, vertical_lines)
+                        if missing_move:
+                            completing_moves.append(missing_move)
+        
+        return completing_moves
+    
+    def find_safe_moves(self, horizontal_lines, vertical_lines, boxes):
+        """Find moves that don't create a 3-sided box for opponent"""
+        safe_moves = []
+        all_moves = self.get_all_available_moves(horizontal_lines, vertical_lines)
+        
+        for move in all_moves:
+            if self.is_safe_move(move, horizontal_lines, vertical_lines, boxes):
+                safe_moves.append(move)
+        
+        return safe_moves
+    
+    def is_safe_move(self, move, horizontal_lines, vertical_lines, boxes):
+        """Check if a move doesn't create a 3-sided box"""
+        move_type, row, col = move
+        
+        # Temporarily make the move
+        if move_type == 'horizontal':
+            horizontal_lines[row][col] = True
+        else:
+            vertical_lines[row][col] = True
+        
+        # Check if this creates any 3-sided boxes
+        creates_opportunity = False
+        for box_row in range(self.rows):
+            for box_col in range(self.cols):
+                if boxes[box_row][box_col] == 0:
+                    sides = self.count_box_sides(box_row, box_col, horizontal_lines, vertical_lines)
+                    if sides == 3:
+                        creates_opportunity = True
+                        break
+            if creates_opportunity:
+                break
+        
+        # Undo the move
+        if move_type == 'horizontal':
+            horizontal_lines[row][col] = False
+        else:
+            vertical_lines[row][col] = False
+        
+        return not creates_opportunity
+    
+    def count_box_sides(self, row, col, horizontal_lines, vertical_lines):
+        """Count how many sides of a box are drawn"""
+        sides = 0
+        
+        # Top side
+        if horizontal_lines[row][col]:
+            sides += 1
+        # Bottom side
+        if horizontal_lines[row + 1][col]:
+            sides += 1
+        # Left side
+        if vertical_lines[row][col]:
+            sides += 1
+        # Right side
+        if vertical_lines[row][col + 1]:
+            sides += 1
+        
+        return sides
+    
+    def find_missing_side(self, row, col, horizontal_lines, vertical_lines):
+        """Find which side is missing from a 3-sided box"""
+        if not horizontal_lines[row][col]:
+            return ('horizontal', row, col)
+        if not horizontal_lines[row + 1][col]:
+            return ('horizontal', row + 1, col)
+        if not vertical_lines[row][col]:
+            return ('vertical', row, col)
+        if not vertical_lines[row][col + 1]:
+            return ('vertical', row, col + 1)
+        return None
+    
+    def get_all_available_moves(self, horizontal_lines, vertical_lines):
+        """Get all available moves"""
+        moves = []
+        
+        # Horizontal lines
+        for row in range(self.rows + 1):
+            for col in range(self.cols):
+                if not horizontal_lines[row][col]:
+                    moves.append(('horizontal', row, col))
+        
+        # Vertical lines
+        for row in range(self.rows):
+            for col in range(self.cols + 1):
+                if not vertical_lines[row][col]:
+                    moves.append(('vertical', row, col))
+        
+        return moves
+
+
+def empty_lines(rows, cols):
+    horizontal_lines = [[False for _ in range(cols)] for _ in range(rows + 1)]
+    vertical_lines = [[False for _ in range(cols + 1)] for _ in range(rows)]
+    return horizontal_lines, vertical_lines
+
+
+def parse_size(text):
+    rows, _, cols = text.lower().partition('x')
+    return int(rows), int(cols or rows)
+
+
+def parse_position(text, rows, cols):
+    """Lines from one 0/1 flag per edge: horizontal lines row by row, then vertical"""
+    layout = DotsBoxesLayout(rows, cols)
+    flags = [char for char in text if not char.isspace()]
+    if len(flags) != layout.num_edges or any(flag not in '01' for flag in flags):
+        raise ValueError(f"a {rows}x{cols} position is {layout.num_edges} flags of 0 and 1")
+    horizontal_lines, vertical_lines = empty_lines(rows, cols)
+    for edge, flag in enumerate(flags):
+        if flag == '1':
+            move_type, row, col = layout.edge_to_move(edge)
+            if move_type == 'horizontal':
+                horizontal_lines[row][col] = True
+            else:
+                vertical_lines[row][col] = True
+    return horizontal_lines, vertical_lines
+
+
+def apply_move(ai, horizontal_lines, vertical_lines, boxes, move, player):
+    """Draw a line and give player the boxes it completes; returns how many"""
+    move_type, row, col = move
+    if move_type == 'horizontal':
+        horizontal_lines[row][col] = True
+        neighbours = [(row - 1, col), (row, col)]
+    else:
+        vertical_lines[row][col] = True
+        neighbours = [(row, col - 1), (row, col)]
+
+    completed = 0
+    for box_row, box_col in neighbours:
+        if (0 <= box_row < ai.rows and 0 <= box_col < ai.cols and boxes[box_row][box_col] == 0 and
+                ai.count_box_sides(box_row, box_col, horizontal_lines, vertical_lines) == 4):
+            boxes[box_row][box_col] = player
+            completed += 1
+    return completed
+
+
+def format_board(ai, horizontal_lines, vertical_lines, boxes):
+    lines = []
+    for row in range(ai.rows + 1):
+        lines.append('+' + '+'.join('---' if drawn else '   ' for drawn in horizontal_lines[row]) + '+')
+        if row < ai.rows:
+            cells = []
+            for col in range(ai.cols + 1):
+                cells.append('|' if vertical_lines[row][col] else ' ')
+                if col < ai.cols:
+                    cells.append({0: '   ', 1: ' P ', 2: ' A '}[boxes[row][col]])
+            lines.append(''.join(cells))
+    return '\n'.join(lines)
+
+
+def play(ai):
+    """Play against the AI in the terminal, entering lines as h/v row col"""
+    horizontal_lines, vertical_lines = empty_lines(ai.rows, ai.cols)
+    boxes = [[0 for _ in range(ai.cols)] for _ in range(ai.rows)]
+    scores = [0, 0]
+    player = 1
+
+    while sum(scores) < ai.rows * ai.cols:
+        if player == 1:
+            print(format_board(ai, horizontal_lines, vertical_lines, boxes))
+            print(f"You {scores[0]} - AI {scores[1]}")
+            try:
+                kind, row, col = input("Your line (h row col or v row col): ").split()
+                move = ({'h': 'horizontal', 'v': 'vertical'}[kind.lower()], int(row), int(col))
+            except (KeyError, ValueError):
+                continue
+            if move not in ai.get_all_available_moves(horizontal_lines, vertical_lines):
+                continue
+        else:
+            move = ai.get_best_move(horizontal_lines, vertical_lines, boxes)
+            print(f"AI draws {move[0][0]} {move[1]} {move[2]}")
+
+        completed = apply_move(ai, horizontal_lines, vertical_lines, boxes, move, player)
+        scores[player - 1] += completed
+        if not completed:
+            player = 3 - player
+
+    print(format_board(ai, horizontal_lines, vertical_lines, boxes))
+    print(f"You {scores[0]} - AI {scores[1]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='engines dots',
+                                     description="Play Dots and Boxes against the AI or ask for its move")
+    parser.add_argument('--size', default='4x4', help="boxes as ROWSxCOLS (default 4x4)")
+    parser.add_argument('--position', help="one 0/1 flag per line: horizontal lines row by row, "
+                                           "then vertical; prints the best line")
+    args = parser.parse_args(argv)
+
+    try:
+        rows, cols = parse_size(args.size)
+    except ValueError:
+        parser.error("--size must look like 4x4")
+    ai = DotsAndBoxesAI(rows, cols)
+    if args.position is None:
+        try:
+            play(ai)
+        except (EOFError, KeyboardInterrupt):
+            print()
+        return 0
+    try:
+        horizontal_lines, vertical_lines = parse_position(args.position, rows, cols)
+    except ValueError as error:
+        parser.error(str(error))
+    boxes = [[0 for _ in range(cols)] for _ in range(rows)]
+    move = ai.get_best_move(horizontal_lines, vertical_lines, boxes)
+    print(f"{move[0][0]} {move[1]} {move[2]}" if move else "none")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,508 @@
+import random
+import time
+
+
+class DotsBoxesLayout:
+    """Edge numbering shared by the Dots and Boxes solvers.
+
+    Horizontal edges come first, row by row, followed by the vertical edges,
+    so a position is just an int bitmask of the drawn edges.
+    """
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.num_boxes = rows * cols
+        self.num_horizontal = (rows + 1) * cols
+        self.num_edges = self.num_horizontal + rows * (cols + 1)
+        self.full_mask = (1 << self.num_edges) - 1
+
+        # Four edges of every box (top, bottom, left, right)
+        self.box_edges = []
+        self.box_masks = []
+        for row in range(rows):
+            for col in range(cols):
+                edges = (self.h_edge(row, col), self.h_edge(row + 1, col),
+                         self.v_edge(row, col), self.v_edge(row, col + 1))
+                self.box_edges.append(edges)
+                self.box_masks.append(sum(1 << edge for edge in edges))
+
+        # Boxes touching every edge (one for the border, two inside)
+        self.edge_boxes = [[] for _ in range(self.num_edges)]
+        for box, edges in enumerate(self.box_edges):
+            for edge in edges:
+                self.edge_boxes[edge].append(box)
+        self.edge_boxes = [tuple(boxes) for boxes in self.edge_boxes]
+
+    def h_edge(self, row, col):
+        return row * self.cols + col
+
+    def v_edge(self, row, col):
+        return self.num_horizontal + row * (self.cols + 1) + col
+
+    def edge_to_move(self, edge):
+        """Convert an edge index to the ('horizontal', row, col) move format"""
+        if edge < self.num_horizontal:
+            return ('horizontal', edge // self.cols, edge % self.cols)
+        edge -= self.num_horizontal
+        return ('vertical', edge // (self.cols + 1), edge % (self.cols + 1))
+
+    def move_to_edge(self, move):
+        move_type, row, col = move
+        if move_type == 'horizontal':
+            return self.h_edge(row, col)
+        return self.v_edge(row, col)
+
+    def mask_from_lines(self, horizontal_lines, vertical_lines):
+        """Pack the game's line grids into an edge bitmask"""
+        mask = 0
+        for row in range(self.rows + 1):
+            for col in range(self.cols):
+                if horizontal_lines[row][col]:
+                    mask |= 1 << self.h_edge(row, col)
+        for row in range(self.rows):
+            for col in range(self.cols + 1):
+                if vertical_lines[row][col]:
+                    mask |= 1 << self.v_edge(row, col)
+        return mask
+
+    def degrees(self, mask):
+        """Number of undrawn sides of every box (0 means the box is taken)"""
+        return [4 - bin(mask & box_mask).count('1') for box_mask in self.box_masks]
+
+    def boxes_completed(self, mask, edge):
+        """How many boxes drawing edge would complete"""
+        new_mask = mask | (1 << edge)
+        return sum(1 for box in self.edge_boxes[edge]
+                   if new_mask & self.box_masks[box] == self.box_masks[box])
+
+    def free_edges(self, mask):
+        free = self.full_mask & ~mask
+        edges = []
+        while free:
+            low = free & -free
+            edges.append(low.bit_length() - 1)
+            free ^= low
+        return edges
+
+    def missing_edge(self, mask, box):
+        """The only undrawn side of a box that has three sides drawn"""
+        return (self.box_masks[box] & ~mask).bit_length() - 1
+
+    def other_box(self, edge, box):
+        """Box on the other side of edge, or None for the border"""
+        for other in self.edge_boxes[edge]:
+            if other != box:
+                return other
+        return None
+
+
+class SearchBudgetExceeded(Exception):
+    pass
+
+
+class DotsAndBoxesEndgame:
+    """Exact play for the loony endgame of Dots and Boxes.
+
+    Once no safe edge is left, the open boxes form chains, loops and the
+    junctions between them. Positions made only of independent chains and
+    loops are valued with the control-value / double-dealing recurrence,
+    anything else is searched with the same recurrence at its leaves.
+    """
+    def __init__(self, rows=4, cols=4, node_limit=50000, time_limit=None):
+        self.layout = DotsBoxesLayout(rows, cols)
+        # The search gives up after this many nodes or seconds, whichever comes first
+        self.node_limit = node_limit
+        self.time_limit = time_limit
+        self.deadline = None
+        self.nodes = 0
+        self.cache = {}
+        self.simple_cache = {}
+
+    def get_best_move(self, horizontal_lines, vertical_lines):
+        """Best move for an endgame position, or None before the endgame"""
+        mask = self.layout.mask_from_lines(horizontal_lines, vertical_lines)
+        edge = self.best_edge(mask)
+        if edge is None:
+            return None
+        return self.layout.edge_to_move(edge)
+
+    def best_edge(self, mask):
+        if not self.is_endgame(mask):
+            return None
+
+        if len(self.cache) > 1000000:
+            self.cache.clear()
+        self.start_budget()
+        try:
+            _, edge = self.best(mask)
+        except SearchBudgetExceeded:
+            edge = self.fallback_edge(mask)
+        return edge
+
+    def is_endgame(self, mask):
+        """True when no safe edge is left once the free boxes are taken"""
+        layout = self.layout
+        mask = self.capture_all(mask)
+        if mask == layout.full_mask:
+            return False
+
+        degrees = layout.degrees(mask)
+        for edge in layout.free_edges(mask):
+            if all(degrees[box] >= 3 for box in layout.edge_boxes[edge]):
+                return False
+        return True
+
+    def capture_all(self, mask):
+        """Greedily draw every edge that completes a box"""
+        layout = self.layout
+        captured = True
+        while captured:
+            captured = False
+            degrees = layout.degrees(mask)
+            for box in range(layout.num_boxes):
+                if degrees[box] == 1:
+                    mask |= 1 << layout.missing_edge(mask, box)
+                    captured = True
+                    break
+        return mask
+
+    def value(self, mask):
+        """Net boxes the player to move wins from here with perfect play"""
+        self.start_budget()
+        return self.best(mask)[0]
+
+    def start_budget(self):
+        self.nodes = 0
+        self.deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+
+    def best(self, mask):
+        """Return (value, edge) for the player to move"""
+        cached = self.cache.get(mask)
+        if cached is not None:
+            return cached
+
+        self.nodes += 1
+        if self.nodes > self.node_limit:
+            raise SearchBudgetExceeded()
+        if self.deadline is not None and self.nodes & 63 == 0 and time.perf_counter() > self.deadline:
+            raise SearchBudgetExceeded()
+
+        layout = self.layout
+        degrees = layout.degrees(mask)
+        capturable = [box for box in range(layout.num_boxes) if degrees[box] == 1]
+
+        if capturable:
+            # A box hanging off the border, a junction or another capturable
+            # box is always taken right away
+            for box in capturable:
+                edge = layout.missing_edge(mask, box)
+                other = layout.other_box(edge, box)
+                if other is None or degrees[other] != 2:
+                    result = (self.play(mask, edge), edge)
+                    self.cache[mask] = result
+                    return result
+
+            # Otherwise every open box is either taken or declined with the
+            # double-dealing move that leaves its last two boxes as a domino.
+            # With several chains open the one to decline is tried in turn.
+            result = None
+            for box in capturable:
+                edge = layout.missing_edge(mask, box)
+                other = layout.other_box(edge, box)
+                dd_edge = layout.missing_edge(mask | (1 << edge), other)
+                for move in (edge, dd_edge):
+                    value = self.play(mask, move)
+                    if result is None or value > result[0]:
+                        result = (value, move)
+            self.cache[mask] = result
+            return result
+
+        components = self.components(mask, degrees)
+        if components is not None:
+            result = self.best_simple(mask, components)
+        else:
+            result = None
+            for edge in layout.free_edges(mask):
+                value = self.play(mask, edge)
+                if result is None or value > result[0]:
+                    result = (value, edge)
+        self.cache[mask] = result
+        return result
+
+    def play(self, mask, edge):
+        """Value for the mover after drawing edge"""
+        completed = self.layout.boxes_completed(mask, edge)
+        new_mask = mask | (1 << edge)
+        if new_mask == self.layout.full_mask:
+            return completed
+        if completed:
+            return completed + self.best(new_mask)[0]
+        return -self.best(new_mask)[0]
+
+    def components(self, mask, degrees):
+        """Split the open boxes into chains and loops.
+
+        Returns a list of (kind, boxes) with kind 'chain' or 'loop', in path
+        order, or None if some box joins three or more strings (a junction).
+        """
+        layout = self.layout
+        if any(degree > 2 for degree in degrees):
+            return None
+
+        # Neighbours of every open box through undrawn edges
+        neighbours = {}
+        for box in range(layout.num_boxes):
+            if degrees[box] == 0:
+                continue
+            linked = []
+            for edge in layout.box_edges[box]:
+                if not mask >> edge & 1:
+                    other = layout.other_box(edge, box)
+                    if other is not None:
+                        linked.append(other)
+            neighbours[box] = linked
+
+        components = []
+        seen = set()
+        # Chains start at a box with a string to the border
+        for box, linked in neighbours.items():
+            if box in seen or len(linked) == 2:
+                continue
+            path = [box]
+            seen.add(box)
+            previous, current = None, box
+            while True:
+                following = [other for other in neighbours[current] if other != previous]
+                if not following:
+                    break
+                previous, current = current, following[0]
+                path.append(current)
+                seen.add(current)
+            components.append(('chain', path))
+
+        # Whatever is left is a closed loop
+        for box in neighbours:
+            if box in seen:
+                continue
+            path = [box]
+            seen.add(box)
+            previous, current = None, box
+            while True:
+                following = [other for other in neighbours[current]
+                             if other != previous and other not in seen]
+                if not following:
+                    break
+                previous, current = current, following[0]
+                path.append(current)
+                seen.add(current)
+            components.append(('loop', path))
+
+        return components
+
+    def best_simple(self, mask, components):
+        """Choose which chain or loop to open in a simple loony endgame"""
+        chains = tuple(sorted(len(boxes) for kind, boxes in components if kind == 'chain'))
+        loops = tuple(sorted(len(boxes) for kind, boxes in components if kind == 'loop'))
+
+        best_value = None
+        best_component = None
+        for kind, boxes in components:
+            if kind == 'chain':
+                rest = self.remove_one(chains, len(boxes)), loops
+            else:
+                rest = chains, self.remove_one(loops, len(boxes))
+            if self.too_large(*rest):
+                value = -self.opening_cost(kind, len(boxes), -self.control_value(*rest))
+            else:
+                value = -self.opening_cost(kind, len(boxes), self.simple_value(*rest))
+            if best_value is None or value > best_value:
+                best_value = value
+                best_component = (kind, boxes)
+
+        return best_value, self.opening_edge(mask, *best_component)
+
+    def opening_cost(self, kind, length, rest_value):
+        """Best net result for the controller once a component is opened.
+
+        The controller either takes every box and moves next, or declines
+        the last two boxes of a chain (four of a loop) to keep control.
+        Chains of one and two boxes cannot be declined.
+        """
+        if kind == 'loop':
+            return max(length + rest_value, length - 8 - rest_value)
+        if length <= 2:
+            return length + rest_value
+        return max(length + rest_value, length - 4 - rest_value)
+
+    def simple_value(self, chains, loops):
+        """Value for the player who must open one of the given components"""
+        if not chains and not loops:
+            return 0
+        key = (chains, loops)
+        cached = self.simple_cache.get(key)
+        if cached is not None:
+            return cached
+
+        best = None
+        for index, length in enumerate(chains):
+            if index and chains[index - 1] == length:
+                continue
+            rest = self.simple_value(chains[:index] + chains[index + 1:], loops)
+            value = -self.opening_cost('chain', length, rest)
+            if best is None or value > best:
+                best = value
+        for index, length in enumerate(loops):
+            if index and loops[index - 1] == length:
+                continue
+            rest = self.simple_value(chains, loops[:index] + loops[index + 1:])
+            value = -self.opening_cost('loop', length, rest)
+            if best is None or value > best:
+                best = value
+
+        self.simple_cache[key] = best
+        return best
+
+    def control_value(self, chains, loops):
+        """Margin the controller gets by keeping control to the very end.
+
+        Every chain but the last costs the controller four boxes and every
+        loop eight; the defender keeps a chain for last when there is one.
+        """
+        total = sum(chains) + sum(loops)
+        if not chains and not loops:
+            return 0
+        value = total - 4 * len(chains) - 8 * len(loops)
+        return value + (4 if chains else 8)
+
+    def too_large(self, chains, loops):
+        """Whether the exact recurrence over these components is too costly"""
+        states = 1
+        for lengths in (chains, loops):
+            for length in set(lengths):
+                states *= lengths.count(length) + 1
+        return states > 20000
+
+    def remove_one(self, lengths, length):
+        index = lengths.index(length)
+        return lengths[:index] + lengths[index + 1:]
+
+    def opening_edge(self, mask, kind, boxes):
+        """Edge that opens a component the way the recurrence assumes"""
+        layout = self.layout
+        if kind == 'chain' and len(boxes) == 2:
+            # Hard-hearted handout: cut the two boxes apart
+            for edge in layout.box_edges[boxes[0]]:
+                if not mask >> edge & 1 and layout.other_box(edge, boxes[0]) == boxes[1]:
+                    return edge
+        if kind == 'chain':
+            # Open the chain at its end, on the border string
+            for edge in layout.box_edges[boxes[0]]:
+                if not mask >> edge & 1 and layout.other_box(edge, boxes[0]) is None:
+                    return edge
+        for edge in layout.box_edges[boxes[0]]:
+            if not mask >> edge & 1:
+                return edge
+        return None
+
+    def fallback_edge(self, mask):
+        """Cheap move when the search budget runs out"""
+        layout = self.layout
+        degrees = layout.degrees(mask)
+        for box in range(layout.num_boxes):
+            if degrees[box] == 1:
+                return layout.missing_edge(mask, box)
+
+        # Give away as few boxes as possible
+        best_edge = None
+        best_loss = None
+        for edge in layout.free_edges(mask):
+            after = mask | (1 << edge)
+            loss = self.count_boxes(self.capture_all(after)) - self.count_boxes(after)
+            if best_loss is None or loss < best_loss:
+                best_loss = loss
+                best_edge = edge
+        return best_edge
+
+    def count_boxes(self, mask):
+        return sum(1 for box_mask in self.layout.box_masks if mask & box_mask == box_mask)
+
+
+def brute_force_value(layout, mask, cache):
+    """Plain minimax over every edge, used to check the endgame solver"""
+    if mask == layout.full_mask:
+        return 0
+    cached = cache.get(mask)
+    if cached is not None:
+        return cached
+
+    best = None
+    for edge in layout.free_edges(mask):
+        completed = layout.boxes_completed(mask, edge)
+        if completed:
+            value = completed + brute_force_value(layout, mask | (1 << edge), cache)
+        else:
+            value = -brute_force_value(layout, mask | (1 << edge), cache)
+        if best is None or value > best:
+            best = value
+    cache[mask] = best
+    return best
+
+
+def random_endgame(layout, rng):
+    """Play random safe moves until none are left, then a few random moves"""
+    mask = 0
+    while True:
+        degrees = layout.degrees(mask)
+        safe = [edge for edge in layout.free_edges(mask)
+                if all(degrees[box] >= 3 for box in layout.edge_boxes[edge])]
+        if not safe:
+            break
+        mask |= 1 << rng.choice(safe)
+
+    for _ in range(rng.randint(0, 3)):
+        free = layout.free_edges(mask)
+        if len(free) <= 1:
+            break
+        mask |= 1 << rng.choice(free)
+    return mask
+
+
+def benchmark(sizes=((2, 2), (2, 3), (3, 3), (3, 4)), positions=200, seed=1):
+    """Compare the endgame solver with brute-force search on small boards"""
+    rng = random.Random(seed)
+    for rows, cols in sizes:
+        endgame = DotsAndBoxesEndgame(rows, cols, node_limit=10 ** 7)
+        layout = endgame.layout
+        checked = mismatches = 0
+        solver_time = brute_time = 0.0
+
+        for _ in range(positions):
+            mask = random_endgame(layout, rng)
+            if not endgame.is_endgame(mask):
+                continue
+
+            start = time.perf_counter()
+            endgame.cache.clear()
+            value = endgame.value(mask)
+            edge = endgame.best_edge(mask)
+            solver_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            cache = {}
+            expected = brute_force_value(layout, mask, cache)
+            completed = layout.boxes_completed(mask, edge)
+            after = brute_force_value(layout, mask | (1 << edge), cache)
+            achieved = completed + after if completed else -after
+            brute_time += time.perf_counter() - start
+
+            checked += 1
+            if value != expected or achieved != expected:
+                mismatches += 1
+
+        print(f"{rows}x{cols}: {checked} endgames, {mismatches} mismatches, "
+              f"solver {solver_time * 1000 / max(checked, 1):.2f} ms, "
+              f"brute force {brute_time * 1000 / max(checked, 1):.2f} ms per position")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,313 @@
+import math
+import random
+import time
+from array import array
+from multiprocessing import Pool
+
+from engines.dots_endgame import DotsBoxesLayout
+
+
+class DotsState:
+    """Mutable Dots and Boxes position used by the tree search and rollouts.
+
+    It also follows the game-state protocol of engines.search, so small
+    positions can be searched exactly.
+    """
+    def __init__(self, layout, drawn, sides, scores, player):
+        self.layout = layout
+        self.drawn = drawn      # bytearray, one flag per edge
+        self.sides = sides      # drawn sides of every box
+        self.scores = scores    # [player 1, player 2]
+        self.player = player    # player to move (1 or 2)
+        self.free = sum(1 for flag in drawn if not flag)
+        self.history = []       # (mover, boxes completed) per applied move
+
+    @classmethod
+    def from_lines(cls, layout, horizontal_lines, vertical_lines, boxes, player):
+        mask = layout.mask_from_lines(horizontal_lines, vertical_lines)
+        drawn = bytearray((mask >> edge) & 1 for edge in range(layout.num_edges))
+        sides = [4 - degree for degree in layout.degrees(mask)]
+        scores = [sum(row.count(1) for row in boxes), sum(row.count(2) for row in boxes)]
+        return cls(layout, drawn, sides, scores, player)
+
+    def copy(self):
+        return DotsState(self.layout, bytearray(self.drawn), self.sides[:],
+                         self.scores[:], self.player)
+
+    def play(self, edge):
+        """Draw an edge; the mover keeps the turn after completing a box"""
+        self.drawn[edge] = 1
+        self.free -= 1
+        completed = 0
+        for box in self.layout.edge_boxes[edge]:
+            self.sides[box] += 1
+            if self.sides[box] == 4:
+                completed += 1
+        if completed:
+            self.scores[self.player - 1] += completed
+        else:
+            self.player = 3 - self.player
+        return completed
+
+    def apply(self, edge):
+        mover = self.player
+        self.history.append((mover, self.play(edge)))
+
+    def undo(self, edge):
+        mover, completed = self.history.pop()
+        self.drawn[edge] = 0
+        self.free += 1
+        for box in self.layout.edge_boxes[edge]:
+            self.sides[box] -= 1
+        self.scores[mover - 1] -= completed
+        self.player = mover
+
+    def legal_moves(self):
+        """Every free edge, captures first, then safe moves"""
+        captures = []
+        safe = []
+        rest = []
+        for edge in self.free_edges():
+            sides = [self.sides[box] for box in self.layout.edge_boxes[edge]]
+            if 3 in sides:
+                captures.append(edge)
+            elif max(sides) < 2:
+                safe.append(edge)
+            else:
+                rest.append(edge)
+        return captures + safe + rest
+
+    def is_terminal(self):
+        return self.free == 0
+
+    def key(self):
+        return bytes(self.drawn), self.player, self.margin()
+
+    def margin(self):
+        """Boxes ahead for the player to move"""
+        return self.scores[self.player - 1] - self.scores[2 - self.player]
+
+    def evaluate(self):
+        return self.margin()
+
+    def is_safe(self, edge):
+        """Drawing edge neither completes a box nor gives one away"""
+        sides = self.sides
+        for box in self.layout.edge_boxes[edge]:
+            if sides[box] >= 2:
+                return False
+        return True
+
+    def capture_edge(self):
+        """An edge completing a box, or None"""
+        layout = self.layout
+        drawn = self.drawn
+        for box, count in enumerate(self.sides):
+            if count == 3:
+                for edge in layout.box_edges[box]:
+                    if not drawn[edge]:
+                        return edge
+        return None
+
+    def free_edges(self):
+        return [edge for edge, flag in enumerate(self.drawn) if not flag]
+
+    def candidate_moves(self):
+        """Captures plus safe moves while any safe move is left, else every move"""
+        free = self.free_edges()
+        captures = []
+        safe = []
+        for edge in free:
+            sides = [self.sides[box] for box in self.layout.edge_boxes[edge]]
+            if 3 in sides:
+                captures.append(edge)
+            elif max(sides) < 2:
+                safe.append(edge)
+        if safe:
+            return captures + safe
+        return free
+
+    def reward(self, player):
+        """Mostly win (1), draw (0.5) or loss (0), plus a share of the boxes.
+
+        The box share keeps the search fighting for every box once the
+        result itself is decided.
+        """
+        mine = self.scores[player - 1]
+        theirs = self.scores[2 - player]
+        if mine > theirs:
+            outcome = 1.0
+        elif mine < theirs:
+            outcome = 0.0
+        else:
+            outcome = 0.5
+        return 0.8 * outcome + 0.2 * mine / max(mine + theirs, 1)
+
+
+class DotsAndBoxesMCTS:
+    """Monte-Carlo Tree Search for boards too large to search exactly.
+
+    Nodes live in flat arrays; the children of a node are stored next to
+    each other. Every node's value is kept from the point of view of the
+    player who made the move leading to it.
+    """
+    def __init__(self, rows=4, cols=4, playouts=4000, time_limit=None,
+                 exploration=1.0, workers=1, seed=None):
+        self.layout = DotsBoxesLayout(rows, cols)
+        self.playouts = playouts
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.workers = workers
+        self.random = random.Random(seed)
+        self.pool = None
+        self.last_playouts = 0
+
+    def get_best_move(self, horizontal_lines, vertical_lines, boxes, player=2):
+        state = DotsState.from_lines(self.layout, horizontal_lines, vertical_lines, boxes, player)
+        if state.free == 0:
+            return None
+        edge = self.best_edge(state)
+        return self.layout.edge_to_move(edge)
+
+    def best_edge(self, state):
+        if self.workers > 1:
+            visits = self.parallel_visits(state)
+        else:
+            visits = self.search(state)
+        self.last_playouts = sum(visits.values())
+        return max(visits, key=visits.get)
+
+    def parallel_visits(self, state):
+        """Run independent trees in worker processes and sum root visits"""
+        if self.pool is None:
+            self.pool = Pool(self.workers)
+        layout = self.layout
+        jobs = [(layout.rows, layout.cols, bytes(state.drawn), state.sides, state.scores,
+                 state.player, self.playouts, self.time_limit, self.exploration,
+                 self.random.getrandbits(32))
+                for _ in range(self.workers)]
+        visits = {}
+        for worker_visits in self.pool.map(_search_worker, jobs):
+            for edge, count in worker_visits.items():
+                visits[edge] = visits.get(edge, 0) + count
+        return visits
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    def search(self, root_state):
+        """Grow a tree from root_state and return {edge: visits} at the root"""
+        # Flat node storage
+        parent = array('i', [-1])
+        first_child = array('i', [-1])
+        child_count = array('i', [0])
+        edges = array('i', [-1])
+        movers = array('b', [0])
+        visits = array('i', [0])
+        values = array('d', [0.0])
+
+        rng = self.random
+        exploration = self.exploration
+        deadline = None
+        if self.time_limit is not None:
+            deadline = time.perf_counter() + self.time_limit
+
+        playout = 0
+        while playout < self.playouts:
+            if deadline is not None and playout % 32 == 0 and time.perf_counter() > deadline:
+                break
+            playout += 1
+            state = root_state.copy()
+            node = 0
+
+            # Selection
+            while child_count[node] > 0:
+                start = first_child[node]
+                log_visits = math.log(visits[node])
+                best_child = start
+                best_score = -1.0
+                for child in range(start, start + child_count[node]):
+                    count = visits[child]
+                    if count == 0:
+                        best_child = child
+                        break
+                    score = values[child] / count + exploration * math.sqrt(log_visits / count)
+                    if score > best_score:
+                        best_score = score
+                        best_child = child
+                node = best_child
+                state.play(edges[node])
+
+            # Expansion, once a leaf has been visited before
+            if state.free and (node == 0 or visits[node] > 0):
+                moves = state.candidate_moves()
+                rng.shuffle(moves)
+                first_child[node] = len(edges)
+                child_count[node] = len(moves)
+                for edge in moves:
+                    parent.append(node)
+                    first_child.append(-1)
+                    child_count.append(0)
+                    edges.append(edge)
+                    movers.append(state.player)
+                    visits.append(0)
+                    values.append(0.0)
+                node = first_child[node]
+                state.play(edges[node])
+
+            self.rollout(state, rng)
+
+            # Backpropagation
+            rewards = {1: state.reward(1), 2: state.reward(2)}
+            while node != -1:
+                visits[node] += 1
+                if movers[node]:
+                    values[node] += rewards[movers[node]]
+                node = parent[node]
+
+        start = first_child[0]
+        return {edges[child]: visits[child]
+                for child in range(start, start + child_count[0])}
+
+    def rollout(self, state, rng):
+        """Finish the game with captures first, then moves that give nothing away"""
+        free = state.free_edges()
+        position = {edge: index for index, edge in enumerate(free)}
+        safe_left = True
+
+        while free:
+            edge = state.capture_edge()
+            if edge is None and safe_left:
+                # A few random probes, then a full scan for a safe move
+                for _ in range(8):
+                    probe = free[rng.randrange(len(free))]
+                    if state.is_safe(probe):
+                        edge = probe
+                        break
+                if edge is None:
+                    safe = [candidate for candidate in free if state.is_safe(candidate)]
+                    if safe:
+                        edge = rng.choice(safe)
+                    else:
+                        # Boxes only gain sides, so no safe move comes back
+                        safe_left = False
+            if edge is None:
+                edge = free[rng.randrange(len(free))]
+
+            # Swap-remove the edge from the free list
+            index = position.pop(edge)
+            last = free.pop()
+            if last != edge:
+                free[index] = last
+                position[last] = index
+            state.play(edge)
+        return state
+
+
+def _search_worker(job):
+    rows, cols, drawn, sides, scores, player, playouts, time_limit, exploration, seed = job
+    mcts = DotsAndBoxesMCTS(rows, cols, playouts, time_limit, exploration, seed=seed)
+    state = DotsState(mcts.layout, bytearray(drawn), list(sides), list(scores), player)
+    return mcts.search(state)
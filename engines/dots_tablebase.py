@@ -0,0 +1,200 @@
+import argparse
+import mmap
+import os
+import time
+from multiprocessing import Pool
+
+from engines.dots_endgame import DotsBoxesLayout
+
+TABLEBASE_DIR = 'tablebases'
+
+
+def tablebase_path(rows, cols, directory=TABLEBASE_DIR):
+    return os.path.join(directory, f'dots_{rows}x{cols}.tb')
+
+
+class DotsTablebase:
+    """Memory-mapped table of perfect-play margins for a small board.
+
+    The file is a flat array of signed bytes indexed by the edge bitmask
+    from DotsBoxesLayout: the net number of remaining boxes the player to
+    move wins with perfect play.
+    """
+    def __init__(self, rows, cols, path):
+        self.layout = DotsBoxesLayout(rows, cols)
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.values = memoryview(self.map).cast('b')
+
+    @classmethod
+    def open(cls, rows, cols, directory=TABLEBASE_DIR):
+        """Open the tablebase for a board size, or return None if it is missing"""
+        path = tablebase_path(rows, cols, directory)
+        layout = DotsBoxesLayout(rows, cols)
+        try:
+            if os.path.getsize(path) != 1 << layout.num_edges:
+                return None
+            return cls(rows, cols, path)
+        except OSError:
+            return None
+
+    def value(self, mask):
+        return self.values[mask]
+
+    def move_value(self, mask, edge):
+        """Margin for the mover after drawing edge"""
+        layout = self.layout
+        completed = layout.boxes_completed(mask, edge)
+        after = self.values[mask | (1 << edge)]
+        return completed + after if completed else -after
+
+    def get_best_move(self, horizontal_lines, vertical_lines):
+        layout = self.layout
+        mask = layout.mask_from_lines(horizontal_lines, vertical_lines)
+        best_edge = None
+        best_value = None
+        for edge in layout.free_edges(mask):
+            value = self.move_value(mask, edge)
+            if best_value is None or value > best_value:
+                best_value = value
+                best_edge = edge
+        if best_edge is None:
+            return None
+        return layout.edge_to_move(best_edge)
+
+    def prefetch(self):
+        """Ask the OS to page the whole table in ahead of the first lookups"""
+        if hasattr(mmap, 'MADV_WILLNEED'):
+            self.map.madvise(mmap.MADV_WILLNEED)
+
+    def close(self):
+        self.values.release()
+        self.map.close()
+        self.file.close()
+
+
+# Generation
+#
+# The top BLOCK_BITS edges of a mask pick its block. Every move only adds
+# edges, so a block depends on itself and on blocks whose top bits are a
+# superset of its own. Blocks are solved in waves by decreasing number of
+# top bits set; all blocks of one wave run in parallel.
+
+_worker = {}
+
+
+def block_bits(num_edges):
+    return min(8, num_edges // 2)
+
+
+def _init_worker(rows, cols, path):
+    layout = DotsBoxesLayout(rows, cols)
+    handle = open(path, 'r+b')
+    table = mmap.mmap(handle.fileno(), 0)
+    _worker['layout'] = layout
+    _worker['file'] = handle
+    _worker['map'] = table
+    _worker['values'] = memoryview(table).cast('b')
+
+
+def _solve_block(block):
+    """Solve every mask of one block, high masks first"""
+    layout = _worker['layout']
+    values = _worker['values']
+    num_edges = layout.num_edges
+    low_bits = num_edges - block_bits(num_edges)
+    base = block << low_bits
+    full = layout.full_mask
+
+    edge_boxes = [[layout.box_masks[box] for box in layout.edge_boxes[edge]]
+                  for edge in range(num_edges)]
+    bits = [1 << edge for edge in range(num_edges)]
+
+    for mask in range(base + (1 << low_bits) - 1, base - 1, -1):
+        if mask == full:
+            values[mask] = 0
+            continue
+        best = -128
+        for edge in range(num_edges):
+            bit = bits[edge]
+            if mask & bit:
+                continue
+            new_mask = mask | bit
+            completed = 0
+            for box_mask in edge_boxes[edge]:
+                if new_mask & box_mask == box_mask:
+                    completed += 1
+            if completed:
+                value = completed + values[new_mask]
+            else:
+                value = -values[new_mask]
+            if value > best:
+                best = value
+        values[mask] = best
+
+    _worker['map'].flush()
+    return block
+
+
+def generate(rows, cols, directory=TABLEBASE_DIR, workers=None):
+    """Build the tablebase with a process pool, resuming an earlier run"""
+    layout = DotsBoxesLayout(rows, cols)
+    num_edges = layout.num_edges
+    high_bits = block_bits(num_edges)
+    path = tablebase_path(rows, cols, directory)
+    partial = path + '.partial'
+    progress = path + '.progress'
+    os.makedirs(directory, exist_ok=True)
+
+    if os.path.exists(path):
+        print(f"{path} already exists")
+        return path
+
+    if not os.path.exists(partial):
+        with open(partial, 'wb') as f:
+            f.truncate(1 << num_edges)
+        if os.path.exists(progress):
+            os.remove(progress)
+
+    finished = set()
+    if os.path.exists(progress):
+        with open(progress) as f:
+            finished = {int(line) for line in f if line.strip()}
+
+    waves = [[] for _ in range(high_bits + 1)]
+    for block in range(1 << high_bits):
+        if block not in finished:
+            waves[bin(block).count('1')].append(block)
+
+    start = time.perf_counter()
+    total = 1 << high_bits
+    with Pool(workers, initializer=_init_worker, initargs=(rows, cols, partial)) as pool, \
+            open(progress, 'a') as log:
+        for wave in reversed(waves):
+            for block in pool.imap_unordered(_solve_block, wave):
+                finished.add(block)
+                log.write(f"{block}\n")
+                log.flush()
+                print(f"\r{len(finished)}/{total} blocks, "
+                      f"{time.perf_counter() - start:.0f}s", end='', flush=True)
+    print()
+
+    os.replace(partial, path)
+    os.remove(progress)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve a small Dots and Boxes board into a tablebase")
+    parser.add_argument('rows', type=int)
+    parser.add_argument('cols', type=int)
+    parser.add_argument('--dir', default=TABLEBASE_DIR, help="output directory")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    path = generate(args.rows, args.cols, args.dir, args.workers)
+    print(f"Tablebase written to {path}")
+
+
+if __name__ == "__main__":
+    main()
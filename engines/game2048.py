@@ -0,0 +1,272 @@
+import argparse
+import random
+import re
+import sys
+
+from engines.search import Search, SearchStats
+
+
+DIRECTIONS = ['left', 'right', 'up', 'down']
+
+# New tiles and their odds
+NEW_TILES = [(2, 0.9), (4, 0.1)]
+
+
+class Game2048State:
+    """2048 grid for the shared expectimax search; moves are (direction, grid after it)"""
+    def __init__(self, ai, grid):
+        self.ai = ai
+        self.grid = grid
+        self.player = 0
+        self.history = []
+
+    def copy(self):
+        return Game2048State(self.ai, [row[:] for row in self.grid])
+
+    def legal_moves(self):
+        moves = []
+        for direction in DIRECTIONS:
+            new_grid, moved = self.ai.simulate_move(self.grid, direction)
+            if moved:
+                moves.append((direction, new_grid))
+        return moves
+
+    def apply(self, move):
+        self.history.append(self.grid)
+        self.grid = [row[:] for row in move[1]]
+
+    def undo(self, move):
+        self.grid = self.history.pop()
+
+    def chance_outcomes(self):
+        empty_cells = self.ai.get_empty_cells(self.grid)
+        if not empty_cells:
+            return []
+        return [(prob / len(empty_cells), (row, col, value))
+                for row, col in empty_cells for value, prob in NEW_TILES]
+
+    def apply_chance(self, outcome):
+        row, col, value = outcome
+        self.grid[row][col] = value
+
+    def undo_chance(self, outcome):
+        row, col, _ = outcome
+        self.grid[row][col] = 0
+
+    def is_terminal(self):
+        return not self.legal_moves()
+
+    def key(self):
+        return tuple(tuple(row) for row in self.grid)
+
+    def evaluate(self):
+        return self.ai.evaluate_grid(self.grid)
+
+    def no_move_value(self):
+        """A grid with no move left is lost, worth less than any live grid"""
+        return 0
+
+
+class Game2048AI:
+    def __init__(self, depth=3, time_limit=None, min_probability=0.0):
+        self.depth = depth
+        self.time_limit = time_limit
+        # Chance branches less likely than this are evaluated statically
+        self.min_probability = min_probability
+        self.stats = SearchStats()
+    
+    def get_best_move(self, grid):
+        search = Search(time_limit=self.time_limit, min_probability=self.min_probability)
+        move, _ = search.best_expectimax_move(Game2048State(self, [row[:] for row in grid]), self.depth)
+        self.stats = search.stats
+        if move is None:
+            return None
+        self.stats.best_move = move[0]
+        self.stats.pv = [move[0]]
+        return move[0]
+    
+    def simulate_move(self, grid, direction):
+        new_grid = [row[:] for row in grid]
+        moved = False
+        
+        if direction == 'left':
+            moved = self.move_left(new_grid)
+        elif direction == 'right':
+            moved = self.move_right(new_grid)
+        elif direction == 'up':
+            moved = self.move_up(new_grid)
+        elif direction == 'down':
+            moved = self.move_down(new_grid)
+        
+        return new_grid, moved
+    
+    def move_left(self, grid):
+        moved = False
+        for row in range(4):
+            compressed = [val for val in grid[row] if val != 0]
+            merged = []
+            i = 0
+            while i < len(compressed):
+                if i < len(compressed) - 1 and compressed[i] == compressed[i + 1]:
+                    merged.append(compressed[i] * 2)
+                    i += 2
+                else:
+                    merged.append(compressed[i])
+                    i += 1
+            
+            merged.extend([0] * (4 - len(merged)))
+            
+            if merged != grid[row]:
+                moved = True
+                grid[row] = merged
+        
+        return moved
+    
+    def move_right(self, grid):
+        for row in grid:
+            row.reverse()
+        moved = self.move_left(grid)
+        for row in grid:
+            row.reverse()
+        return moved
+    
+    def move_up(self, grid):
+        self.transpose(grid)
+        moved = self.move_left(grid)
+        self.transpose(grid)
+        return moved
+    
+    def move_down(self, grid):
+        self.transpose(grid)
+        moved = self.move_right(grid)
+        self.transpose(grid)
+        return moved
+    
+    def transpose(self, grid):
+        for i in range(4):
+            for j in range(i + 1, 4):
+                grid[i][j], grid[j][i] = grid[j][i], grid[i][j]
+    
+    def get_empty_cells(self, grid):
+        empty = []
+        for row in range(4):
+            for col in range(4):
+                if grid[row][col] == 0:
+                    empty.append((row, col))
+        return empty
+    
+    def evaluate_grid(self, grid):
+        score = 0
+        
+        # Empty cells bonus
+        empty_cells = len(self.get_empty_cells(grid))
+        score += empty_cells * 100
+        
+        # Max tile
+        max_tile = max(max(row) for row in grid)
+        score += max_tile * 2
+        
+        # Monotonicity
+        score += self.monotonicity_score(grid) * 10
+        
+        return score
+    
+    def monotonicity_score(self, grid):
+        score = 0
+        
+        # Check rows
+        for row in grid:
+            increasing = decreasing = 0
+            for i in range(3):
+                if row[i] <= row[i + 1]:
+                    increasing += 1
+                if row[i] >= row[i + 1]:
+                    decreasing += 1
+            score += max(increasing, decreasing)
+        
+        return score
+
+
+def parse_position(text):
+    """Grid from 16 tile values row by row, separated by spaces, commas or slashes"""
+    values = [int(value) for value in re.split(r'[\s,/]+', text.strip()) if value]
+    if len(values) != 16:
+        raise ValueError("a 2048 position is 16 tile values, 0 for empty")
+    return [values[row * 4:row * 4 + 4] for row in range(4)]
+
+
+def format_grid(grid):
+    return '\n'.join(' '.join(f"{value or '.':>5}" for value in row) for row in grid)
+
+
+def add_random_tile(grid, rng):
+    empty_cells = [(row, col) for row in range(4) for col in range(4) if grid[row][col] == 0]
+    if empty_cells:
+        row, col = rng.choice(empty_cells)
+        grid[row][col] = 2 if rng.random() < 0.9 else 4
+
+
+def play(ai, auto=False, seed=None):
+    """Play 2048 in the terminal with WASD and H for a hint, or let the AI play"""
+    rng = random.Random(seed)
+    grid = [[0] * 4 for _ in range(4)]
+    add_random_tile(grid, rng)
+    add_random_tile(grid, rng)
+    keys = {'a': 'left', 'd': 'right', 'w': 'up', 's': 'down'}
+    moves = 0
+
+    while True:
+        best = ai.get_best_move(grid)
+        if best is None:
+            break
+        if auto:
+            direction = best
+        else:
+            print(format_grid(grid))
+            key = input("Move (w/a/s/d, h for a hint, q to quit): ").strip().lower()
+            if key == 'q':
+                break
+            if key == 'h':
+                print(f"AI suggests {best}")
+                continue
+            if key not in keys:
+                continue
+            direction = keys[key]
+
+        new_grid, moved = ai.simulate_move(grid, direction)
+        if moved:
+            grid = new_grid
+            add_random_tile(grid, rng)
+            moves += 1
+
+    print(format_grid(grid))
+    print(f"Game over after {moves} moves, highest tile {max(max(row) for row in grid)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='engines 2048',
+                                     description="Play 2048 with AI hints, watch the AI play, or ask for its move")
+    parser.add_argument('--position', help="16 tile values row by row (0 for empty); prints the best direction")
+    parser.add_argument('--auto', action='store_true', help="let the AI play a whole game")
+    parser.add_argument('--seed', type=int, default=None, help="seed for new tiles")
+    parser.add_argument('--depth', type=int, default=3, help="expectimax depth")
+    args = parser.parse_args(argv)
+
+    ai = Game2048AI()
+    ai.depth = args.depth
+    if args.position is None:
+        try:
+            play(ai, args.auto, args.seed)
+        except (EOFError, KeyboardInterrupt):
+            print()
+        return 0
+    try:
+        grid = parse_position(args.position)
+    except ValueError as error:
+        parser.error(str(error))
+    print(ai.get_best_move(grid) or "none")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import sys
+import time
+
+from engines import connect_four, game2048
+from engines.arena import percentile
+from engines.bench import CORPUS_PATH
+from engines.connect_four import ConnectFourAI
+from engines.game2048 import DIRECTIONS, Game2048AI
+from engines.service import DEFAULT_PORT, WS_CLOSE, WS_TEXT, encode_frame, read_frame
+from engines.tictactoe import TicTacToeAI
+
+# Most random plies played from a corpus position to make a new one
+PLAYOUT_PLIES = 8
+# Playouts tried per request before settling for fewer distinct positions
+PLAYOUT_ATTEMPTS = 20
+
+
+def corpus_requests(path, games, deadline_ms):
+    """Move requests for every corpus position of the chosen games"""
+    with open(path) as file:
+        corpus = json.load(file)
+    requests = []
+    for game in games:
+        for entry in corpus[game]:
+            request = {'game': game, 'position': entry['position'], 'deadline_ms': deadline_ms}
+            if 'size' in entry:
+                request['size'] = entry['size']
+            requests.append(request)
+    return requests
+
+
+def play_tictactoe(position, plies, rng):
+    ai = TicTacToeAI()
+    board = ['' if char in '.-' else char.upper() for char in position]
+    for _ in range(plies):
+        empty = [cell for cell in range(9) if not board[cell]]
+        if len(empty) < 2 or ai.check_winner(board):
+            break
+        board[rng.choice(empty)] = 'X' if board.count('X') == board.count('O') else 'O'
+    if ai.check_winner(board) or ai.is_board_full(board):
+        return None
+    return ''.join(cell or '.' for cell in board)
+
+
+def play_connect4(position, plies, rng):
+    ai = ConnectFourAI()
+    board, player = connect_four.parse_position(position, ai)
+    for _ in range(plies):
+        columns = ai.get_valid_moves(board)
+        if not columns or ai.check_winner(board):
+            break
+        col = rng.choice(columns)
+        ai.drop_piece(board, ai.get_next_open_row(board, col), col, player)
+        player = 3 - player
+        position += str(col + 1)
+    if ai.check_winner(board) or ai.is_board_full(board):
+        return None
+    return position
+
+
+def play_2048(position, plies, rng):
+    ai = Game2048AI()
+    grid = game2048.parse_position(position)
+    for _ in range(plies):
+        moves = [new_grid for new_grid, moved in (ai.simulate_move(grid, direction) for direction in DIRECTIONS)
+                 if moved]
+        if not moves:
+            return None
+        grid = rng.choice(moves)
+        game2048.add_random_tile(grid, rng)
+    return '/'.join(','.join(str(value) for value in row) for row in grid)
+
+
+def play_dots(position, plies, rng):
+    flags = list(position)
+    for _ in range(plies):
+        free = [edge for edge, flag in enumerate(flags) if flag == '0']
+        if len(free) < 2:
+            break
+        flags[rng.choice(free)] = '1'
+    return ''.join(flags)
+
+
+PLAYOUTS = {'tictactoe': play_tictactoe, 'connect4': play_connect4, '2048': play_2048, 'dots': play_dots}
+
+
+def distinct_requests(requests, total, rng):
+    """total requests for distinct positions a few random plies on from the corpus ones.
+
+    Each position is asked for once, so the service's cache does not
+    answer them and the load reaches the worker pool. Games with few
+    positions left to reach may give fewer requests than total.
+    """
+    seen = set()
+    plan = []
+    for _ in range(total * PLAYOUT_ATTEMPTS):
+        if len(plan) == total:
+            break
+        request = rng.choice(requests)
+        position = PLAYOUTS[request['game']](request['position'], rng.randint(1, PLAYOUT_PLIES), rng)
+        key = (request['game'], request.get('size'), position)
+        if position is None or key in seen:
+            continue
+        seen.add(key)
+        plan.append(dict(request, position=position))
+    return plan
+
+
+class HTTPClient:
+    """One keep-alive connection sending POST /move requests"""
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, request):
+        body = json.dumps(request).encode()
+        self.writer.write((f"POST /move HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                           f"Content-Length: {len(body)}\r\n\r\n").encode() + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        await self.reader.readexactly(length)
+        return status
+
+    async def close(self):
+        self.writer.close()
+
+
+class WebSocketClient:
+    """One WebSocket connection, one request in flight at a time"""
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.writer.write((f"GET /ws HTTP/1.1\r\nHost: {self.host}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                           f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        await self.writer.drain()
+        if b' 101 ' not in await self.reader.readline():
+            raise ConnectionError("the server refused the WebSocket upgrade")
+        while await self.reader.readline() not in (b'\r\n', b''):
+            pass
+
+    async def request(self, request):
+        self.writer.write(encode_frame(WS_TEXT, json.dumps(request).encode(), mask=True))
+        await self.writer.drain()
+        while True:
+            opcode, payload = await read_frame(self.reader)
+            if opcode == WS_TEXT:
+                return json.loads(payload)['status']
+            if opcode == WS_CLOSE:
+                raise ConnectionError("the server closed the WebSocket")
+
+    async def close(self):
+        self.writer.write(encode_frame(WS_CLOSE, b'\x03\xe8', mask=True))
+        self.writer.close()
+
+
+async def fetch_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET /stats HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b'\r\n\r\n', 1)[1])
+
+
+async def run_load(host, port, mode, plan, concurrency):
+    """Send every planned request from concurrency connections; returns latencies, statuses and wall time"""
+    plan = plan[::-1]
+    latencies = []
+    statuses = {}
+    client_class = WebSocketClient if mode == 'ws' else HTTPClient
+
+    async def connection():
+        client = client_class(host, port)
+        await client.connect()
+        try:
+            while plan:
+                request = plan.pop()
+                started = time.perf_counter()
+                try:
+                    status = await client.request(request)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    status = 'connection error'
+                    await client.connect()
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            await client.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(connection() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='engines.loadtest',
+                                     description="Load-test the AI service with positions played on from the corpus")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--mode', choices=['http', 'ws'], default='http')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=32, help="connections sending requests at once")
+    parser.add_argument('--games', nargs='+', choices=['tictactoe', 'connect4', '2048', 'dots'],
+                        default=['tictactoe', 'connect4', '2048', 'dots'])
+    parser.add_argument('--corpus', default=CORPUS_PATH)
+    parser.add_argument('--deadline-ms', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--corpus-only', action='store_true',
+                        help="repeat the corpus positions themselves, which mostly measures the cache")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    requests = corpus_requests(args.corpus, args.games, args.deadline_ms)
+    if args.corpus_only:
+        plan = [rng.choice(requests) for _ in range(args.requests)]
+    else:
+        plan = distinct_requests(requests, args.requests, rng)
+    try:
+        before = asyncio.run(fetch_stats(args.host, args.port))
+        latencies, statuses, elapsed = asyncio.run(run_load(args.host, args.port, args.mode, plan, args.concurrency))
+        stats = asyncio.run(fetch_stats(args.host, args.port))
+    except OSError as error:
+        print(f"Cannot reach the AI service at {args.host}:{args.port}: {error}")
+        return 2
+    cache_hits = stats['cache_hits'] - before['cache_hits']
+    deduplicated = stats['deduplicated'] - before['deduplicated']
+
+    print(f"{len(latencies)} requests over {args.mode} from {args.concurrency} connections in {elapsed:.2f} s: "
+          f"{len(latencies) / elapsed:.1f} requests/s")
+    print(f"latency p50 {1000 * percentile(latencies, 0.5):.2f} ms, p99 {1000 * percentile(latencies, 0.99):.2f} ms, "
+          f"max {1000 * max(latencies):.2f} ms; {cache_hits / len(latencies):.0%} cache hits, "
+          f"{deduplicated / len(latencies):.0%} deduplicated")
+    print("status " + ', '.join(f"{status}: {count}" for status, count in sorted(statuses.items(), key=str)))
+    print("server " + ', '.join(f"{name} {value}" for name, value in stats.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
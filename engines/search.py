@@ -0,0 +1,321 @@
+import time
+
+INFINITY = float('inf')
+
+# Transposition table bounds
+EXACT = 'exact'
+LOWER = 'lower'
+UPPER = 'upper'
+
+# The clock is read once per this many nodes
+TIME_CHECK_INTERVAL = 1024
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search once its time budget is spent"""
+
+
+class SearchStats:
+    """Counters every engine fills in for its last decision"""
+    def __init__(self):
+        self.nodes = 0
+        self.depth = 0
+        self.cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.best_move = None
+        self.score = None
+        self.pv = []            # principal variation, best move first
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    @property
+    def nps(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    def as_dict(self):
+        return {
+            'nodes': self.nodes,
+            'depth': self.depth,
+            'cutoffs': self.cutoffs,
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'tt_hit_rate': round(self.tt_hit_rate, 4),
+            'nps': round(self.nps),
+            'elapsed': round(self.elapsed, 6),
+            'best_move': self.best_move,
+            'score': self.score,
+            'pv': self.pv,
+        }
+
+
+class Search:
+    """Alpha-beta and expectimax over any state following the game-state protocol.
+
+    A state provides:
+        player              side to move; unchanged after a move when the mover moves again
+        legal_moves()       moves for the side to move, best first when the state can tell
+        apply(move)         play a move in place
+        undo(move)          take the last move back
+        is_terminal()
+        key()               hashable position key for the transposition table
+        evaluate()          score for the side to move (alpha-beta) or the player (expectimax)
+        copy()
+    States with chance nodes also provide chance_outcomes(), a list of
+    (probability, outcome), with apply_chance(outcome) and undo_chance(outcome),
+    and may provide no_move_value(), the player's score when no move is
+    left (evaluate() otherwise).
+
+    The transposition table is passed in so an engine can keep it between
+    searches. Its entries are (value, bound, best move). A timed-out search
+    leaves its state half-played, so searches always run on a copy.
+    """
+    def __init__(self, transposition_table=None, time_limit=None, min_probability=0.0):
+        self.table = {} if transposition_table is None else transposition_table
+        self.time_limit = time_limit
+        self.min_probability = min_probability
+        self.deadline = None
+        self.stats = SearchStats()
+
+    def start(self):
+        self.stats = SearchStats()
+        self.deadline = None
+        if self.time_limit is not None:
+            self.deadline = self.stats.started + self.time_limit
+
+    def count_node(self):
+        stats = self.stats
+        stats.nodes += 1
+        if (self.deadline is not None and stats.nodes % TIME_CHECK_INTERVAL == 0 and
+                time.perf_counter() > self.deadline):
+            raise SearchTimeout()
+
+    # Alpha-beta
+
+    def best_move(self, state, depth, moves=None):
+        """Best (move, score) for the side to move.
+
+        Without a time limit one search to depth is run. With one, depths
+        1, 2, ... are searched until time runs out, each trying the last
+        best move first, and the deepest finished result is returned.
+        """
+        self.start()
+        root = state
+        state = state.copy()
+        moves = list(moves if moves is not None else state.legal_moves())
+        best = (None, None)
+        if not moves:
+            return self.finish(best)
+
+        first_depth = depth if self.time_limit is None else 1
+        for current in range(first_depth, depth + 1):
+            try:
+                best = self.search_root(state, current, moves)
+            except SearchTimeout:
+                break
+            self.stats.depth = current
+            # Principal move first in the next iteration
+            moves.remove(best[0])
+            moves.insert(0, best[0])
+        self.stats.pv = self.principal_variation(root.copy(), best[0], self.stats.depth)
+        return self.finish(best)
+
+    def finish(self, best):
+        self.stats.best_move, self.stats.score = best
+        if not self.stats.pv and best[0] is not None:
+            self.stats.pv = [best[0]]
+        self.stats.finish()
+        return best
+
+    def principal_variation(self, state, move, depth):
+        """The best move followed by the best replies stored in the table"""
+        pv = [move]
+        state.apply(move)
+        for remaining in range(depth - 1, 0, -1):
+            if state.is_terminal():
+                break
+            entry = self.table.get((state.key(), remaining))
+            if entry is None or entry[2] is None:
+                break
+            pv.append(entry[2])
+            state.apply(entry[2])
+        return pv
+
+    def search_root(self, state, depth, moves):
+        self.count_node()
+        player = state.player
+        alpha = -INFINITY
+        best_move = moves[0]
+        for move in moves:
+            state.apply(move)
+            if state.player == player:
+                value = self.negamax(state, depth - 1, alpha, INFINITY)
+            else:
+                value = -self.negamax(state, depth - 1, -INFINITY, -alpha)
+            state.undo(move)
+            if value > alpha:
+                alpha = value
+                best_move = move
+        return best_move, alpha
+
+    def move_scores(self, state, depth):
+        """(move, score) of every legal move, each searched with a full window.
+
+        Slower than best_move, which only proves the other moves worse, but
+        every score is exact to the depth. Meant for analysis without a
+        time limit.
+        """
+        self.start()
+        state = state.copy()
+        player = state.player
+        scores = []
+        for move in state.legal_moves():
+            state.apply(move)
+            if state.player == player:
+                value = self.negamax(state, depth - 1, -INFINITY, INFINITY)
+            else:
+                value = -self.negamax(state, depth - 1, -INFINITY, INFINITY)
+            state.undo(move)
+            scores.append((move, value))
+        self.stats.depth = depth
+        self.stats.finish()
+        return scores
+
+    def negamax(self, state, depth, alpha, beta):
+        """Value of state for the side to move, searched depth plies deep"""
+        self.count_node()
+        if depth == 0 or state.is_terminal():
+            return state.evaluate()
+
+        stats = self.stats
+        key = (state.key(), depth)
+        stats.tt_probes += 1
+        entry = self.table.get(key)
+        if entry is not None:
+            value, bound, _ = entry
+            if (bound == EXACT or (bound == LOWER and value >= beta) or
+                    (bound == UPPER and value <= alpha)):
+                stats.tt_hits += 1
+                return value
+
+        original_alpha = alpha
+        player = state.player
+        value = -INFINITY
+        best_move = None
+        for move in state.legal_moves():
+            state.apply(move)
+            if state.player == player:
+                child = self.negamax(state, depth - 1, alpha, beta)
+            else:
+                child = -self.negamax(state, depth - 1, -beta, -alpha)
+            state.undo(move)
+            if child > value:
+                value = child
+                best_move = move
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                stats.cutoffs += 1
+                break
+
+        if value <= original_alpha:
+            bound = UPPER
+        elif value >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table[key] = (value, bound, best_move)
+        return value
+
+    # Expectimax
+
+    def best_expectimax_move(self, state, depth):
+        """Best (move, expected score) for a single player against chance.
+
+        depth counts the chance and move layers below the root move. With a
+        time limit the depth is deepened until time runs out.
+        """
+        self.start()
+        state = state.copy()
+        best = (None, None)
+
+        first_depth = depth if self.time_limit is None else 1
+        for current in range(first_depth, depth + 1):
+            try:
+                best = self.expectimax_root(state, current)
+            except SearchTimeout:
+                break
+            self.stats.depth = current
+        return self.finish(best)
+
+    def expectimax_move_scores(self, state, depth):
+        """(move, expected score) of every legal move, without a time limit"""
+        self.start()
+        state = state.copy()
+        scores = []
+        for move in state.legal_moves():
+            state.apply(move)
+            scores.append((move, self.chance_value(state, depth, 1.0)))
+            state.undo(move)
+        self.stats.depth = depth
+        self.stats.finish()
+        return scores
+
+    def expectimax_root(self, state, depth):
+        self.count_node()
+        best_move = None
+        best_score = -INFINITY
+        for move in state.legal_moves():
+            state.apply(move)
+            score = self.chance_value(state, depth, 1.0)
+            state.undo(move)
+            if score > best_score:
+                best_score = score
+                best_move = move
+        return best_move, best_score
+
+    def chance_value(self, state, depth, probability):
+        """Expected value over the chance outcomes of state.
+
+        Branches reached with a probability below min_probability are
+        cut off and evaluated statically.
+        """
+        self.count_node()
+        if depth == 0:
+            return state.evaluate()
+        outcomes = state.chance_outcomes()
+        if not outcomes:
+            return state.evaluate()
+        if probability < self.min_probability:
+            self.stats.cutoffs += 1
+            return state.evaluate()
+
+        expected = 0.0
+        for chance, outcome in outcomes:
+            state.apply_chance(outcome)
+            expected += chance * self.max_value(state, depth - 1, probability * chance)
+            state.undo_chance(outcome)
+        return expected
+
+    def max_value(self, state, depth, probability):
+        self.count_node()
+        if depth == 0:
+            return state.evaluate()
+        best = None
+        for move in state.legal_moves():
+            state.apply(move)
+            score = self.chance_value(state, depth - 1, probability)
+            state.undo(move)
+            if best is None or score > best:
+                best = score
+        if best is None:
+            return state.no_move_value() if hasattr(state, 'no_move_value') else state.evaluate()
+        return best
@@ -0,0 +1,423 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from engines.bench import GAMES
+from engines.connect_four import ConnectFourAI, best_column
+from engines.dots import DotsAndBoxesAI
+from engines.game2048 import Game2048AI
+from engines.tictactoe import TicTacToeAI
+
+DEFAULT_PORT = 8765
+# Requests wait this long for their move unless they ask for another deadline
+DEFAULT_DEADLINE_MS = 5000
+MAX_DEADLINE_MS = 60000
+CACHE_SIZE = 4096
+# Distinct positions queued or being searched before new ones are refused
+MAX_PENDING = 256
+# Positions sent to a worker together, and how long to wait for a batch to fill
+BATCH_SIZE = 8
+BATCH_WINDOW = 0.002
+MAX_BODY = 64 * 1024
+# Messages a WebSocket client may have in flight before the server stops reading
+WS_IN_FLIGHT = 64
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC11B85'
+WS_TEXT, WS_CLOSE, WS_PING, WS_PONG = 0x1, 0x8, 0x9, 0xA
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+           503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+
+class Overloaded(Exception):
+    pass
+
+
+def parse_request(request):
+    """Game and parsed position of a request; positions are written as in the corpus"""
+    if not isinstance(request, dict):
+        raise ValueError("a request is a JSON object")
+    game = request.get('game')
+    if game not in GAMES:
+        raise ValueError(f"game must be one of {', '.join(GAMES)}")
+    if not isinstance(request.get('position'), str):
+        raise ValueError("position must be a string")
+    entry = {'position': request['position'], 'size': str(request.get('size', '4x4'))}
+    return game, GAMES[game][0](entry)
+
+
+# Worker processes keep one AI per game and board size, so tables built by
+# one search are there for the next
+
+worker_ais = {}
+
+
+def worker_ai(game, position):
+    key = (game, position[0], position[1]) if game == 'dots' else game
+    ai = worker_ais.get(key)
+    if ai is None:
+        if game == 'tictactoe':
+            ai = TicTacToeAI()
+        elif game == 'connect4':
+            ai = ConnectFourAI()
+        elif game == '2048':
+            ai = Game2048AI()
+        else:
+            ai = DotsAndBoxesAI(position[0], position[1])
+        worker_ais[key] = ai
+    return ai
+
+
+def search_position(game, position):
+    ai = worker_ai(game, position)
+    started = time.perf_counter()
+    if game == 'tictactoe':
+        move = ai.get_best_move(position)
+    elif game == 'connect4':
+        board, player = position
+        move = best_column(ai, board, player)
+    elif game == '2048':
+        move = ai.get_best_move(position)
+    else:
+        rows, cols, horizontal_lines, vertical_lines = position
+        move = ai.get_best_move(horizontal_lines, vertical_lines, [[0] * cols for _ in range(rows)])
+    elapsed = time.perf_counter() - started
+    return {
+        'move': list(move) if isinstance(move, tuple) else move,
+        'nodes': ai.stats.nodes,
+        'depth': ai.stats.depth,
+        'search_ms': round(1000 * elapsed, 3),
+    }
+
+
+def search_batch(jobs):
+    return [search_position(game, position) for game, position in jobs]
+
+
+# WebSocket frames (RFC 6455); clients mask what they send, servers do not
+
+def encode_frame(opcode, payload, mask=False):
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    if len(payload) < 126:
+        header.append(mask_bit | len(payload))
+    elif len(payload) < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack('>H', len(payload))
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack('>Q', len(payload))
+    if mask:
+        key = os.urandom(4)
+        payload = bytes(byte ^ key[index % 4] for index, byte in enumerate(payload))
+        header += key
+    return bytes(header) + payload
+
+
+async def read_frame(reader):
+    """(opcode, payload) of the next message, joining fragments"""
+    opcode = None
+    message = b''
+    while True:
+        first, second = await reader.readexactly(2)
+        length = second & 0x7f
+        if length == 126:
+            length = struct.unpack('>H', await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack('>Q', await reader.readexactly(8))[0]
+        if length > MAX_BODY:
+            raise ValueError("frame too large")
+        key = await reader.readexactly(4) if second & 0x80 else None
+        payload = await reader.readexactly(length)
+        if key:
+            payload = bytes(byte ^ key[index % 4] for index, byte in enumerate(payload))
+        frame_opcode = first & 0x0f
+        if frame_opcode >= 0x8:
+            # Control frames may arrive between the fragments of a message
+            return frame_opcode, payload
+        if opcode is None:
+            opcode = frame_opcode
+        message += payload
+        if first & 0x80:
+            return opcode, message
+
+
+def websocket_accept(key):
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+
+
+class AIService:
+    """Best moves for every game over HTTP and WebSocket, searched on worker processes.
+
+    Answers come from an LRU cache of finished searches when possible.
+    Requests for a position already being searched wait for that search,
+    and new positions are queued and handed to the workers in batches.
+    When too many distinct positions are pending, new ones are refused
+    at once with 503; a request that is not answered within its deadline
+    gets 504, and positions whose every request gave up are not searched.
+    """
+    def __init__(self, workers=None, cache_size=CACHE_SIZE, max_pending=MAX_PENDING, batch_size=BATCH_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_size = cache_size
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.executor = ProcessPoolExecutor(self.workers)
+        self.cache = OrderedDict()
+        self.pending = {}       # position key -> [future, latest deadline]
+        self.counters = dict.fromkeys(['requests', 'cache_hits', 'deduplicated', 'searches', 'batches',
+                                       'rejected', 'deadline_exceeded', 'expired'], 0)
+
+    async def start(self, host, port):
+        self.queue = asyncio.Queue()
+        # One batch per worker at a time, so the queue fills while they are busy
+        self.slots = asyncio.Semaphore(self.workers)
+        self.batcher = asyncio.create_task(self.run_batches())
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def stats(self):
+        return dict(self.counters, cache_entries=len(self.cache), pending=len(self.pending), workers=self.workers)
+
+    async def best_move(self, request):
+        game, position = parse_request(request)
+        deadline_ms = min(float(request.get('deadline_ms', DEFAULT_DEADLINE_MS)), MAX_DEADLINE_MS)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + deadline_ms / 1000
+        key = (game, json.dumps(position))
+        self.counters['requests'] += 1
+
+        result = self.cache.get(key)
+        if result is not None:
+            self.cache.move_to_end(key)
+            self.counters['cache_hits'] += 1
+            return dict(result, cached=True)
+
+        entry = self.pending.get(key)
+        if entry is None:
+            if len(self.pending) >= self.max_pending:
+                self.counters['rejected'] += 1
+                raise Overloaded()
+            future = loop.create_future()
+            # Nobody may be left to read a failed search
+            future.add_done_callback(lambda done: done.cancelled() or done.exception())
+            entry = self.pending[key] = [future, deadline]
+            self.queue.put_nowait((key, game, position))
+        else:
+            self.counters['deduplicated'] += 1
+            entry[1] = max(entry[1], deadline)
+
+        try:
+            result = await asyncio.wait_for(asyncio.shield(entry[0]), max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            self.counters['deadline_exceeded'] += 1
+            raise
+        return dict(result, cached=False)
+
+    async def run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.slots.acquire()
+            jobs = [await self.queue.get()]
+            window_end = loop.time() + BATCH_WINDOW
+            while len(jobs) < self.batch_size:
+                if self.queue.empty():
+                    remaining = window_end - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        jobs.append(await asyncio.wait_for(self.queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    jobs.append(self.queue.get_nowait())
+
+            # Shed positions every request for which has already given up
+            now = loop.time()
+            live = []
+            for job in jobs:
+                future, deadline = self.pending[job[0]]
+                if deadline <= now:
+                    del self.pending[job[0]]
+                    future.set_exception(asyncio.TimeoutError())
+                    self.counters['expired'] += 1
+                else:
+                    live.append(job)
+            if not live:
+                self.slots.release()
+                continue
+
+            self.counters['batches'] += 1
+            self.counters['searches'] += len(live)
+            batch = loop.run_in_executor(self.executor, search_batch, [(game, position) for _, game, position in live])
+            batch.add_done_callback(lambda done, live=live: self.finish_batch(live, done))
+
+    def finish_batch(self, jobs, done):
+        self.slots.release()
+        error = done.exception()
+        for index, (key, _, _) in enumerate(jobs):
+            future, _ = self.pending.pop(key)
+            if error is not None:
+                future.set_exception(error)
+                continue
+            result = done.result()[index]
+            self.cache[key] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            future.set_result(result)
+
+    async def answer(self, request):
+        """HTTP status and JSON body for one move request"""
+        try:
+            return 200, await self.best_move(request)
+        except Overloaded:
+            return 503, {'error': "too many positions pending, retry later"}
+        except asyncio.TimeoutError:
+            return 504, {'error': "deadline exceeded"}
+        except (ValueError, TypeError) as error:
+            return 400, {'error': str(error)}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if len(parts) != 3:
+                    await self.respond(writer, 400, {'error': "bad request line"}, close=True)
+                    break
+                method, path, _ = parts
+                if path == '/ws' and headers.get('upgrade', '').lower() == 'websocket':
+                    await self.websocket(reader, writer, headers)
+                    break
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY:
+                    await self.respond(writer, 413, {'error': "request too large"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                close = headers.get('connection', '').lower() == 'close'
+                status, payload = await self.route(method, path, body)
+                await self.respond(writer, status, payload, close)
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        path = path.split('?')[0]
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok'}
+        if method == 'GET' and path == '/stats':
+            return 200, self.stats()
+        if method == 'POST' and path == '/move':
+            try:
+                request = json.loads(body)
+            except ValueError:
+                return 400, {'error': "body is not JSON"}
+            return await self.answer(request)
+        return 404, {'error': "POST /move, GET /stats, GET /health or a WebSocket on /ws"}
+
+    async def respond(self, writer, status, payload, close=False):
+        body = json.dumps(payload).encode()
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n")
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        if close:
+            head += "Connection: close\r\n"
+        writer.write(head.encode() + b"\r\n" + body)
+        await writer.drain()
+
+    async def websocket(self, reader, writer, headers):
+        """Each text message is a move request; answers echo its 'id' and may come out of order"""
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {websocket_accept(headers.get('sec-websocket-key', ''))}\r\n\r\n").encode())
+        await writer.drain()
+        in_flight = asyncio.Semaphore(WS_IN_FLIGHT)
+        send_lock = asyncio.Lock()
+        tasks = set()
+
+        async def send(opcode, payload):
+            async with send_lock:
+                writer.write(encode_frame(opcode, payload))
+                await writer.drain()
+
+        async def reply(message):
+            try:
+                try:
+                    request = json.loads(message)
+                except ValueError:
+                    status, payload = 400, {'error': "message is not JSON"}
+                else:
+                    status, payload = await self.answer(request)
+                    if isinstance(request, dict) and 'id' in request:
+                        payload['id'] = request['id']
+                await send(WS_TEXT, json.dumps(dict(payload, status=status)).encode())
+            except ConnectionError:
+                pass
+            finally:
+                in_flight.release()
+
+        try:
+            while True:
+                opcode, payload = await read_frame(reader)
+                if opcode == WS_CLOSE:
+                    await send(WS_CLOSE, payload[:2])
+                    break
+                if opcode == WS_PING:
+                    await send(WS_PONG, payload)
+                elif opcode == WS_TEXT:
+                    # Stop reading, and so let TCP push back, while the client has too many requests open
+                    await in_flight.acquire()
+                    task = asyncio.create_task(reply(payload))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+async def serve(host, port, workers, cache_size, max_pending, batch_size):
+    service = AIService(workers, cache_size, max_pending, batch_size)
+    server = await service.start(host, port)
+    print(f"AI service on http://{host}:{port} (POST /move, WebSocket /ws) with {service.workers} workers")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='engines.service',
+                                     description="Serve the AIs' best moves over HTTP and WebSocket")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, help="search processes (default: one per CPU)")
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help="positions kept in the result cache")
+    parser.add_argument('--max-pending', type=int, default=MAX_PENDING,
+                        help="distinct positions waiting for a search before requests are refused")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.cache_size, args.max_pending, args.batch_size))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
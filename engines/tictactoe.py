@@ -0,0 +1,141 @@
+import argparse
+import sys
+
+from engines.search import Search, SearchStats
+
+
+WINNING_COMBINATIONS = [
+    [0, 1, 2], [3, 4, 5], [6, 7, 8],  # rows
+    [0, 3, 6], [1, 4, 7], [2, 5, 8],  # columns
+    [0, 4, 8], [2, 4, 6]              # diagonals
+]
+
+
+class TicTacToeState:
+    """Tic Tac Toe position for the shared search"""
+    def __init__(self, board, player):
+        self.board = board
+        self.player = player
+        self.filled = 9 - board.count('')
+
+    def copy(self):
+        return TicTacToeState(self.board[:], self.player)
+
+    def legal_moves(self):
+        return [i for i in range(9) if self.board[i] == '']
+
+    def apply(self, move):
+        self.board[move] = self.player
+        self.filled += 1
+        self.player = 'X' if self.player == 'O' else 'O'
+
+    def undo(self, move):
+        self.board[move] = ''
+        self.filled -= 1
+        self.player = 'X' if self.player == 'O' else 'O'
+
+    def winner(self):
+        board = self.board
+        for a, b, c in WINNING_COMBINATIONS:
+            if board[a] == board[b] == board[c] != '':
+                return board[a]
+        return None
+
+    def is_terminal(self):
+        return self.filled == 9 or self.winner() is not None
+
+    def key(self):
+        return ''.join(cell or '.' for cell in self.board)
+
+    def evaluate(self):
+        """Only the player who just moved can have won; quicker wins score higher"""
+        if self.winner() is not None:
+            return self.filled - 10
+        return 0
+
+
+class TicTacToeAI:
+    def __init__(self):
+        self.winning_combinations = WINNING_COMBINATIONS
+        self.stats = SearchStats()
+    
+    def get_best_move(self, board):
+        """Perfect play for O from a full alpha-beta search"""
+        search = Search()
+        move, _ = search.best_move(TicTacToeState(board[:], 'O'), board.count(''))
+        self.stats = search.stats
+        return move
+    
+    def check_winner(self, board):
+        for combo in self.winning_combinations:
+            if (board[combo[0]] == board[combo[1]] == board[combo[2]] != ''):
+                return board[combo[0]]
+        return None
+    
+    def is_board_full(self, board):
+        return '' not in board
+
+
+def parse_position(text):
+    """Board from nine characters, row by row: X, O and . (or -) for empty"""
+    cells = [char for char in text if not char.isspace()]
+    if len(cells) != 9 or any(char not in 'XOxo.-' for char in cells):
+        raise ValueError("a Tic Tac Toe position is nine characters of X, O and .")
+    return ['' if char in '.-' else char.upper() for char in cells]
+
+
+def format_board(board):
+    rows = []
+    for row in range(3):
+        rows.append(' '.join(board[row * 3 + col] or str(row * 3 + col + 1) for col in range(3)))
+    return '\n'.join(rows)
+
+
+def play(ai):
+    """Play as X against the AI in the terminal"""
+    board = [''] * 9
+    player = 'X'
+    while not ai.check_winner(board) and not ai.is_board_full(board):
+        if player == 'X':
+            print(format_board(board))
+            try:
+                index = int(input("Your move (1-9): ")) - 1
+            except ValueError:
+                continue
+            if not 0 <= index < 9 or board[index]:
+                continue
+        else:
+            index = ai.get_best_move(board)
+            print(f"AI plays {index + 1}")
+        board[index] = player
+        player = 'O' if player == 'X' else 'X'
+
+    print(format_board(board))
+    winner = ai.check_winner(board)
+    print(f"{winner} wins!" if winner else "It's a draw!")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='engines tictactoe',
+                                     description="Play Tic Tac Toe against the AI or ask for its move")
+    parser.add_argument('--position', help="nine characters of X, O and ., row by row; prints O's best cell (1-9)")
+    args = parser.parse_args(argv)
+
+    ai = TicTacToeAI()
+    if args.position is None:
+        try:
+            play(ai)
+        except (EOFError, KeyboardInterrupt):
+            print()
+        return 0
+    try:
+        board = parse_position(args.position)
+    except ValueError as error:
+        parser.error(str(error))
+    move = ai.get_best_move(board)
+    print(move + 1 if move is not None else "none")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
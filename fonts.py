@@ -0,0 +1,57 @@
+from collections import OrderedDict
+
+import pygame
+
+# Rendered text surfaces kept before the least recently used ones are dropped
+TEXT_CACHE_SIZE = 512
+
+_fonts = {}
+
+
+def get_font(size, name=None):
+    """Shared pygame Font for (name, size), created on first use"""
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = pygame.font.Font(name, size)
+        _fonts[key] = font
+    return font
+
+
+class TextCache:
+    """Bounded LRU cache of rendered text surfaces.
+
+    Keys are (font, text, antialias, color); fonts come from get_font(),
+    so the same label is only rendered once while it is on screen.
+    """
+    def __init__(self, max_entries=TEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, antialias, color):
+        key = (font, text, antialias, tuple(color))
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+text_cache = TextCache()
+
+
+def render_text(font, text, color, antialias=True):
+    """Render text through the shared cache; callers must not draw on the result"""
+    return text_cache.render(font, text, antialias, color)
@@ -1,179 +1,52 @@
+import time
 import pygame
-import random
-
-class ConnectFourAI:
-    def __init__(self):
-        self.rows = 6
-        self.cols = 7
-    
-    def minimax(self, board, depth, alpha, beta, maximizing):
-        winner = self.check_winner(board)
-        if winner == 2:  # AI wins
-            return 1000000
-        elif winner == 1:  # Player wins
-            return -1000000
-        elif self.is_board_full(board):  # Tie
-            return 0
-        elif depth == 0:  # Reached max depth
-            return self.evaluate_board(board)
-        
-        valid_moves = self.get_valid_moves(board)
-        
-        if maximizing:  # AI's turn
-            value = float('-inf')
-            for col in valid_moves:
-                row = self.get_next_open_row(board, col)
-                temp_board = [row[:] for row in board]
-                self.drop_piece(temp_board, row, col, 2)
-                
-                new_score = self.minimax(temp_board, depth - 1, alpha, beta, False)
-                value = max(value, new_score)
-                alpha = max(alpha, value)
-                
-                if alpha >= beta:
-                    break
-            return value
-        else:  # Player's turn
-            value = float('inf')
-            for col in valid_moves:
-                row = self.get_next_open_row(board, col)
-                temp_board = [row[:] for row in board]
-                self.drop_piece(temp_board, row, col, 1)
-                
-                new_score = self.minimax(temp_board, depth - 1, alpha, beta, True)
-                value = min(value, new_score)
-                beta = min(beta, value)
-                
-                if alpha >= beta:
-                    break
-            return value
-    
-    def get_best_move(self, board):
-        valid_moves = self.get_valid_moves(board)
-        if not valid_moves:
-            return 3
-        
-        # Check for immediate winning moves
-        for col in valid_moves:
-            row = self.get_next_open_row(board, col)
-            temp_board = [row[:] for row in board]
-            self.drop_piece(temp_board, row, col, 2)
-            if self.check_winner(temp_board) == 2:
-                return col
-        
-        # Check for blocking moves
-        for col in valid_moves:
-            row = self.get_next_open_row(board, col)
-            temp_board = [row[:] for row in board]
-            self.drop_piece(temp_board, row, col, 1)
-            if self.check_winner(temp_board) == 1:
-                return col
-        
-        # Use minimax for best strategic move
-        best_score = float('-inf')
-        best_col = random.choice(valid_moves)
-        
-        for col in valid_moves:
-            row = self.get_next_open_row(board, col)
-            temp_board = [row[:] for row in board]
-            self.drop_piece(temp_board, row, col, 2)
-            
-            score = self.minimax(temp_board, 4, float('-inf'), float('inf'), False)
-            
-            if score > best_score:
-                best_score = score
-                best_col = col
-        
-        return best_col
-    
-    def get_valid_moves(self, board):
-        return [col for col in range(self.cols) if board[0][col] == 0]
-    
-    def get_next_open_row(self, board, col):
-        for row in range(self.rows - 1, -1, -1):
-            if board[row][col] == 0:
-                return row
-        return -1
-    
-    def drop_piece(self, board, row, col, piece):
-        board[row][col] = piece
-    
-    def check_winner(self, board):
-        # Check horizontal
-        for row in range(self.rows):
-            for col in range(self.cols - 3):
-                if board[row][col] != 0 and board[row][col] == board[row][col+1] == board[row][col+2] == board[row][col+3]:
-                    return board[row][col]
-        
-        # Check vertical
-        for row in range(self.rows - 3):
-            for col in range(self.cols):
-                if board[row][col] != 0 and board[row][col] == board[row+1][col] == board[row+2][col] == board[row+3][col]:
-                    return board[row][col]
-        
-        # Check diagonal (positive slope)
-        for row in range(self.rows - 3):
-            for col in range(self.cols - 3):
-                if board[row][col] != 0 and board[row][col] == board[row+1][col+1] == board[row+2][col+2] == board[row+3][col+3]:
-                    return board[row][col]
-        
-        # Check diagonal (negative slope)
-        for row in range(3, self.rows):
-            for col in range(self.cols - 3):
-                if board[row][col] != 0 and board[row][col] == board[row-1][col+1] == board[row-2][col+2] == board[row-3][col+3]:
-                    return board[row][col]
-        
-        return 0
-    
-    def is_board_full(self, board):
-        return all(board[0][col] != 0 for col in range(self.cols))
-    
-    def evaluate_board(self, board):
-        score = 0
-        
-        # Center column preference
-        center_col = self.cols // 2
-        center_count = sum(1 for row in range(self.rows) if board[row][center_col] == 2)
-        score += center_count * 3
-        
-        # Evaluate windows of 4
-        for row in range(self.rows):
-            for col in range(self.cols - 3):
-                window = [board[row][col+i] for i in range(4)]
-                score += self.evaluate_window(window)
-        
-        return score
-    
-    def evaluate_window(self, window):
-        score = 0
-        ai_count = window.count(2)
-        player_count = window.count(1)
-        empty_count = window.count(0)
-        
-        if ai_count == 4:
-            score += 100
-        elif ai_count == 3 and empty_count == 1:
-            score += 5
-        elif ai_count == 2 and empty_count == 2:
-            score += 2
-        
-        if player_count == 3 and empty_count == 1:
-            score -= 4
-        
-        return score
+from engines.connect_four import ConnectFourAI
+from ai_worker import AIWorker, Ponderer
+from fonts import render_text
+from game_log import connect_four_values, game_recorder
+from surface_pool import filled_surface
 
 class ConnectFourGame:
-    def __init__(self, screen, colors):
+    def __init__(self, screen, colors, ai_worker=None):
         self.screen = screen
         self.colors = colors
         self.ai = ConnectFourAI()
+        self.ai_worker = ai_worker or AIWorker()
+        self.ai_request = None
+        # Stats of the AI's last decision, shown by the hub's overlay
+        self.search_stats = None
+        self.ponderer = Ponderer(self.ai_worker, self)
+        # Static board card and piece sprites, rebuilt when the layout or colors change
+        self.board_layer = None
+        self.board_layer_key = None
+        self.piece_sprites = {}
         self.reset_game()
     
     def reset_game(self):
+        self.cancel_ai()
         self.board = [[0 for _ in range(7)] for _ in range(6)]
         self.current_player = 1
         self.game_over = False
         self.winner = None
+        self.started_at = time.time()
+        self.record = game_recorder.start_game('connect_four', self.record_position)
+        self.redraw = True
+    
+    def record_position(self):
+        return connect_four_values(self.board)
+    
+    def snapshot(self):
+        """The game as small integers for the session file"""
+        return self.record_position() + [self.current_player, int(self.game_over),
+                                         self.winner or 0, int(self.started_at)]
+    
+    def restore(self, values):
+        self.reset_game()
+        self.board = [values[row * 7:row * 7 + 7] for row in range(6)]
+        self.current_player, game_over, winner, self.started_at = values[42:46]
+        self.game_over = bool(game_over)
+        self.winner = winner or None
+        self.record = game_recorder.start_game('connect_four', self.record_position)
     
     def handle_click(self, pos):
         if hasattr(self, 'reset_button') and self.reset_button.collidepoint(pos):
@@ -193,6 +66,7 @@ class ConnectFourGame:
                 for row in range(5, -1, -1):
                     if self.board[row][col] == 0:
                         self.board[row][col] = 1
+                        self.record.move(col)
                         
                         # Check for win
                         winner = self.ai.check_winner(self.board)
@@ -205,15 +79,72 @@ class ConnectFourGame:
                             self.current_player = 2
                         break
     
+    def cancel_ai(self):
+        """Drop the AI search in progress, if any"""
+        self.ai_worker.cancel(self)
+        self.ai_request = None
+        self.ponderer.stop()
+    
+    def is_ai_thinking(self):
+        return self.ai_request is not None
+    
+    def hover_rects(self):
+        """Screen areas whose look depends on the mouse position"""
+        if not hasattr(self, 'board_rect'):
+            return []
+        return [self.board_rect, self.reset_button]
+    
+    def animation_rects(self):
+        return []
+    
+    def likely_replies(self):
+        """Searches for the AI's answer to each column the human may play, centre first"""
+        replies = []
+        for col in sorted(self.ai.get_valid_moves(self.board), key=lambda col: abs(col - 3)):
+            board = [row[:] for row in self.board]
+            self.ai.drop_piece(board, self.ai.get_next_open_row(board, col), col, 1)
+            if self.ai.check_winner(board) or self.ai.is_board_full(board):
+                continue
+            replies.append((self.ai.board_key(board), self.ai.get_best_move, (board,)))
+        return replies
+    
     def update(self):
+        if self.current_player == 1 and not self.game_over:
+            # Ponder while the human decides
+            self.ponderer.start(self.ai.board_key(self.board), self.likely_replies)
+            self.ponderer.collect()
+        
         if (self.current_player == 2 and not self.game_over):
-            # AI move
-            best_col = self.ai.get_best_move(self.board)
+            # AI move, searched on the background worker
+            key = self.ai.board_key(self.board)
+            if self.ai_request is None:
+                # Answer at once if this reply was pondered, else reuse its running search
+                found, best_col = self.ponderer.answer(key)
+                if found:
+                    self.search_stats = self.ponderer.stats.get(key)
+                else:
+                    board_copy = [row[:] for row in self.board]
+                    self.ai_request = (self.ponderer.adopt(key) or
+                                       self.ai_worker.submit(self, key, self.ai.get_best_move, board_copy))
+                self.ponderer.stop()
+                if not found:
+                    return
+            else:
+                finished, best_col = self.ai_worker.take_result(self.ai_request, key)
+                if not finished:
+                    return
+                if best_col is not None:
+                    self.search_stats = self.ai_request.stats
+                self.ai_request = None
+            self.redraw = True
+            if best_col is None:
+                return
             
             # Find the lowest empty row in the chosen column
             for row in range(5, -1, -1):
                 if self.board[row][best_col] == 0:
                     self.board[row][best_col] = 2
+                    self.record.move(best_col)
                     
                     # Check for win
                     winner = self.ai.check_winner(self.board)
@@ -226,14 +157,39 @@ class ConnectFourGame:
                         self.current_player = 1
                     break
     
+    def build_board_layer(self, card_width, card_height, board_width, board_height, cell_size):
+        """Pre-render the board card with its empty holes and the piece sprites"""
+        layer = pygame.Surface((card_width, card_height), pygame.SRCALPHA)
+        pygame.draw.rect(layer, self.colors['card_bg'], layer.get_rect(), border_radius=30)
+        
+        # Board background with rounded corners
+        board_x = (card_width - board_width) // 2
+        board_y = (card_height - board_height) // 2
+        pygame.draw.rect(layer, self.colors['accent_blue'],
+                        pygame.Rect(board_x - 10, board_y - 10, board_width + 20, board_height + 20),
+                        border_radius=20)
+        
+        # Empty holes
+        for row in range(6):
+            for col in range(7):
+                center = (board_x + col * cell_size + cell_size // 2, board_y + row * cell_size + cell_size // 2)
+                pygame.draw.circle(layer, self.colors['card_bg'], center, 20)
+        self.board_layer = layer
+        
+        self.piece_sprites = {}
+        for player, color in ((1, self.colors['accent_red']), (2, self.colors['accent_orange'])):
+            sprite = pygame.Surface((cell_size, cell_size), pygame.SRCALPHA)
+            pygame.draw.circle(sprite, color, (cell_size // 2, cell_size // 2), 18)
+            self.piece_sprites[player] = sprite
+    
     def draw(self, mouse_pos, body_font, title_font, subheading_font):
         # Title
-        title_surface = title_font.render("Connect Four", True, self.colors['text_white'])
+        title_surface = render_text(title_font, "Connect Four", self.colors['text_white'])
         title_rect = title_surface.get_rect(centerx=self.screen.get_width() // 2, y=50)
         self.screen.blit(title_surface, title_rect)
         
         # Subtitle
-        subtitle_surface = body_font.render("Minimax with Alpha-Beta Pruning", True, self.colors['text_white'])
+        subtitle_surface = render_text(body_font, "Minimax with Alpha-Beta Pruning", self.colors['text_white'])
         subtitle_rect = subtitle_surface.get_rect(centerx=self.screen.get_width() // 2, y=90)
         self.screen.blit(subtitle_surface, subtitle_rect)
         
@@ -244,8 +200,6 @@ class ConnectFourGame:
         board_card_y = 150
         board_card_rect = pygame.Rect(board_card_x, board_card_y, board_card_width, board_card_height)
         
-        pygame.draw.rect(self.screen, self.colors['card_bg'], board_card_rect, border_radius=30)
-        
         # Game board
         board_width = 350
         board_height = 300
@@ -253,28 +207,20 @@ class ConnectFourGame:
         board_y = board_card_y + (board_card_height - board_height) // 2
         cell_size = 50
         
-        # Board background with rounded corners
-        pygame.draw.rect(self.screen, self.colors['accent_blue'], 
-                        pygame.Rect(board_x - 10, board_y - 10, board_width + 20, board_height + 20), 
-                        border_radius=20)
+        # Card, board and the 42 empty holes come from the cached board layer
+        layer_key = (board_card_rect.size, self.colors['card_bg'], self.colors['accent_blue'],
+                     self.colors['accent_red'], self.colors['accent_orange'])
+        if layer_key != self.board_layer_key:
+            self.build_board_layer(board_card_width, board_card_height, board_width, board_height, cell_size)
+            self.board_layer_key = layer_key
+        self.screen.blit(self.board_layer, board_card_rect)
         
-        # Draw cells
+        # Pieces
         for row in range(6):
             for col in range(7):
-                x = board_x + col * cell_size
-                y = board_y + row * cell_size
-                
-                # Cell background
-                pygame.draw.circle(self.screen, self.colors['card_bg'], 
-                                 (x + cell_size // 2, y + cell_size // 2), 20)
-                
-                # Piece
-                if self.board[row][col] == 1:
-                    pygame.draw.circle(self.screen, self.colors['accent_red'], 
-                                     (x + cell_size // 2, y + cell_size // 2), 18)
-                elif self.board[row][col] == 2:
-                    pygame.draw.circle(self.screen, self.colors['accent_orange'], 
-                                     (x + cell_size // 2, y + cell_size // 2), 18)
+                if self.board[row][col]:
+                    self.screen.blit(self.piece_sprites[self.board[row][col]],
+                                     (board_x + col * cell_size, board_y + row * cell_size))
         
         # Column indicators
         for col in range(7):
@@ -286,8 +232,7 @@ class ConnectFourGame:
             
             if is_hovered and not self.game_over and self.current_player == 1:
                 # Column highlight
-                highlight_surface = pygame.Surface((cell_size, board_height + 50), pygame.SRCALPHA)
-                highlight_surface.fill((255, 255, 255, 50))
+                highlight_surface = filled_surface((cell_size, board_height + 50), (255, 255, 255, 50))
                 self.screen.blit(highlight_surface, (board_x + col * cell_size, board_y - 50))
             
             # Arrow
@@ -315,7 +260,7 @@ class ConnectFourGame:
                 status = "Your turn - Click a column to drop your piece"
                 status_color = self.colors['text_white']
         
-        status_surface = subheading_font.render(status, True, status_color)
+        status_surface = render_text(subheading_font, status, status_color)
         status_rect = status_surface.get_rect(centerx=self.screen.get_width() // 2, y=status_y)
         self.screen.blit(status_surface, status_rect)
         
@@ -326,12 +271,10 @@ class ConnectFourGame:
         reset_color = self.colors['button_hover'] if reset_hovered else self.colors['button_primary']
         pygame.draw.rect(self.screen, reset_color, reset_button, border_radius=25)
         
-        reset_text = body_font.render("Reset", True, self.colors['text_white'])
+        reset_text = render_text(body_font, "Reset", self.colors['text_white'])
         reset_text_rect = reset_text.get_rect(center=reset_button.center)
         self.screen.blit(reset_text, reset_text_rect)
         
         self.reset_button = reset_button
         self.board_rect = pygame.Rect(board_x, board_y - 50, board_width, board_height + 50)
         self.cell_size = cell_size
-
-print("ConnectFour module loaded successfully!")
\ No newline at end of file
@@ -0,0 +1,162 @@
+import csv
+import time
+from array import array
+
+import pygame
+
+from fonts import render_text
+
+# Frames kept for the graph, the percentiles and the CSV dump
+FRAME_HISTORY = 1200
+# Frames shown by the on-screen graph, one bar each
+GRAPH_FRAMES = 144
+PHASES = ('handle_events', 'update', 'draw')
+PHASE_COLORS = {'handle_events': 'accent_blue', 'update': 'accent_green', 'draw': 'accent_orange'}
+
+
+class RingBuffer:
+    """Fixed number of floats; appending past the end overwrites the oldest"""
+    def __init__(self, size):
+        self.size = size
+        self.data = array('d', [0.0]) * size
+        self.count = 0
+
+    def append(self, value):
+        self.data[self.count % self.size] = value
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def values(self):
+        """Stored values, oldest first"""
+        if self.count <= self.size:
+            return self.data[:self.count].tolist()
+        start = self.count % self.size
+        return (self.data[start:] + self.data[:start]).tolist()
+
+    def last(self, count):
+        return self.values()[-count:]
+
+
+def percentiles(values, points=(50, 95, 99)):
+    if not values:
+        return {point: 0.0 for point in points}
+    ordered = sorted(values)
+    return {point: ordered[min(len(ordered) - 1, len(ordered) * point // 100)] for point in points}
+
+
+class FrameProfiler:
+    """Per-phase frame timings, click-to-flip latency and frame times per screen.
+
+    The hub marks the end of every phase of its loop. Everything is kept
+    in ring buffers, so the cost per frame is a few clock reads and array
+    writes however long the hub runs.
+    """
+    def __init__(self, size=FRAME_HISTORY):
+        self.size = size
+        self.phases = {phase: RingBuffer(size) for phase in PHASES}
+        self.frame_ms = RingBuffer(size)
+        self.latency_ms = RingBuffer(size)     # per frame, 0 when no click was shown
+        self.frame_states = [None] * size
+        self.state_frame_ms = {}               # state -> RingBuffer of painted frame times
+        self.clicks = RingBuffer(256)
+        self.frame_started = 0.0
+        self.phase_started = 0.0
+        self.current = {}
+        self.pending_click = None
+        self.click_latency = 0.0
+        self.graph_visible = False
+
+    def begin_frame(self):
+        self.frame_started = self.phase_started = time.perf_counter()
+        self.click_latency = 0.0
+
+    def mark(self, phase):
+        """End the phase that started at the previous mark"""
+        now = time.perf_counter()
+        self.current[phase] = (now - self.phase_started) * 1000
+        self.phase_started = now
+
+    def click(self):
+        """A click arrived; the next frame on screen shows its result"""
+        if self.pending_click is None:
+            self.pending_click = time.perf_counter()
+
+    def presented(self):
+        """The frame was flipped or updated on the display"""
+        if self.pending_click is not None:
+            self.click_latency = (time.perf_counter() - self.pending_click) * 1000
+            self.clicks.append(self.click_latency)
+            self.pending_click = None
+
+    def end_frame(self, state, painted):
+        frame_ms = (time.perf_counter() - self.frame_started) * 1000
+        self.frame_states[self.frame_ms.count % self.size] = state
+        for phase in PHASES:
+            self.phases[phase].append(self.current.get(phase, 0.0))
+        self.frame_ms.append(frame_ms)
+        self.latency_ms.append(self.click_latency)
+        if painted:
+            if state not in self.state_frame_ms:
+                self.state_frame_ms[state] = RingBuffer(self.size)
+            self.state_frame_ms[state].append(frame_ms)
+        return frame_ms
+
+    def summary(self):
+        """Frame time percentiles per state and click-to-flip percentiles"""
+        lines = []
+        for state, buffer in sorted(self.state_frame_ms.items()):
+            points = percentiles(buffer.values())
+            lines.append(f"{state}: {len(buffer)} frames, p50 {points[50]:.2f} ms, "
+                         f"p95 {points[95]:.2f} ms, p99 {points[99]:.2f} ms")
+        if len(self.clicks):
+            points = percentiles(self.clicks.values())
+            lines.append(f"click to flip: {len(self.clicks)} clicks, p50 {points[50]:.2f} ms, "
+                         f"p95 {points[95]:.2f} ms, p99 {points[99]:.2f} ms")
+        return lines
+
+    def dump_csv(self, path):
+        """Write the kept frames, oldest first, one row per frame"""
+        frames = len(self.frame_ms)
+        first = self.frame_ms.count - frames
+        columns = [self.phases[phase].values() for phase in PHASES]
+        frame_ms = self.frame_ms.values()
+        latency = self.latency_ms.values()
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['frame', 'state'] + [f'{phase}_ms' for phase in PHASES] +
+                            ['frame_ms', 'click_to_flip_ms'])
+            for index in range(frames):
+                frame = first + index
+                writer.writerow([frame, self.frame_states[frame % self.size]] +
+                                [f"{column[index]:.3f}" for column in columns] +
+                                [f"{frame_ms[index]:.3f}", f"{latency[index]:.3f}" if latency[index] else ''])
+
+    def draw_graph(self, screen, rect, font, colors, state, budget_ms):
+        """Stacked bars of the last frames' phases, the frame budget and percentiles"""
+        pygame.draw.rect(screen, colors['text_primary'], rect, border_radius=16)
+        title = render_text(font, "Frame time (F5)", colors['accent_orange'])
+        screen.blit(title, (rect.x + 16, rect.y + 10))
+
+        plot = pygame.Rect(rect.x + 16, rect.y + 36, rect.width - 32, rect.height - 80)
+        scale = plot.height / (2 * budget_ms)
+        bar_width = max(1, plot.width // GRAPH_FRAMES)
+        columns = [self.phases[phase].last(GRAPH_FRAMES) for phase in PHASES]
+        for index in range(len(columns[0])):
+            x = plot.x + index * bar_width
+            bottom = plot.bottom
+            for phase, column in zip(PHASES, columns):
+                height = min(int(column[index] * scale), bottom - plot.y)
+                if height > 0:
+                    pygame.draw.rect(screen, colors[PHASE_COLORS[phase]], (x, bottom - height, bar_width, height))
+                    bottom -= height
+        budget_y = plot.bottom - int(budget_ms * scale)
+        pygame.draw.line(screen, colors['error'], (plot.x, budget_y), (plot.right, budget_y))
+
+        buffer = self.state_frame_ms.get(state)
+        points = percentiles(buffer.values() if buffer else [])
+        text = f"p50 {points[50]:.1f}  p95 {points[95]:.1f}  p99 {points[99]:.1f} ms"
+        if len(self.clicks):
+            text += f"  click {self.clicks.last(1)[0]:.0f} ms"
+        screen.blit(render_text(font, text, colors['text_white']), (rect.x + 16, rect.bottom - 34))
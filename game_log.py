@@ -0,0 +1,320 @@
+import os
+import queue
+import struct
+import threading
+import time
+
+LOG_PATH = 'game_records.bin'
+INDEX_PATH = 'game_records.idx'
+MAGIC = b'HUBLOG1\n'
+
+# A keyframe with the whole position is written every this many moves of a game
+KEYFRAME_INTERVAL = 32
+# Records are appended together once this many are queued or this many seconds passed
+BATCH_SIZE = 256
+FLUSH_SECONDS = 1.0
+
+# Record kinds. Every record is its kind byte, the payload length as a varint
+# and a payload of varints:
+#   START     game id, game code, start time (ms since the epoch), RNG seed
+#   KEYFRAME  game id, moves played, game code, position values
+#   MOVE      game id, ms since the previous record of the game, move code
+#   END       game id, ms since the previous record of the game, result code, score
+START, KEYFRAME, MOVE, END = 1, 2, 3, 4
+
+GAME_CODES = {'tic_tac_toe': 0, 'connect_four': 1, 'game_2048': 2, 'dots_and_boxes': 3}
+GAME_NAMES = {code: name for name, code in GAME_CODES.items()}
+RESULT_CODES = {'draw': 0, 'player': 1, 'ai': 2, 'over': 3}
+RESULT_NAMES = {code: name for name, code in RESULT_CODES.items()}
+
+# Index entries: game id, moves played and log offset of every keyframe
+INDEX_ENTRY = struct.Struct('<IIQ')
+
+
+def encode_varint(value, out):
+    """Append an unsigned LEB128 varint to a bytearray"""
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, offset):
+    """Value and next offset of the varint at data[offset]"""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def encode_record(kind, values):
+    payload = bytearray()
+    for value in values:
+        encode_varint(value, payload)
+    record = bytearray([kind])
+    encode_varint(len(payload), record)
+    return record + payload
+
+
+def decode_values(payload):
+    values = []
+    offset = 0
+    while offset < len(payload):
+        value, offset = decode_varint(payload, offset)
+        values.append(value)
+    return values
+
+
+def read_varint(file):
+    value = 0
+    shift = 0
+    while True:
+        byte = file.read(1)
+        if not byte:
+            return None
+        value |= (byte[0] & 0x7f) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+
+def iter_records(file, offset=len(MAGIC)):
+    """(offset, kind, values) of every record from offset on.
+
+    Stops quietly at a record cut short, e.g. by a crash during a write.
+    """
+    file.seek(offset)
+    while True:
+        kind = file.read(1)
+        if not kind:
+            return
+        length = read_varint(file)
+        payload = file.read(length) if length is not None else b''
+        if length is None or len(payload) < length:
+            return
+        yield offset, kind[0], decode_values(payload)
+        offset = file.tell()
+
+
+def records_end(file, offset=len(MAGIC)):
+    """Offset just past the last whole record from offset on"""
+    end = offset
+    for _ in iter_records(file, offset):
+        end = file.tell()
+    return end
+
+
+def build_index(log_path=LOG_PATH):
+    """Index entries of a log, rebuilt by scanning it"""
+    entries = []
+    if not os.path.exists(log_path):
+        return entries
+    with open(log_path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{log_path} is not a game record log")
+        for offset, kind, values in iter_records(file):
+            if kind == KEYFRAME:
+                entries.append((values[0], values[1], offset))
+    return entries
+
+
+def keyframe_at(log_path, entry):
+    """Whether the log holds the whole keyframe an index entry points to"""
+    game_id, moves, offset = entry
+    try:
+        with open(log_path, 'rb') as file:
+            for _, kind, values in iter_records(file, offset):
+                return kind == KEYFRAME and values[:2] == [game_id, moves]
+    except OSError:
+        pass
+    return False
+
+
+def read_index(index_path=INDEX_PATH, log_path=LOG_PATH):
+    """Index entries from the index file, or from the log if the file is missing or damaged"""
+    try:
+        with open(index_path, 'rb') as file:
+            data = file.read()
+    except OSError:
+        return build_index(log_path)
+    if len(data) % INDEX_ENTRY.size:
+        # An entry cut short by a crash
+        return build_index(log_path)
+    entries = [INDEX_ENTRY.unpack_from(data, offset) for offset in range(0, len(data), INDEX_ENTRY.size)]
+    if entries and not keyframe_at(log_path, entries[-1]):
+        return build_index(log_path)
+    return entries
+
+
+# Position values and move codes. Positions are flat lists of small
+# integers, so keyframes are mostly one byte per cell.
+
+def tictactoe_values(board):
+    return [' XO'.index(cell or ' ') for cell in board]
+
+
+def connect_four_values(board):
+    return [cell for row in board for cell in row]
+
+
+def game2048_values(grid):
+    """Tiles as exponents of two, 0 for empty"""
+    return [value.bit_length() - 1 if value else 0 for row in grid for value in row]
+
+
+def game2048_move(direction_index, spawn):
+    """Direction in the low two bits, then the new tile: 0 for none, else 1 + 2 * cell + (tile is 4)"""
+    if spawn is None:
+        return direction_index
+    row, col, value = spawn
+    return direction_index | (1 + 2 * (row * 4 + col) + (value == 4)) << 2
+
+
+def dots_values(rows, cols, horizontal_lines, vertical_lines, boxes, player):
+    """Board size, one flag per edge (horizontal rows first), box owners and the player to move"""
+    lines = [int(drawn) for row in horizontal_lines for drawn in row]
+    lines += [int(drawn) for row in vertical_lines for drawn in row]
+    return [rows, cols] + lines + [owner for row in boxes for owner in row] + [player]
+
+
+def dots_move(rows, cols, move_type, row, col):
+    """Edge number, horizontal edges first, as in engines.dots_endgame"""
+    if move_type == 'horizontal':
+        return row * cols + col
+    return (rows + 1) * cols + row * (cols + 1) + col
+
+
+class GameRecord:
+    """Recording of one game; the records go to the recorder's writer thread.
+
+    Nothing is written until the first move, so games that are opened and
+    left alone leave no trace in the log.
+    """
+    def __init__(self, recorder, game, position, seed):
+        self.recorder = recorder
+        self.game = game
+        self.code = GAME_CODES[game]
+        self.position = position
+        self.seed = seed
+        self.started_at = time.time()
+        self.initial = position()
+        self.moves = 0
+        self.last_time = self.started_at
+        self.finished = False
+        self.game_id = None     # assigned by the writer thread
+
+    def elapsed_ms(self):
+        now = time.time()
+        elapsed = int((now - self.last_time) * 1000)
+        self.last_time = now
+        return elapsed
+
+    def move(self, code):
+        """Record a move once it has been played"""
+        if self.finished:
+            return
+        if self.moves == 0:
+            self.recorder.put(self, START, [self.code, int(self.started_at * 1000), self.seed])
+            self.recorder.put(self, KEYFRAME, [0, self.code] + self.initial)
+        self.recorder.put(self, MOVE, [self.elapsed_ms(), code])
+        self.moves += 1
+        if self.moves % KEYFRAME_INTERVAL == 0:
+            self.recorder.put(self, KEYFRAME, [self.moves, self.code] + self.position())
+
+    def finish(self, result, score=None):
+        if self.finished or self.moves == 0:
+            return
+        self.finished = True
+        self.recorder.put(self, END, [self.elapsed_ms(), RESULT_CODES[result], score or 0])
+
+
+class GameRecorder:
+    """Appends game records to the log and keyframes to the index from a background thread"""
+    def __init__(self, path=LOG_PATH, index_path=INDEX_PATH):
+        self.path = path
+        self.index_path = index_path
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.next_id = None
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="game-log", daemon=True)
+                self.thread.start()
+        return self
+
+    def start_game(self, game, position, seed=0):
+        """A record for a new game; position() returns its position values"""
+        return GameRecord(self, game, position, seed)
+
+    def put(self, record, kind, values):
+        self.start()
+        self.queue.put((record, kind, values))
+
+    def close(self):
+        """Write everything queued and stop the writer"""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        entries = read_index(self.index_path, self.path)
+        if os.path.exists(self.path):
+            # A record cut short by a crash is dropped, so new records follow whole ones
+            with open(self.path, 'r+b') as file:
+                size = os.fstat(file.fileno()).st_size
+                end = records_end(file, entries[-1][2] if entries else len(MAGIC)) if size >= len(MAGIC) else 0
+                if end < size:
+                    file.truncate(end)
+                    entries = [entry for entry in entries if entry[2] < end]
+        self.next_id = max((entry[0] for entry in entries), default=0) + 1
+        if not os.path.exists(self.index_path) or os.path.getsize(self.index_path) != len(entries) * INDEX_ENTRY.size:
+            # Missing or out of step with the log: rewrite it from the log's keyframes
+            with open(self.index_path, 'wb') as file:
+                file.write(b''.join(INDEX_ENTRY.pack(*entry) for entry in entries))
+        with open(self.path, 'ab') as log, open(self.index_path, 'ab') as index:
+            if log.tell() == 0:
+                log.write(MAGIC)
+            while self.write_batch(log, index):
+                pass
+
+    def write_batch(self, log, index):
+        """Append one batch of queued records; False once the recorder is closed"""
+        items = [self.queue.get()]
+        deadline = time.monotonic() + FLUSH_SECONDS
+        while items[-1] is not None and len(items) < BATCH_SIZE:
+            try:
+                items.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        closing = items[-1] is None
+        if closing:
+            items.pop()
+
+        offset = log.tell()
+        data = bytearray()
+        entries = bytearray()
+        for record, kind, values in items:
+            if record.game_id is None:
+                record.game_id = self.next_id
+                self.next_id += 1
+            if kind == KEYFRAME:
+                entries += INDEX_ENTRY.pack(record.game_id, values[0], offset + len(data))
+            data += encode_record(kind, [record.game_id] + values)
+        # The log goes first, so the index never points past it
+        log.write(data)
+        log.flush()
+        index.write(entries)
+        index.flush()
+        return not closing
+
+
+game_recorder = GameRecorder()
@@ -1,10 +1,28 @@
+import time
+
+# Startup is timed from here to the first frame on screen
+START_TIME = time.perf_counter()
+
+import importlib
 import pygame
 import sys
 from enum import Enum
-from tic import TicTacToeGame
-from four import ConnectFourGame
-from g_2048 import Game2048
-from dotsboxes import DotsAndBoxesGame
+
+# NumPy is optional; without it the background gradient is drawn line by line once
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import metrics
+from ai_worker import AIWorker, PRIORITY_PONDER, enable_search_log
+from fonts import get_font, render_text
+from frame_stats import FrameProfiler
+from game_log import game_recorder
+from score_store import score_store
+from session_store import session_store
+from stats_overlay import StatsOverlay
+from surface_pool import rounded_rect_surface, quantize
 
 # Initialize Pygame
 pygame.init()
@@ -13,6 +31,12 @@ pygame.init()
 SCREEN_WIDTH = 1550
 SCREEN_HEIGHT = 800
 FPS = 80
+# Longest wait for input while nothing is animating or searching
+IDLE_TIMEOUT_MS = 250
+# Card hover scales are drawn in steps of this size so their shadows can be pooled
+HOVER_SCALE_STEP = 0.01
+# Frame timings of the last session are written here on exit
+FRAME_STATS_PATH = 'frame_stats.csv'
 
 # Modern UI Colors with warm sunset gradient
 COLORS = {
@@ -56,6 +80,23 @@ class GameState(Enum):
     GAME_2048 = "game_2048"
     DOTS_AND_BOXES = "dots_and_boxes"
 
+# Game modules are imported the first time their card is clicked
+GAME_CLASSES = {
+    GameState.TIC_TAC_TOE: ('tic', 'TicTacToeGame'),
+    GameState.CONNECT_FOUR: ('four', 'ConnectFourGame'),
+    GameState.GAME_2048: ('g_2048', 'Game2048'),
+    GameState.DOTS_AND_BOXES: ('dotsboxes', 'DotsAndBoxesGame'),
+}
+
+# AI engines imported and warmed on the AI worker after the first frame,
+# with the board arguments the games create them with
+AI_WARM_UPS = [
+    ('engines.tictactoe', 'TicTacToeAI', ()),
+    ('engines.connect_four', 'ConnectFourAI', ()),
+    ('engines.game2048', 'Game2048AI', ()),
+    ('engines.dots', 'DotsAndBoxesAI', (4, 4)),
+]
+
 class ModernAIGamesHub:
     def __init__(self):
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
@@ -69,41 +110,144 @@ class ModernAIGamesHub:
         
         # Animation for hover effects
         self.hover_scale = {}  # Track hover scale for each card
+        self.menu_animating = False
+        
+        # Screen areas to repaint on the next frame; a full redraw covers everything
+        self.full_redraw = True
+        self.dirty_rects = []
+        self.was_thinking = False
+        self.thinking_rect = pygame.Rect(SCREEN_WIDTH - 190, 30, 160, 40)
+        
+        # Background gradient, rebuilt only when the screen size or colors change
+        self.gradient_surface = None
+        self.gradient_key = None
         
         # Modern fonts
-        self.title_font = pygame.font.Font(None, 48)
-        self.heading_font = pygame.font.Font(None, 36)
-        self.subheading_font = pygame.font.Font(None, 28)
-        self.body_font = pygame.font.Font(None, 24)
-        self.caption_font = pygame.font.Font(None, 20)
-        
-        # Game instances
-        self.tic_tac_toe = TicTacToeGame(self.screen, COLORS)
-        self.connect_four = ConnectFourGame(self.screen, COLORS)
-        self.game_2048 = Game2048(self.screen, COLORS)
-        self.dots_and_boxes = DotsAndBoxesGame(self.screen, COLORS)
+        self.title_font = get_font(48)
+        self.heading_font = get_font(36)
+        self.subheading_font = get_font(28)
+        self.body_font = get_font(24)
+        self.caption_font = get_font(20)
+        
+        # All games search on one background AI worker
+        self.ai_worker = AIWorker()
+        enable_search_log()
+        
+        # Search stats of the last AI decision, toggled with F3 in any game
+        self.stats_overlay = StatsOverlay(pygame.Rect(30, SCREEN_HEIGHT - 230, 320, 200))
+        
+        # Phase timings of every frame, graphed with F5
+        self.frame_profiler = FrameProfiler()
+        self.frame_graph_rect = pygame.Rect(SCREEN_WIDTH - 350, SCREEN_HEIGHT - 230, 320, 200)
+        
+        # Game starts and ends seen so far, per screen, for the metrics
+        self.game_starts = {}
+        self.games_over = {}
+        self.metrics_exporters = metrics.start_exporters()
+        
+        # Results and high scores are written to SQLite by the store's own thread
+        self.score_store = score_store.start()
+        
+        # Games in progress at the last exit, resumed when each game is created
+        self.session_store = session_store
+        self.sessions = session_store.load()
+        self.saved_positions = {}
+        
+        # Game instances, created when their card is first clicked
+        self.games = {}
+        self.first_frame_shown = False
+    
+    def get_game(self, state):
+        """Import and create a game the first time it is needed"""
+        game = self.games.get(state)
+        if game is None:
+            module_name, class_name = GAME_CLASSES[state]
+            game_class = getattr(importlib.import_module(module_name), class_name)
+            game = game_class(self.screen, COLORS, ai_worker=self.ai_worker)
+            if state.value in self.sessions:
+                self.resume_game(state.value, game)
+            self.games[state] = game
+        return game
+    
+    def resume_game(self, name, game):
+        """Restore a saved session; a damaged one just leaves the new game"""
+        try:
+            game.restore(self.sessions[name])
+        except (IndexError, ValueError, StopIteration):
+            game.reset_game()
+            return
+        # Already counted when it started, and saved as it is
+        self.game_starts[name] = game.started_at
+        self.games_over[name] = game.game_over
+        self.saved_positions[name] = (game.started_at, game.record.moves)
+    
+    def current_game(self):
+        """The game instance for the current state, or None in the menu"""
+        if self.current_state == GameState.MENU:
+            return None
+        return self.get_game(self.current_state)
+    
+    def warm_up(self):
+        """Import the AI engines and page their tables in on the AI worker while the menu is idle.
+
+        Only engines are touched here; the games themselves are created on
+        the main thread when their card is clicked.
+        """
+        for module_name, class_name, args in AI_WARM_UPS:
+            ai = getattr(importlib.import_module(module_name), class_name)(*args)
+            if hasattr(ai, 'warm_up'):
+                ai.warm_up()
+    
+    def on_first_frame(self):
+        """Report the startup time and start the warm-up once the menu is on screen"""
+        self.first_frame_shown = True
+        print(f"First frame after {(time.perf_counter() - START_TIME) * 1000:.0f} ms")
+        self.ai_worker.submit(self, 'warm-up', self.warm_up, priority=PRIORITY_PONDER, measured=False)
         
     def draw_gradient_background(self):
         """Draw the beautiful warm sunset gradient background"""
-        for y in range(SCREEN_HEIGHT):
+        key = (self.screen.get_size(), COLORS['gradient_top'], COLORS['gradient_middle'], COLORS['gradient_bottom'])
+        if key != self.gradient_key:
+            self.gradient_surface = self.build_gradient_surface(*key)
+            self.gradient_key = key
+        self.screen.blit(self.gradient_surface, (0, 0))
+    
+    def build_gradient_surface(self, size, top, middle, bottom):
+        """Render the gradient once into a surface of the given size"""
+        width, height = size
+        surface = pygame.Surface(size)
+        
+        if numpy is not None:
+            # Top to middle (coral to peach) over the first 40%, then middle to bottom (peach to golden)
+            ratio = numpy.arange(height) / height
+            upper = ratio < 0.4
+            local_ratio = numpy.where(upper, ratio / 0.4, (ratio - 0.4) / 0.6)[:, None]
+            start = numpy.where(upper[:, None], numpy.array(top, dtype=float), numpy.array(middle, dtype=float))
+            end = numpy.where(upper[:, None], numpy.array(middle, dtype=float), numpy.array(bottom, dtype=float))
+            column = (start * (1 - local_ratio) + end * local_ratio).astype(numpy.int32)
+            pygame.surfarray.blit_array(surface, numpy.broadcast_to(column, (width, height, 3)))
+            return surface
+        
+        for y in range(height):
             # Calculate the gradient ratio
-            ratio = y / SCREEN_HEIGHT
+            ratio = y / height
             
             # Interpolate between gradient colors for smooth sunset effect
             if ratio < 0.4:
                 # Top to middle (coral to peach)
                 local_ratio = ratio / 0.4
-                r = int(COLORS['gradient_top'][0] * (1 - local_ratio) + COLORS['gradient_middle'][0] * local_ratio)
-                g = int(COLORS['gradient_top'][1] * (1 - local_ratio) + COLORS['gradient_middle'][1] * local_ratio)
-                b = int(COLORS['gradient_top'][2] * (1 - local_ratio) + COLORS['gradient_middle'][2] * local_ratio)
+                r = int(top[0] * (1 - local_ratio) + middle[0] * local_ratio)
+                g = int(top[1] * (1 - local_ratio) + middle[1] * local_ratio)
+                b = int(top[2] * (1 - local_ratio) + middle[2] * local_ratio)
             else:
                 # Middle to bottom (peach to golden)
                 local_ratio = (ratio - 0.4) / 0.6
-                r = int(COLORS['gradient_middle'][0] * (1 - local_ratio) + COLORS['gradient_bottom'][0] * local_ratio)
-                g = int(COLORS['gradient_middle'][1] * (1 - local_ratio) + COLORS['gradient_bottom'][1] * local_ratio)
-                b = int(COLORS['gradient_middle'][2] * (1 - local_ratio) + COLORS['gradient_bottom'][2] * local_ratio)
+                r = int(middle[0] * (1 - local_ratio) + bottom[0] * local_ratio)
+                g = int(middle[1] * (1 - local_ratio) + bottom[1] * local_ratio)
+                b = int(middle[2] * (1 - local_ratio) + bottom[2] * local_ratio)
             
-            pygame.draw.line(self.screen, (r, g, b), (0, y), (SCREEN_WIDTH, y))
+            pygame.draw.line(surface, (r, g, b), (0, y), (width, y))
+        return surface
     
     def draw_rounded_card_with_hover(self, rect, card_id, is_hovered=False):
         """Draw a rounded card with smooth hover animation"""
@@ -111,12 +255,16 @@ class ModernAIGamesHub:
         if card_id not in self.hover_scale:
             self.hover_scale[card_id] = 1.0
         
-        # Smooth hover animation
+        # Smooth hover animation, snapped once it is close enough to the target
         target_scale = 1.05 if is_hovered else 1.0
         self.hover_scale[card_id] += (target_scale - self.hover_scale[card_id]) * 0.15
+        if abs(target_scale - self.hover_scale[card_id]) < 0.002:
+            self.hover_scale[card_id] = target_scale
+        else:
+            self.menu_animating = True
         
         # Calculate scaled rect
-        scale = self.hover_scale[card_id]
+        scale = quantize(self.hover_scale[card_id], HOVER_SCALE_STEP)
         scaled_width = int(rect.width * scale)
         scaled_height = int(rect.height * scale)
         scaled_x = rect.centerx - scaled_width // 2
@@ -128,18 +276,14 @@ class ModernAIGamesHub:
         shadow_alpha = 35 if is_hovered else 25
         shadow_rect = pygame.Rect(scaled_rect.x + shadow_offset, scaled_rect.y + shadow_offset, 
                                  scaled_rect.width, scaled_rect.height)
-        shadow_surface = pygame.Surface((scaled_rect.width, scaled_rect.height), pygame.SRCALPHA)
-        pygame.draw.rect(shadow_surface, (*COLORS['card_shadow'][:3], shadow_alpha), 
-                        (0, 0, scaled_rect.width, scaled_rect.height), border_radius=30)
+        shadow_surface = rounded_rect_surface(scaled_rect.size, (*COLORS['card_shadow'][:3], shadow_alpha), 30)
         self.screen.blit(shadow_surface, shadow_rect)
         
         # Hover glow effect
         if is_hovered:
             glow_rect = pygame.Rect(scaled_rect.x - 4, scaled_rect.y - 4, 
                                    scaled_rect.width + 8, scaled_rect.height + 8)
-            glow_surface = pygame.Surface((glow_rect.width, glow_rect.height), pygame.SRCALPHA)
-            pygame.draw.rect(glow_surface, COLORS['card_hover_glow'], 
-                           (0, 0, glow_rect.width, glow_rect.height), border_radius=34)
+            glow_surface = rounded_rect_surface(glow_rect.size, COLORS['card_hover_glow'], 34)
             self.screen.blit(glow_surface, glow_rect)
         
         # Card background with very rounded corners
@@ -205,7 +349,7 @@ class ModernAIGamesHub:
                     pygame.draw.rect(self.screen, COLORS['card_bg'], cell_rect, border_radius=4)
                     
                     # Number
-                    num_surface = self.caption_font.render(numbers[i*2 + j], True, COLORS['accent_blue'])
+                    num_surface = render_text(self.caption_font, numbers[i*2 + j], COLORS['accent_blue'])
                     num_rect = num_surface.get_rect(center=cell_rect.center)
                     self.screen.blit(num_surface, num_rect)
     
@@ -224,24 +368,22 @@ class ModernAIGamesHub:
         title_y = 40
         title_text = "AI Gaming Hub"
 
-        # Create a larger font for the main title
-        main_title_font = pygame.font.Font(None, 72)
+        # Larger font for the main title
+        main_title_font = get_font(72)
 
         # Draw title shadow for depth
         shadow_offset = 3
-        title_shadow = main_title_font.render(title_text, True, (0, 0, 0, 100))
+        title_shadow = render_text(main_title_font, title_text, (0, 0, 0, 100))
         shadow_rect = title_shadow.get_rect(centerx=SCREEN_WIDTH // 2 + shadow_offset, y=title_y + shadow_offset)
         self.screen.blit(title_shadow, shadow_rect)
 
         # Draw main title with beautiful white color
-        title_surface = main_title_font.render(title_text, True, COLORS['text_white'])
+        title_surface = render_text(main_title_font, title_text, COLORS['text_white'])
         title_rect = title_surface.get_rect(centerx=SCREEN_WIDTH // 2, y=title_y)
         self.screen.blit(title_surface, title_rect)
 
         # Add a subtle glow effect around the title
-        glow_surface = pygame.Surface((title_rect.width + 20, title_rect.height + 20), pygame.SRCALPHA)
-        glow_rect = pygame.Rect(0, 0, title_rect.width + 20, title_rect.height + 20)
-        pygame.draw.rect(glow_surface, (255, 255, 255, 30), glow_rect, border_radius=15)
+        glow_surface = rounded_rect_surface((title_rect.width + 20, title_rect.height + 20), (255, 255, 255, 30), 15)
         self.screen.blit(glow_surface, (title_rect.x - 10, title_rect.y - 10))
 
         # Re-draw the title on top of the glow
@@ -249,7 +391,7 @@ class ModernAIGamesHub:
         
         # Header badge with rounded corners
         badge_text = "Featuring Advanced AI Algorithms"
-        badge_surface = self.body_font.render(badge_text, True, COLORS['text_white'])
+        badge_surface = render_text(self.body_font, badge_text, COLORS['text_white'])
         badge_width = badge_surface.get_width() + 40
         badge_height = 40
         badge_x = (SCREEN_WIDTH - badge_width) // 2
@@ -280,6 +422,7 @@ class ModernAIGamesHub:
         ]
         
         self.menu_buttons = []
+        self.menu_animating = False
         
         for i, (title, algorithm, icon_type) in enumerate(games):
             row = i // 2
@@ -300,12 +443,12 @@ class ModernAIGamesHub:
             self.draw_icon((scaled_rect.centerx, icon_y), icon_type)
             
             # Title
-            title_surface = self.heading_font.render(title, True, COLORS['text_primary'])
+            title_surface = render_text(self.heading_font, title, COLORS['text_primary'])
             title_rect = title_surface.get_rect(centerx=scaled_rect.centerx, y=scaled_rect.y + 110)
             self.screen.blit(title_surface, title_rect)
             
             # Algorithm description
-            algo_surface = self.caption_font.render(algorithm, True, COLORS['text_secondary'])
+            algo_surface = render_text(self.caption_font, algorithm, COLORS['text_secondary'])
             algo_rect = algo_surface.get_rect(centerx=scaled_rect.centerx, y=scaled_rect.y + 140)
             self.screen.blit(algo_surface, algo_rect)
             
@@ -325,27 +468,52 @@ class ModernAIGamesHub:
         pygame.draw.rect(self.screen, bg_color, back_rect, border_radius=25)
         
         # Button text
-        back_text = self.body_font.render("← Back", True, COLORS['text_white'])
+        back_text = render_text(self.body_font, "← Back", COLORS['text_white'])
         back_text_rect = back_text.get_rect(center=back_rect.center)
         self.screen.blit(back_text, back_text_rect)
         
         self.back_button = back_rect
     
+    def draw_thinking_indicator(self):
+        """Animated badge shown while the AI worker searches for the current game"""
+        badge_rect = self.thinking_rect
+        pygame.draw.rect(self.screen, COLORS['accent_blue'], badge_rect, border_radius=25)
+        
+        text = render_text(self.body_font, "Thinking", COLORS['text_white'])
+        text_rect = text.get_rect(midleft=(badge_rect.x + 22, badge_rect.centery))
+        self.screen.blit(text, text_rect)
+        
+        # Three dots bouncing one after another
+        ticks = pygame.time.get_ticks()
+        for i in range(3):
+            phase = (ticks // 120 - i * 2) % 8
+            lift = [0, 3, 5, 3, 0, 0, 0, 0][phase]
+            dot_x = text_rect.right + 14 + i * 12
+            pygame.draw.circle(self.screen, COLORS['text_white'], (dot_x, badge_rect.centery + 2 - lift), 3)
+    
     def handle_events(self):
         for event in pygame.event.get():
+            if event.type == pygame.MOUSEMOTION:
+                # Only the areas that react to the mouse need repainting
+                self.mouse_pos = pygame.mouse.get_pos()
+                self.dirty_rects.extend(self.hover_rects())
+                continue
+            
+            # Anything else may change what is on screen
+            self.full_redraw = True
+            
             if event.type == pygame.QUIT:
                 self.running = False
             
-            elif event.type == pygame.MOUSEMOTION:
-                self.mouse_pos = pygame.mouse.get_pos()
-            
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:  # Left click
+                    self.frame_profiler.click()
                     pos = pygame.mouse.get_pos()
                     
                     # Back button (available in all game states)
                     if (self.current_state != GameState.MENU and 
                         hasattr(self, 'back_button') and self.back_button.collidepoint(pos)):
+                        self.current_game().cancel_ai()
                         self.current_state = GameState.MENU
                         return
                     
@@ -356,62 +524,190 @@ class ModernAIGamesHub:
                                     self.current_state = state
                                     break
                     
-                    elif self.current_state == GameState.TIC_TAC_TOE:
-                        self.tic_tac_toe.handle_click(pos)
-                    
-                    elif self.current_state == GameState.CONNECT_FOUR:
-                        self.connect_four.handle_click(pos)
-                    
-                    elif self.current_state == GameState.GAME_2048:
-                        self.game_2048.handle_click(pos)
-                    
-                    elif self.current_state == GameState.DOTS_AND_BOXES:
-                        self.dots_and_boxes.handle_click(pos)
+                    else:
+                        self.current_game().handle_click(pos)
             
             elif event.type == pygame.KEYDOWN:
-                if self.current_state == GameState.GAME_2048:
-                    self.game_2048.handle_keydown(event)
+                if event.key == pygame.K_F3 and self.current_state != GameState.MENU:
+                    self.stats_overlay.toggle()
+                elif event.key == pygame.K_F5:
+                    self.frame_profiler.graph_visible = not self.frame_profiler.graph_visible
+                elif event.key == pygame.K_F4:
+                    profiler = self.ai_worker.profiler
+                    print(f"AI profiling {'on' if profiler.toggle() else 'off'}, "
+                          f"keeping searches over {1000 * profiler.threshold:.0f} ms in {profiler.directory}/")
+                elif self.current_state == GameState.GAME_2048:
+                    self.current_game().handle_keydown(event)
+    
+    def hover_rects(self):
+        """Screen areas whose look depends on the mouse position"""
+        if self.current_state == GameState.MENU:
+            # Cards grow by 5% and cast a shadow when hovered
+            return [rect.inflate(rect.width // 10 + 24, rect.height // 10 + 24)
+                    for rect, _ in getattr(self, 'menu_buttons', [])]
+        rects = self.current_game().hover_rects()
+        if hasattr(self, 'back_button'):
+            rects.append(self.back_button)
+        return rects
+    
+    def game_result(self, game):
+        """Who won a finished game: 'player', 'ai' or 'draw'; 2048 just ends"""
+        if hasattr(game, 'scores'):
+            human, ai = game.scores
+            return 'player' if human > ai else 'ai' if ai > human else 'draw'
+        if hasattr(game, 'winner'):
+            return {'X': 'player', 1: 'player', 'O': 'ai', 2: 'ai'}.get(game.winner, 'draw')
+        return 'over'
+    
+    def game_score(self, game):
+        """The player's score in games that keep one: 2048 points or boxes taken"""
+        if hasattr(game, 'scores'):
+            return game.scores[0]
+        return getattr(game, 'score', None)
+    
+    def track_game(self, game):
+        """Count games started and finished on the current screen, store the results and save the session"""
+        name = self.current_state.value
+        if self.game_starts.get(name) != game.started_at:
+            self.game_starts[name] = game.started_at
+            self.games_over[name] = False
+            metrics.GAMES_STARTED.inc(game=name)
+        if game.game_over and not self.games_over[name]:
+            self.games_over[name] = True
+            result = self.game_result(game)
+            score = self.game_score(game)
+            finished_at = time.time()
+            metrics.GAMES_FINISHED.inc(game=name, result=result)
+            metrics.GAME_SECONDS.observe(finished_at - game.started_at, game=name)
+            self.score_store.record_result(name, result, game.started_at, finished_at, score)
+            game.record.finish(result, score)
+        if hasattr(game, 'high_score'):
+            metrics.HIGH_SCORE.set(game.high_score, game=name)
+        # Every move and reset is saved to the session file in the background
+        position = (game.started_at, game.record.moves)
+        if self.saved_positions.get(name) != position:
+            self.saved_positions[name] = position
+            self.session_store.save(name, game.snapshot())
     
     def update(self):
-        if self.current_state == GameState.TIC_TAC_TOE:
-            self.tic_tac_toe.update()
-        elif self.current_state == GameState.CONNECT_FOUR:
-            self.connect_four.update()
-        elif self.current_state == GameState.DOTS_AND_BOXES:
-            self.dots_and_boxes.update()
+        game = self.current_game()
+        if game:
+            game.update()
+            self.track_game(game)
+        
+        # Collect what changed this frame
+        if self.current_state == GameState.MENU:
+            thinking = False
+            if self.menu_animating:
+                self.dirty_rects.extend(self.hover_rects())
+        else:
+            if game.redraw:
+                game.redraw = False
+                self.full_redraw = True
+            self.dirty_rects.extend(game.animation_rects())
+            thinking = game.is_ai_thinking()
+        
+        # The thinking badge animates while shown and is erased once
+        if thinking or thinking != self.was_thinking:
+            self.dirty_rects.append(self.thinking_rect)
+        self.was_thinking = thinking
+        
+        # The frame graph follows whatever gets painted, so an idle hub stays idle
+        if self.frame_profiler.graph_visible and self.dirty_rects:
+            self.dirty_rects.append(self.frame_graph_rect)
+    
+    def is_idle(self):
+        """True when the next frame would look the same as this one"""
+        if self.full_redraw or self.dirty_rects:
+            return False
+        game = self.current_game()
+        if game is None:
+            return not self.menu_animating
+        return not game.is_ai_thinking()
     
     def draw(self):
+        """Paint what changed; returns whether anything was sent to the display"""
+        if not self.full_redraw and not self.dirty_rects:
+            return False
+        
+        # Outside a full redraw only the dirty areas are painted and sent to the display
+        if not self.full_redraw:
+            self.screen.set_clip(self.dirty_rects[0].unionall(self.dirty_rects[1:]))
+        
+        game = self.current_game()
         if self.current_state == GameState.MENU:
             self.draw_menu()
-        elif self.current_state == GameState.TIC_TAC_TOE:
-            self.draw_gradient_background()
-            self.draw_back_button()
-            self.tic_tac_toe.draw(self.mouse_pos, self.body_font, self.title_font, self.subheading_font)
-        elif self.current_state == GameState.CONNECT_FOUR:
-            self.draw_gradient_background()
-            self.draw_back_button()
-            self.connect_four.draw(self.mouse_pos, self.body_font, self.title_font, self.subheading_font)
-        elif self.current_state == GameState.GAME_2048:
+        elif self.current_state == GameState.DOTS_AND_BOXES:
             self.draw_gradient_background()
             self.draw_back_button()
-            self.game_2048.draw(self.mouse_pos, self.body_font, self.title_font, self.subheading_font)
-        elif self.current_state == GameState.DOTS_AND_BOXES:
+            game.draw(self.mouse_pos, self.body_font, self.title_font, self.subheading_font, self.caption_font)
+        else:
             self.draw_gradient_background()
             self.draw_back_button()
-            self.dots_and_boxes.draw(self.mouse_pos, self.body_font, self.title_font, self.subheading_font, self.caption_font)
+            game.draw(self.mouse_pos, self.body_font, self.title_font, self.subheading_font)
         
-        pygame.display.flip()
+        if game and self.stats_overlay.visible:
+            self.stats_overlay.draw(self.screen, game.search_stats, self.caption_font, COLORS)
+        
+        if game and game.is_ai_thinking():
+            self.draw_thinking_indicator()
+        
+        if self.frame_profiler.graph_visible:
+            self.frame_profiler.draw_graph(self.screen, self.frame_graph_rect, self.caption_font, COLORS,
+                                           self.current_state.value, 1000 / FPS)
+        
+        if self.full_redraw:
+            pygame.display.flip()
+        else:
+            self.screen.set_clip(None)
+            pygame.display.update(self.dirty_rects)
+        self.frame_profiler.presented()
+        self.full_redraw = False
+        self.dirty_rects = []
+        
+        if not self.first_frame_shown:
+            self.on_first_frame()
+        return True
+    
+    def wait_for_next_frame(self):
+        """Run at FPS while something changes, otherwise sleep until input arrives"""
+        if not self.is_idle():
+            self.clock.tick(FPS)
+            return
+        event = pygame.event.wait(IDLE_TIMEOUT_MS)
+        if event.type != pygame.NOEVENT:
+            pygame.event.post(event)
+        self.clock.tick()
     
     def run(self):
         """Main game loop"""
         self.running = True
         
+        frames = self.frame_profiler
         while self.running:
+            frames.begin_frame()
             self.handle_events()
+            frames.mark('handle_events')
             self.update()
-            self.draw()
-            self.clock.tick(FPS)
+            frames.mark('update')
+            painted = self.draw()
+            frames.mark('draw')
+            frame_ms = frames.end_frame(self.current_state.value, painted)
+            if painted:
+                metrics.FRAME_SECONDS.observe(frame_ms / 1000, screen=self.current_state.value)
+            self.wait_for_next_frame()
         
+        for exporter in self.metrics_exporters:
+            exporter.stop()
+        self.score_store.close()
+        game_recorder.close()
+        self.session_store.close()
+        frames.dump_csv(FRAME_STATS_PATH)
+        print('\n'.join(frames.summary()))
+        self.ai_worker.stop()
+        for game in self.games.values():
+            if hasattr(game, 'close'):
+                game.close()
         pygame.quit()
         sys.exit()
 
@@ -0,0 +1,229 @@
+import bisect
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# HUB_METRICS_FILE=path writes the metrics every HUB_METRICS_INTERVAL seconds,
+# HUB_METRICS_PORT=port serves them on http://127.0.0.1:port/metrics
+FILE_ENV = 'HUB_METRICS_FILE'
+INTERVAL_ENV = 'HUB_METRICS_INTERVAL'
+PORT_ENV = 'HUB_METRICS_PORT'
+DEFAULT_INTERVAL = 15
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; AI searches range from microseconds to several seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FRAME_BUCKETS = (0.001, 0.002, 0.004, 0.008, 0.0125, 0.016, 0.025, 0.05, 0.1, 0.25)
+GAME_BUCKETS = (10, 30, 60, 120, 300, 600, 1200, 3600)
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """One metric family; samples are keyed by their label values.
+
+    Recording takes the metric's own lock for a dictionary update, so the
+    render loop and the AI worker never wait on an exporter for longer than
+    it takes to copy the samples.
+    """
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def key(self, labels):
+        return tuple(labels[name] for name in self.labels)
+
+    def render(self):
+        with self.lock:
+            samples = {key: self.copy(value) for key, value in self.samples.items()}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(samples.items()):
+            lines.extend(self.sample_lines(key, value))
+        return lines
+
+    def copy(self, value):
+        return value
+
+    def sample_lines(self, key, value):
+        return [f"{self.name}{format_labels(self.labels, key)} {format_value(value)}"]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.samples[key] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            sample = self.samples.get(key)
+            if sample is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                sample = self.samples[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            sample[0][index] += 1
+            sample[1] += value
+            sample[2] += 1
+
+    def copy(self, value):
+        return [value[0][:], value[1], value[2]]
+
+    def sample_lines(self, key, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            labels = format_labels(self.labels, key, [('le', format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = format_labels(self.labels, key)
+        lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+AI_MOVE_SECONDS = registry.add(Histogram(
+    'hub_ai_move_seconds', "Time the AI worker spent on one search", ('game', 'kind')))
+FRAME_SECONDS = registry.add(Histogram(
+    'hub_frame_seconds', "Time to handle, update and paint one frame", ('screen',), FRAME_BUCKETS))
+GAMES_STARTED = registry.add(Counter(
+    'hub_games_started_total', "Games started, counting resets", ('game',)))
+GAMES_FINISHED = registry.add(Counter(
+    'hub_games_finished_total', "Games played to the end by result", ('game', 'result')))
+GAME_SECONDS = registry.add(Histogram(
+    'hub_game_duration_seconds', "Wall time from the start to the end of a game", ('game',), GAME_BUCKETS))
+HIGH_SCORE = registry.add(Gauge(
+    'hub_high_score', "Best score recorded for a game", ('game',)))
+
+
+class MetricsFileWriter:
+    """Background thread rewriting a metrics file, e.g. for node_exporter's textfile collector"""
+    def __init__(self, path, interval=DEFAULT_INTERVAL, registry=registry):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="metrics-file", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            self.write()
+
+    def write(self):
+        # Scrapers never see a half-written file
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as file:
+            file.write(self.registry.render())
+        os.replace(temporary, self.path)
+
+    def stop(self):
+        """Stop the thread, then write the final values once it can no longer be writing"""
+        self.stopping.set()
+        if self.thread.ident is not None:
+            self.thread.join()
+        self.write()
+
+
+class MetricsServer:
+    """Tiny HTTP endpoint serving /metrics from a background thread"""
+    def __init__(self, port, host='127.0.0.1', registry=registry):
+        metrics_registry = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics_registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_exporters(environ=os.environ):
+    """Start the exporters configured in the environment; none by default"""
+    exporters = []
+    if environ.get(FILE_ENV):
+        interval = float(environ.get(INTERVAL_ENV, DEFAULT_INTERVAL))
+        exporters.append(MetricsFileWriter(environ[FILE_ENV], interval).start())
+    if environ.get(PORT_ENV):
+        exporters.append(MetricsServer(int(environ[PORT_ENV])).start())
+    return exporters
@@ -0,0 +1,310 @@
+import argparse
+import json
+import sys
+import time
+
+from engines import connect_four, dots, game2048, tictactoe
+from engines.connect_four import ConnectFourAI, best_column
+from engines.dots import DotsAndBoxesAI
+from engines.game2048 import DIRECTIONS, Game2048AI
+from engines.tictactoe import TicTacToeAI
+from game_log import (END, GAME_NAMES, INDEX_PATH, KEYFRAME, KEYFRAME_INTERVAL, LOG_PATH, MAGIC, MOVE,
+                      RESULT_NAMES, START, iter_records, read_index)
+
+
+# Positions rebuilt from keyframe values. Each one plays recorded move codes,
+# knows when the hub's AI was to move and asks the current AI for its move.
+
+class TicTacToeReplay:
+    corpus_name = 'tictactoe'
+
+    def __init__(self, values, from_start):
+        self.board = [('', 'X', 'O')[value] for value in values]
+
+    def ai_to_move(self):
+        return self.board.count('X') > self.board.count('O')
+
+    def move_of(self, code):
+        return code
+
+    def apply(self, code):
+        self.board[code] = 'O' if self.ai_to_move() else 'X'
+
+    def best_move(self):
+        ai = TicTacToeAI()
+        return ai, ai.get_best_move(self.board[:])
+
+    def corpus_entry(self):
+        return {'position': ''.join(cell or '.' for cell in self.board)}
+
+    def describe(self):
+        return tictactoe.format_board(self.board)
+
+
+class ConnectFourReplay:
+    corpus_name = 'connect4'
+
+    def __init__(self, values, from_start):
+        self.ai = ConnectFourAI()
+        self.board = [values[row * self.ai.cols:(row + 1) * self.ai.cols] for row in range(self.ai.rows)]
+        self.player = 1 + sum(1 for value in values if value) % 2
+        # Corpus positions are the columns played, known only when replaying from the start.
+        # A game resumed from a saved session starts its record mid-game, so only an
+        # empty board counts as the start.
+        self.columns = '' if from_start and not any(values) else None
+
+    def ai_to_move(self):
+        return self.player == 2
+
+    def move_of(self, code):
+        return code
+
+    def apply(self, code):
+        self.ai.drop_piece(self.board, self.ai.get_next_open_row(self.board, code), code, self.player)
+        self.player = 3 - self.player
+        if self.columns is not None:
+            self.columns += str(code + 1)
+
+    def best_move(self):
+        ai = ConnectFourAI()
+        return ai, best_column(ai, [row[:] for row in self.board], self.player)
+
+    def corpus_entry(self):
+        if self.columns is None:
+            return None
+        return {'position': self.columns}
+
+    def describe(self):
+        return connect_four.format_board(self.board)
+
+
+class Game2048Replay:
+    corpus_name = '2048'
+
+    def __init__(self, values, from_start):
+        self.ai = Game2048AI()
+        self.grid = [[1 << value if value else 0 for value in values[row * 4:row * 4 + 4]] for row in range(4)]
+
+    def ai_to_move(self):
+        return True
+
+    def move_of(self, code):
+        return DIRECTIONS[code & 3]
+
+    def apply(self, code):
+        self.grid, _ = self.ai.simulate_move(self.grid, DIRECTIONS[code & 3])
+        spawn = code >> 2
+        if spawn:
+            cell, four = divmod(spawn - 1, 2)
+            self.grid[cell // 4][cell % 4] = 4 if four else 2
+
+    def best_move(self):
+        ai = Game2048AI()
+        return ai, ai.get_best_move([row[:] for row in self.grid])
+
+    def corpus_entry(self):
+        return {'position': '/'.join(','.join(str(value) for value in row) for row in self.grid)}
+
+    def describe(self):
+        return game2048.format_grid(self.grid)
+
+
+class DotsReplay:
+    corpus_name = 'dots'
+
+    def __init__(self, values, from_start):
+        self.rows, self.cols = values[0], values[1]
+        self.ai = DotsAndBoxesAI(self.rows, self.cols)
+        self.layout = self.ai.endgame.layout
+        flags = values[2:2 + self.layout.num_edges]
+        owners = values[2 + self.layout.num_edges:-1]
+        self.horizontal_lines, self.vertical_lines = dots.empty_lines(self.rows, self.cols)
+        for edge, flag in enumerate(flags):
+            if flag:
+                self.draw(self.layout.edge_to_move(edge))
+        self.boxes = [owners[row * self.cols:(row + 1) * self.cols] for row in range(self.rows)]
+        self.player = values[-1]
+
+    def draw(self, move):
+        move_type, row, col = move
+        lines = self.horizontal_lines if move_type == 'horizontal' else self.vertical_lines
+        lines[row][col] = True
+
+    def ai_to_move(self):
+        return self.player == 2
+
+    def move_of(self, code):
+        return self.layout.edge_to_move(code)
+
+    def apply(self, code):
+        completed = dots.apply_move(self.ai, self.horizontal_lines, self.vertical_lines, self.boxes,
+                                    self.move_of(code), self.player)
+        if not completed:
+            self.player = 3 - self.player
+
+    def best_move(self):
+        ai = DotsAndBoxesAI(self.rows, self.cols)
+        return ai, ai.get_best_move([row[:] for row in self.horizontal_lines],
+                                    [row[:] for row in self.vertical_lines],
+                                    [row[:] for row in self.boxes])
+
+    def corpus_entry(self):
+        mask = self.layout.mask_from_lines(self.horizontal_lines, self.vertical_lines)
+        flags = ''.join(str((mask >> edge) & 1) for edge in range(self.layout.num_edges))
+        return {'size': f"{self.rows}x{self.cols}", 'position': flags}
+
+    def describe(self):
+        return dots.format_board(self.ai, self.horizontal_lines, self.vertical_lines, self.boxes)
+
+
+REPLAYS = {
+    'tic_tac_toe': TicTacToeReplay,
+    'connect_four': ConnectFourReplay,
+    'game_2048': Game2048Replay,
+    'dots_and_boxes': DotsReplay,
+}
+
+
+class GameLogReader:
+    """Streams a game record log and seeks within games through its keyframe index"""
+    def __init__(self, path=LOG_PATH, index_path=INDEX_PATH):
+        self.file = open(path, 'rb')
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a game record log")
+        # Keyframe k of a game is the position after k * KEYFRAME_INTERVAL moves
+        self.keyframes = {}
+        for game_id, moves, offset in read_index(index_path, path):
+            self.keyframes.setdefault(game_id, []).append((moves, offset))
+
+    def close(self):
+        self.file.close()
+
+    def games(self):
+        """Summary of every recorded game, in the order they started"""
+        games = {}
+        for _, kind, values in iter_records(self.file):
+            game_id = values[0]
+            if kind == START:
+                games[game_id] = {'id': game_id, 'game': GAME_NAMES[values[1]], 'started': values[2] / 1000,
+                                  'seed': values[3], 'moves': 0, 'result': None, 'score': None}
+            elif game_id not in games:
+                continue
+            elif kind == MOVE:
+                games[game_id]['moves'] += 1
+            elif kind == END:
+                games[game_id]['result'] = RESULT_NAMES[values[2]]
+                games[game_id]['score'] = values[3]
+        return list(games.values())
+
+    def positions(self, game_id, move=0):
+        """(moves played, position, next recorded move code or None) from move on.
+
+        Starts at the nearest keyframe at or before move, so reaching any
+        move replays fewer than KEYFRAME_INTERVAL moves. The position object
+        is updated in place between steps.
+        """
+        keyframes = self.keyframes.get(game_id)
+        if not keyframes:
+            raise KeyError(f"no game {game_id} in the log")
+        played, offset = keyframes[min(move // KEYFRAME_INTERVAL, len(keyframes) - 1)]
+        replay = None
+        for _, kind, values in iter_records(self.file, offset):
+            if values[0] != game_id:
+                continue
+            if kind == KEYFRAME:
+                if replay is None:
+                    replay = REPLAYS[GAME_NAMES[values[2]]](values[3:], values[1] == 0)
+            elif kind == MOVE:
+                code = values[2]
+                if played >= move:
+                    yield played, replay, code
+                replay.apply(code)
+                played += 1
+            elif kind == END:
+                break
+        if played >= move:
+            yield played, replay, None
+
+
+def analyse(reader, game_id, start, count):
+    """Re-run the positions where the AI was to move through the current AI"""
+    agreed = total = 0
+    for played, replay, code in reader.positions(game_id, start):
+        if code is None or played >= start + count:
+            break
+        if not replay.ai_to_move():
+            continue
+        started = time.perf_counter()
+        ai, move = replay.best_move()
+        elapsed = time.perf_counter() - started
+        recorded = replay.move_of(code)
+        total += 1
+        agreed += move == recorded
+        print(f"move {played:>5}: played {recorded}, AI now {move}  "
+              f"({1000 * elapsed:.1f} ms, {ai.stats.nodes} nodes)")
+    if total:
+        print(f"AI agrees with {agreed} of {total} recorded moves ({agreed / total:.0%})")
+
+
+def export(reader, game_ids, every, path):
+    """Write recorded positions as a corpus for engines.bench --corpus"""
+    corpus = {'version': 1}
+    for game_id in game_ids:
+        for played, replay, _ in reader.positions(game_id):
+            if played % every:
+                continue
+            entry = replay.corpus_entry()
+            if entry is not None:
+                corpus.setdefault(replay.corpus_name, []).append({'id': f"game{game_id}-move{played}", **entry})
+    with open(path, 'w') as file:
+        json.dump(corpus, file, indent=2)
+    counts = {name: len(entries) for name, entries in corpus.items() if name != 'version'}
+    print(f"Wrote {sum(counts.values())} positions to {path}: {counts}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='replay', description="List, replay and analyse recorded hub games")
+    parser.add_argument('--log', default=LOG_PATH)
+    parser.add_argument('--index', default=INDEX_PATH)
+    parser.add_argument('--game', type=int, help="game id; without it the recorded games are listed")
+    parser.add_argument('--move', type=int, help="show the position after this many moves")
+    parser.add_argument('--analyse', action='store_true', help="compare the recorded AI moves with the current AI")
+    parser.add_argument('--count', type=int, default=1 << 30, help="moves to analyse from --move on")
+    parser.add_argument('--export', metavar='FILE', help="write positions as a benchmark corpus")
+    parser.add_argument('--every', type=int, default=1, help="export every nth position")
+    args = parser.parse_args(argv)
+
+    try:
+        reader = GameLogReader(args.log, args.index)
+    except (OSError, ValueError) as error:
+        print(error)
+        return 2
+    try:
+        if args.export:
+            game_ids = [args.game] if args.game is not None else [game['id'] for game in reader.games()]
+            export(reader, game_ids, args.every, args.export)
+        elif args.game is None:
+            for game in reader.games():
+                started = time.strftime('%Y-%m-%d %H:%M', time.localtime(game['started']))
+                result = game['result'] or 'unfinished'
+                print(f"{game['id']:>6}  {game['game']:<15} {started}  {game['moves']:>5} moves  {result}"
+                      + (f", score {game['score']}" if game['score'] else ''))
+        elif args.analyse:
+            analyse(reader, args.game, args.move or 0, args.count)
+        else:
+            for played, replay, code in reader.positions(args.game, args.move or 0):
+                if args.move is not None and played > args.move:
+                    break
+                print(f"After {played} moves" + (f", next {replay.move_of(code)}" if code is not None else ''))
+                print(replay.describe())
+                print()
+    except KeyError as error:
+        print(error.args[0])
+        return 1
+    finally:
+        reader.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+DB_PATH = 'hub_scores.db'
+# Writes are committed together once this many are queued or this many seconds passed
+BATCH_SIZE = 64
+FLUSH_SECONDS = 1.0
+
+# High scores kept in JSON files by older versions, imported once
+LEGACY_HIGH_SCORES = {'game_2048': ('2048_highscore.json', 'highscore.json')}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS {game}_high_scores (
+    id INTEGER PRIMARY KEY,
+    score INTEGER NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS {game}_high_scores_score ON {game}_high_scores (score);
+CREATE TABLE IF NOT EXISTS {game}_results (
+    id INTEGER PRIMARY KEY,
+    result TEXT NOT NULL,
+    score INTEGER,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS {game}_results_result ON {game}_results (result);
+CREATE INDEX IF NOT EXISTS {game}_results_finished_at ON {game}_results (finished_at);
+CREATE INDEX IF NOT EXISTS {game}_results_duration ON {game}_results (duration);
+"""
+
+
+def table_prefix(game):
+    """Game names become table names, so only letters, digits and underscores are kept"""
+    return ''.join(char if char.isalnum() else '_' for char in game)
+
+
+def legacy_high_score(paths):
+    best = 0
+    for path in paths:
+        try:
+            with open(path) as file:
+                best = max(best, int(json.load(file).get('high_score', 0)))
+        except (OSError, ValueError, AttributeError):
+            continue
+    return best
+
+
+class ScoreStore:
+    """SQLite store for high scores, results and game durations.
+
+    Callers only queue writes and read the in-memory high scores; the
+    database is opened, read and written by one background thread that
+    commits queued writes in batches. Of several high scores queued for a
+    game only the best is written, so a record game costs one row per
+    batch rather than a file write per move.
+    """
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.queue = queue.Queue()
+        self.high_scores = {}
+        self.lock = threading.Lock()
+        self.thread = None
+        self.games = set()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="score-store", daemon=True)
+                self.thread.start()
+        return self
+
+    def high_score(self, game):
+        """Best score of a game so far, from memory and without waiting.
+
+        Until the background thread has loaded the database this is only
+        the scores recorded this session, so callers read it when drawing
+        rather than once.
+        """
+        self.start()
+        return self.high_scores.get(game, 0)
+
+    def record_high_score(self, game, score):
+        self.start()
+        if score <= self.high_scores.get(game, 0):
+            return
+        self.high_scores[game] = score
+        self.queue.put(('high_score', game, score, time.time()))
+
+    def record_result(self, game, result, started_at, finished_at, score=None):
+        self.start()
+        self.queue.put(('result', game, result, score, started_at, finished_at))
+
+    def close(self):
+        """Write everything queued and stop the writer"""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        connection = sqlite3.connect(self.path)
+        try:
+            self.load(connection)
+            while self.write_batch(connection):
+                pass
+        finally:
+            connection.close()
+
+    def load(self, connection):
+        for game, paths in LEGACY_HIGH_SCORES.items():
+            self.ensure_tables(connection, game)
+            prefix = table_prefix(game)
+            if connection.execute(f"SELECT COUNT(*) FROM {prefix}_high_scores").fetchone()[0] == 0:
+                score = legacy_high_score(paths)
+                if score:
+                    connection.execute(f"INSERT INTO {prefix}_high_scores (score, recorded_at) VALUES (?, ?)",
+                                       (score, time.time()))
+        connection.commit()
+        tables = connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%\\_high\\_scores' ESCAPE '\\'")
+        for (table,) in tables.fetchall():
+            best = connection.execute(f"SELECT MAX(score) FROM {table}").fetchone()[0] or 0
+            game = table[:-len('_high_scores')]
+            self.high_scores[game] = max(best, self.high_scores.get(game, 0))
+
+    def ensure_tables(self, connection, game):
+        if game not in self.games:
+            connection.executescript(SCHEMA.format(game=table_prefix(game)))
+            self.games.add(game)
+
+    def write_batch(self, connection):
+        """Commit one batch of queued writes; False once the store is closed"""
+        items = [self.queue.get()]
+        deadline = time.monotonic() + FLUSH_SECONDS
+        while items[-1] is not None and len(items) < BATCH_SIZE:
+            try:
+                items.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        closing = items[-1] is None
+        if closing:
+            items.pop()
+
+        best = {}
+        results = {}
+        for item in items:
+            if item[0] == 'high_score':
+                _, game, score, recorded_at = item
+                if game not in best or score > best[game][0]:
+                    best[game] = (score, recorded_at)
+            else:
+                _, game, result, score, started_at, finished_at = item
+                results.setdefault(game, []).append(
+                    (result, score, started_at, finished_at, finished_at - started_at))
+
+        # Creating tables commits, so it happens before the batch's transaction
+        for game in set(best) | set(results):
+            self.ensure_tables(connection, game)
+        with connection:
+            for game, (score, recorded_at) in best.items():
+                connection.execute(f"INSERT INTO {table_prefix(game)}_high_scores (score, recorded_at) VALUES (?, ?)",
+                                   (score, recorded_at))
+            for game, rows in results.items():
+                connection.executemany(
+                    f"INSERT INTO {table_prefix(game)}_results "
+                    f"(result, score, started_at, finished_at, duration) VALUES (?, ?, ?, ?, ?)", rows)
+        return not closing
+
+
+score_store = ScoreStore()
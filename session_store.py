@@ -0,0 +1,110 @@
+import mmap
+import os
+import threading
+
+from game_log import GAME_CODES, GAME_NAMES, decode_values, decode_varint, encode_record
+
+SESSION_PATH = 'session.bin'
+MAGIC = b'HUBSES1\n'
+
+
+def encode_sessions(sessions):
+    """Magic, then one record per game: its code, the length and the snapshot values as varints"""
+    data = bytearray(MAGIC)
+    for game, values in sorted(sessions.items()):
+        data += encode_record(GAME_CODES[game], values)
+    return bytes(data)
+
+
+def decode_sessions(data):
+    if data[:len(MAGIC)] != MAGIC:
+        return {}
+    sessions = {}
+    offset = len(MAGIC)
+    try:
+        while offset < len(data):
+            code = data[offset]
+            length, offset = decode_varint(data, offset + 1)
+            payload = data[offset:offset + length]
+            if len(payload) < length:
+                break
+            sessions[GAME_NAMES[code]] = decode_values(payload)
+            offset += length
+    except (IndexError, KeyError):
+        pass
+    return sessions
+
+
+class SessionStore:
+    """In-progress games saved to one small binary file.
+
+    Snapshots are handed over by the hub whenever a game changes; a
+    background thread rewrites the file through a temporary file and a
+    rename, so a crash leaves either the old or the new sessions. Several
+    snapshots arriving during one write are saved together by the next.
+    """
+    def __init__(self, path=SESSION_PATH):
+        self.path = path
+        self.sessions = {}
+        self.condition = threading.Condition()
+        self.dirty = False
+        self.stopping = False
+        self.thread = None
+
+    def load(self):
+        """Read the saved sessions through a memory map"""
+        try:
+            with open(self.path, 'rb') as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    return self.sessions
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    self.sessions = decode_sessions(data)
+        except OSError:
+            pass
+        return self.sessions
+
+    def start(self):
+        with self.condition:
+            if self.thread is None:
+                self.stopping = False
+                self.thread = threading.Thread(target=self.run, name="session-writer", daemon=True)
+                self.thread.start()
+        return self
+
+    def save(self, game, values):
+        self.start()
+        with self.condition:
+            self.sessions[game] = values
+            self.dirty = True
+            self.condition.notify()
+
+    def close(self):
+        """Write the latest sessions and stop the writer"""
+        if self.thread is not None:
+            with self.condition:
+                self.stopping = True
+                self.condition.notify()
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.dirty and not self.stopping:
+                    self.condition.wait()
+                if not self.dirty:
+                    return
+                data = encode_sessions(self.sessions)
+                self.dirty = False
+            self.write(data)
+
+    def write(self, data):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+
+
+session_store = SessionStore()
@@ -0,0 +1,57 @@
+from fonts import render_text
+from surface_pool import rounded_rect_surface
+
+# Principal variation moves shown before it is cut short
+PV_MOVES = 8
+
+
+def format_move(move):
+    """Moves as the boards number them: cells and columns from 1, lines as h/v row,col"""
+    if isinstance(move, int):
+        return str(move + 1)
+    if isinstance(move, tuple):
+        move_type, row, col = move
+        return f"{move_type[0]}{row},{col}"
+    return str(move)
+
+
+def stats_lines(stats):
+    """Label and value rows describing one AI decision"""
+    if stats is None:
+        return [("No AI decision yet", "")]
+    pv = ' '.join(format_move(move) for move in stats.pv[:PV_MOVES])
+    if len(stats.pv) > PV_MOVES:
+        pv += " ..."
+    return [
+        ("Nodes", f"{stats.nodes:,}"),
+        ("Depth", str(stats.depth)),
+        ("Cutoffs", f"{stats.cutoffs:,}"),
+        ("Cache hits", f"{100 * stats.tt_hit_rate:.1f}% of {stats.tt_probes:,}"),
+        ("Speed", f"{stats.nps:,.0f} nodes/s"),
+        ("Time", f"{1000 * stats.elapsed:.1f} ms"),
+        ("PV", pv or "-"),
+    ]
+
+
+class StatsOverlay:
+    """Translucent panel with the search stats of a game's last AI decision"""
+    def __init__(self, rect):
+        self.rect = rect
+        self.visible = False
+
+    def toggle(self):
+        self.visible = not self.visible
+
+    def draw(self, screen, stats, font, colors):
+        panel = rounded_rect_surface(self.rect.size, (*colors['text_primary'], 215), 16)
+        screen.blit(panel, self.rect)
+
+        title = render_text(font, "Search stats (F3)", colors['accent_orange'])
+        screen.blit(title, (self.rect.x + 16, self.rect.y + 12))
+
+        y = self.rect.y + 40
+        for label, value in stats_lines(stats):
+            screen.blit(render_text(font, label, colors['border_light']), (self.rect.x + 16, y))
+            if value:
+                screen.blit(render_text(font, value, colors['text_white']), (self.rect.x + 120, y))
+            y += 22
@@ -0,0 +1,60 @@
+from collections import OrderedDict
+
+import pygame
+
+# Translucent surfaces kept before the least recently used ones are dropped
+SURFACE_POOL_SIZE = 128
+
+
+class SurfacePool:
+    """Bounded LRU of pre-drawn translucent surfaces keyed by size and style.
+
+    Callers quantize animated sizes and alphas so a fade or hover
+    animation cycles through a handful of surfaces instead of allocating
+    a new one every frame.
+    """
+    def __init__(self, max_entries=SURFACE_POOL_SIZE):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, size, style, draw):
+        """Surface of size for style, drawn by draw(surface) on first use"""
+        key = (tuple(size), style)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = pygame.Surface(size, pygame.SRCALPHA)
+        draw(surface)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+surface_pool = SurfacePool()
+
+
+def rounded_rect_surface(size, color, border_radius):
+    """Pooled surface holding one rounded rectangle filling it"""
+    def draw(surface):
+        pygame.draw.rect(surface, color, surface.get_rect(), border_radius=border_radius)
+    return surface_pool.get(size, ('rounded_rect', tuple(color), border_radius), draw)
+
+
+def filled_surface(size, color):
+    """Pooled surface filled with one translucent color"""
+    return surface_pool.get(size, ('fill', tuple(color)), lambda surface: surface.fill(color))
+
+
+def quantize(value, step):
+    """Round an animated value to a multiple of step so pooled surfaces are reused"""
+    return round(value / step) * step
@@ -0,0 +1,200 @@
+import os
+
+import pytest
+
+from engines.analyse import (HEADER_SIZE, MAGIC as POSITIONS_MAGIC, RECORD_SIZE, binary_chunks, pack_2048,
+                             pack_connect4, pack_file, unpack_2048, unpack_connect4)
+from game_log import (END, KEYFRAME, KEYFRAME_INTERVAL, MAGIC as LOG_MAGIC, MOVE, START,
+                      GameRecorder, build_index, iter_records, read_index)
+from session_store import MAGIC as SESSION_MAGIC, SessionStore, decode_sessions, encode_sessions
+
+
+# Game record log and its keyframe index
+
+def record_games(log_path, index_path, games=2, moves=70):
+    """Record a few Connect Four-sized games; returns the moves played in each"""
+    recorder = GameRecorder(str(log_path), str(index_path))
+    played = []
+    for game in range(games):
+        cells = [0] * 42
+        record = recorder.start_game('connect_four', lambda: list(cells), seed=game)
+        codes = []
+        for move in range(moves + game):
+            code = (move * 3 + game) % 7
+            cells[move % 42] = 1 + move % 2
+            record.move(code)
+            codes.append(code)
+        record.finish('player', score=game)
+        played.append(codes)
+    recorder.close()
+    return played
+
+
+def read_games(log_path):
+    games = {}
+    with open(log_path, 'rb') as file:
+        assert file.read(len(LOG_MAGIC)) == LOG_MAGIC
+        for _, kind, values in iter_records(file):
+            game = games.setdefault(values[0], {'kinds': [], 'moves': []})
+            game['kinds'].append(kind)
+            if kind == MOVE:
+                game['moves'].append(values[2])
+    return games
+
+
+def test_game_log_round_trip(tmp_path):
+    log_path, index_path = tmp_path / 'games.bin', tmp_path / 'games.idx'
+    played = record_games(log_path, index_path)
+
+    games = read_games(log_path)
+    assert [game['moves'] for game in games.values()] == played
+    for game, codes in zip(games.values(), played):
+        assert game['kinds'][0] == START
+        assert game['kinds'][-1] == END
+        assert game['kinds'].count(KEYFRAME) == 1 + len(codes) // KEYFRAME_INTERVAL
+
+    entries = read_index(str(index_path), str(log_path))
+    assert entries == build_index(str(log_path))
+    with open(log_path, 'rb') as file:
+        for game_id, moves, offset in entries:
+            _, kind, values = next(iter_records(file, offset))
+            assert (kind, values[0], values[1]) == (KEYFRAME, game_id, moves)
+
+
+def test_game_log_truncated_tail(tmp_path):
+    log_path, index_path = tmp_path / 'games.bin', tmp_path / 'games.idx'
+    played = record_games(log_path, index_path, games=1)
+    size = os.path.getsize(log_path)
+    with open(log_path, 'r+b') as file:
+        file.truncate(size - 3)
+    with open(index_path, 'r+b') as file:
+        file.truncate(os.path.getsize(index_path) - 5)
+
+    # Readers stop at the cut record and a cut index entry rebuilds the index
+    moves = read_games(log_path)[1]['moves']
+    assert moves == played[0][:len(moves)]
+    assert read_index(str(index_path), str(log_path)) == build_index(str(log_path))
+
+    # The next recorder drops the cut record before appending
+    record_games(log_path, index_path, games=1, moves=40)
+    games = read_games(log_path)
+    assert games[2]['moves'] == [(move * 3) % 7 for move in range(40)]
+    assert read_index(str(index_path), str(log_path)) == build_index(str(log_path))
+
+
+def test_game_log_index_past_log_is_rebuilt(tmp_path):
+    log_path, index_path = tmp_path / 'games.bin', tmp_path / 'games.idx'
+    record_games(log_path, index_path, games=1)
+    entries = build_index(str(log_path))
+    with open(log_path, 'r+b') as file:
+        file.truncate(entries[-1][2] + 2)
+    assert read_index(str(index_path), str(log_path)) == entries[:-1]
+
+    # The entry for the cut keyframe is dropped before new records take its place
+    record_games(log_path, index_path, games=1, moves=40)
+    assert read_index(str(index_path), str(log_path)) == build_index(str(log_path))
+
+
+# Session file
+
+SESSIONS = {
+    'tic_tac_toe': [1, 0, 2, 0, 0, 0, 0, 0, 0],
+    'game_2048': [300, 17, 4000] + [1, 0, 11, 3] * 4,
+    'dots_and_boxes': [4, 4] + [1] * 40 + [0] * 16 + [2],
+}
+
+
+def test_session_round_trip(tmp_path):
+    store = SessionStore(str(tmp_path / 'session.bin'))
+    for game, values in SESSIONS.items():
+        store.save(game, values)
+    store.close()
+    assert SessionStore(store.path).load() == SESSIONS
+    assert not os.path.exists(store.path + '.tmp')
+
+
+def test_session_truncated_tail():
+    data = encode_sessions(SESSIONS)
+    whole = {}
+    for length in range(len(data) + 1):
+        sessions = decode_sessions(data[:length])
+        # Only games whose whole record is present come back, unchanged
+        assert all(SESSIONS[game] == values for game, values in sessions.items())
+        assert len(sessions) >= len(whole)
+        whole = sessions
+    assert whole == SESSIONS
+    assert decode_sessions(data[:len(SESSION_MAGIC) - 1]) == {}
+
+
+def test_session_missing_or_empty_file(tmp_path):
+    path = tmp_path / 'session.bin'
+    assert SessionStore(str(path)).load() == {}
+    path.write_bytes(b'')
+    assert SessionStore(str(path)).load() == {}
+
+
+# Binary position files
+
+CONNECT4_BOARD = [[0] * 7 for _ in range(4)] + [[0, 0, 2, 1, 0, 0, 0], [0, 1, 1, 2, 2, 0, 1]]
+GRID_2048 = [[0, 2, 4, 8], [16, 32, 64, 128], [256, 512, 1024, 2048], [4096, 8192, 16384, 32768]]
+
+
+def test_position_records_round_trip():
+    assert unpack_connect4(pack_connect4(CONNECT4_BOARD)) == (CONNECT4_BOARD, 2)
+    assert len(pack_connect4(CONNECT4_BOARD)) == RECORD_SIZE['connect4']
+    assert unpack_2048(pack_2048(GRID_2048)) == GRID_2048
+    assert len(pack_2048(GRID_2048)) == RECORD_SIZE['2048']
+    with pytest.raises(ValueError):
+        pack_2048([[65536, 0, 0, 0]] + [[0] * 4] * 3)
+
+
+def write_positions(path, count):
+    grids = [[[(1 << ((index + cell) % 12)) if (index + cell) % 3 else 0 for cell in range(row * 4, row * 4 + 4)]
+              for row in range(4)] for index in range(count)]
+    path.write_text(''.join('"' + '/'.join(','.join(map(str, row)) for row in grid) + '"\n' for grid in grids))
+    return grids
+
+
+def read_positions(path, skip=0, chunk_size=4):
+    grids = []
+    for start, payload in binary_chunks(str(path), '2048', skip, chunk_size):
+        assert start == skip + len(grids)
+        size = RECORD_SIZE['2048']
+        grids += [unpack_2048(payload[offset:offset + size]) for offset in range(0, len(payload), size)]
+    return grids
+
+
+def test_position_file_round_trip(tmp_path):
+    grids = write_positions(tmp_path / 'positions.jsonl', 10)
+    assert pack_file(str(tmp_path / 'positions.jsonl'), str(tmp_path / 'positions.bin'), '2048') == 10
+    data = (tmp_path / 'positions.bin').read_bytes()
+    assert data[:len(POSITIONS_MAGIC)] == POSITIONS_MAGIC
+    assert len(data) == HEADER_SIZE + 10 * RECORD_SIZE['2048']
+    assert read_positions(tmp_path / 'positions.bin') == grids
+    # Resuming seeks straight to a record
+    assert read_positions(tmp_path / 'positions.bin', skip=7) == grids[7:]
+
+
+def test_position_file_truncated_tail(tmp_path):
+    grids = write_positions(tmp_path / 'positions.jsonl', 10)
+    pack_file(str(tmp_path / 'positions.jsonl'), str(tmp_path / 'positions.bin'), '2048')
+    path = tmp_path / 'positions.bin'
+    with open(path, 'r+b') as file:
+        file.truncate(HEADER_SIZE + 6 * RECORD_SIZE['2048'] + 3)
+    assert read_positions(path) == grids[:6]
+    with pytest.raises(ValueError):
+        list(binary_chunks(str(path), 'connect4', 0, 4))
+
+
+def test_position_file_errors(tmp_path):
+    header_only = tmp_path / 'header.bin'
+    header_only.write_bytes(POSITIONS_MAGIC)
+    with pytest.raises(ValueError):
+        list(binary_chunks(str(header_only), '2048', 0, 4))
+
+    # A bad position names its line and leaves no output behind
+    source = tmp_path / 'positions.jsonl'
+    source.write_text('"4453"\n\n{"position": "9"}\n')
+    with pytest.raises(ValueError, match='line 3'):
+        pack_file(str(source), str(tmp_path / 'positions.bin'), 'connect4')
+    assert sorted(os.listdir(tmp_path)) == ['header.bin', 'positions.jsonl']
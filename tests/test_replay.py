@@ -0,0 +1,40 @@
+import json
+
+from engines.connect_four import ConnectFourAI, parse_position
+from game_log import GameRecorder, connect_four_values
+from replay import GameLogReader, export
+
+
+def record_connect_four(recorder, columns, played_before=''):
+    """Record columns played from the position after played_before, as the hub does after a resume"""
+    ai = ConnectFourAI()
+    board, player = parse_position(played_before, ai)
+    record = recorder.start_game('connect_four', lambda: connect_four_values(board))
+    for char in columns:
+        col = int(char) - 1
+        ai.drop_piece(board, ai.get_next_open_row(board, col), col, player)
+        player = 3 - player
+        record.move(col)
+    return record
+
+
+def test_resumed_game_is_not_exported_from_an_empty_board(tmp_path):
+    log_path, index_path = str(tmp_path / 'games.bin'), str(tmp_path / 'games.idx')
+    recorder = GameRecorder(log_path, index_path)
+    record_connect_four(recorder, '4455')
+    # Resumed after 4453 had been played in an earlier session
+    resumed = record_connect_four(recorder, '66', played_before='4453')
+    recorder.close()
+
+    reader = GameLogReader(log_path, index_path)
+    try:
+        # The resumed record still replays to the real position
+        final = list(reader.positions(resumed.game_id))[-1][1]
+        assert final.board == parse_position('445366')[0]
+
+        corpus_path = tmp_path / 'corpus.json'
+        export(reader, [1, resumed.game_id], 1, str(corpus_path))
+    finally:
+        reader.close()
+    positions = [entry['position'] for entry in json.loads(corpus_path.read_text())['connect4']]
+    assert positions == ['', '4', '44', '445', '4455']
@@ -1,86 +1,51 @@
+import time
 import pygame
-import random
-
-class TicTacToeAI:
-    def __init__(self):
-        self.winning_combinations = [
-            [0, 1, 2], [3, 4, 5], [6, 7, 8],  # rows
-            [0, 3, 6], [1, 4, 7], [2, 5, 8],  # columns
-            [0, 4, 8], [2, 4, 6]              # diagonals
-        ]
-    
-    def minimax(self, board, depth, is_maximizing, alpha=float('-inf'), beta=float('inf')):
-        winner = self.check_winner(board)
-        
-        if winner == 'O':  # AI wins
-            return 10 - depth
-        elif winner == 'X':  # Human wins
-            return depth - 10
-        elif self.is_board_full(board):  # Tie
-            return 0
-        
-        if is_maximizing:  # AI's turn
-            max_eval = float('-inf')
-            for i in range(9):
-                if board[i] == '':
-                    board[i] = 'O'
-                    eval_score = self.minimax(board, depth + 1, False, alpha, beta)
-                    board[i] = ''
-                    max_eval = max(max_eval, eval_score)
-                    alpha = max(alpha, eval_score)
-                    if beta <= alpha:
-                        break
-            return max_eval
-        else:  # Human's turn
-            min_eval = float('inf')
-            for i in range(9):
-                if board[i] == '':
-                    board[i] = 'X'
-                    eval_score = self.minimax(board, depth + 1, True, alpha, beta)
-                    board[i] = ''
-                    min_eval = min(min_eval, eval_score)
-                    beta = min(beta, eval_score)
-                    if beta <= alpha:
-                        break
-            return min_eval
-    
-    def get_best_move(self, board):
-        best_score = float('-inf')
-        best_move = None
-        
-        for i in range(9):
-            if board[i] == '':
-                board[i] = 'O'
-                score = self.minimax(board, 0, False)
-                board[i] = ''
-                
-                if score > best_score:
-                    best_score = score
-                    best_move = i
-        
-        return best_move
-    
-    def check_winner(self, board):
-        for combo in self.winning_combinations:
-            if (board[combo[0]] == board[combo[1]] == board[combo[2]] != ''):
-                return board[combo[0]]
-        return None
-    
-    def is_board_full(self, board):
-        return '' not in board
+from engines.tictactoe import TicTacToeAI
+from ai_worker import AIWorker
+from fonts import render_text
+from game_log import game_recorder, tictactoe_values
 
 class TicTacToeGame:
-    def __init__(self, screen, colors):
+    def __init__(self, screen, colors, ai_worker=None):
         self.screen = screen
         self.colors = colors
         self.ai = TicTacToeAI()
+        self.ai_worker = ai_worker or AIWorker()
+        self.ai_request = None
+        # Stats of the AI's last decision, shown by the hub's overlay
+        self.search_stats = None
+        # Static board card and piece sprites, rebuilt when the layout or colors change
+        self.board_layer = None
+        self.board_layer_key = None
+        self.piece_sprites = {}
         self.reset_game()
     
     def reset_game(self):
+        self.cancel_ai()
         self.board = [''] * 9
         self.current_player = 'X'
         self.game_over = False
         self.winner = None
+        self.started_at = time.time()
+        self.record = game_recorder.start_game('tic_tac_toe', self.record_position)
+        self.redraw = True
+    
+    def record_position(self):
+        return tictactoe_values(self.board)
+    
+    def snapshot(self):
+        """The game as small integers for the session file"""
+        return self.record_position() + [int(self.current_player == 'O'), int(self.game_over),
+                                         ' XO'.index(self.winner or ' '), int(self.started_at)]
+    
+    def restore(self, values):
+        self.reset_game()
+        self.board = [('', 'X', 'O')[value] for value in values[:9]]
+        self.current_player = 'XO'[values[9]]
+        self.game_over = bool(values[10])
+        self.winner = (None, 'X', 'O')[values[11]]
+        self.started_at = values[12]
+        self.record = game_recorder.start_game('tic_tac_toe', self.record_position)
     
     def handle_click(self, pos):
         if hasattr(self, 'reset_button') and self.reset_button.collidepoint(pos):
@@ -100,6 +65,7 @@ class TicTacToeGame:
             
             if 0 <= index < 9 and self.board[index] == '':
                 self.board[index] = 'X'
+                self.record.move(index)
                 
                 # Check for win
                 winner = self.ai.check_winner(self.board)
@@ -111,12 +77,42 @@ class TicTacToeGame:
                 else:
                     self.current_player = 'O'
     
+    def cancel_ai(self):
+        """Drop the AI search in progress, if any"""
+        self.ai_worker.cancel(self)
+        self.ai_request = None
+    
+    def is_ai_thinking(self):
+        return self.ai_request is not None
+    
+    def hover_rects(self):
+        """Screen areas whose look depends on the mouse position"""
+        if not hasattr(self, 'board_rect'):
+            return []
+        return [self.board_rect, self.reset_button]
+    
+    def animation_rects(self):
+        return []
+    
     def update(self):
         if (self.current_player == 'O' and not self.game_over):
-            # AI move
-            best_move = self.ai.get_best_move(self.board)
+            # AI move, searched on the background worker
+            key = tuple(self.board)
+            if self.ai_request is None:
+                self.ai_request = self.ai_worker.submit(self, key, self.ai.get_best_move, self.board[:])
+                return
+            
+            finished, best_move = self.ai_worker.take_result(self.ai_request, key)
+            if not finished:
+                return
+            if best_move is not None:
+                self.search_stats = self.ai_request.stats
+            self.ai_request = None
+            self.redraw = True
+            
             if best_move is not None:
                 self.board[best_move] = 'O'
+                self.record.move(best_move)
                 
                 # Check for win
                 winner = self.ai.check_winner(self.board)
@@ -128,14 +124,41 @@ class TicTacToeGame:
                 else:
                     self.current_player = 'X'
     
+    def build_board_layer(self, board_card_size, board_size, cell_size):
+        """Pre-render the board card with its grid lines and the X and O sprites"""
+        layer = pygame.Surface((board_card_size, board_card_size), pygame.SRCALPHA)
+        pygame.draw.rect(layer, self.colors['card_bg'], layer.get_rect(), border_radius=30)
+        
+        # Grid lines
+        board_x = board_y = (board_card_size - board_size) // 2
+        for i in range(1, 3):
+            # Vertical lines
+            x = board_x + i * cell_size
+            pygame.draw.line(layer, self.colors['border_light'], (x, board_y), (x, board_y + board_size), 3)
+            # Horizontal lines
+            y = board_y + i * cell_size
+            pygame.draw.line(layer, self.colors['border_light'], (board_x, y), (board_x + board_size, y), 3)
+        self.board_layer = layer
+        
+        center = cell_size // 2
+        offset = 30
+        x_sprite = pygame.Surface((cell_size, cell_size), pygame.SRCALPHA)
+        pygame.draw.line(x_sprite, self.colors['accent_red'],
+                         (center - offset, center - offset), (center + offset, center + offset), 6)
+        pygame.draw.line(x_sprite, self.colors['accent_red'],
+                         (center + offset, center - offset), (center - offset, center + offset), 6)
+        o_sprite = pygame.Surface((cell_size, cell_size), pygame.SRCALPHA)
+        pygame.draw.circle(o_sprite, self.colors['accent_blue'], (center, center), 30, 6)
+        self.piece_sprites = {'X': x_sprite, 'O': o_sprite}
+    
     def draw(self, mouse_pos, body_font, title_font, subheading_font):
         # Title
-        title_surface = title_font.render("Tic Tac Toe", True, self.colors['text_white'])
+        title_surface = render_text(title_font, "Tic Tac Toe", self.colors['text_white'])
         title_rect = title_surface.get_rect(centerx=self.screen.get_width() // 2, y=50)
         self.screen.blit(title_surface, title_rect)
         
         # Subtitle
-        subtitle_surface = body_font.render("Minimax Algorithm with Alpha-Beta Pruning", True, self.colors['text_white'])
+        subtitle_surface = render_text(body_font, "Minimax Algorithm with Alpha-Beta Pruning", self.colors['text_white'])
         subtitle_rect = subtitle_surface.get_rect(centerx=self.screen.get_width() // 2, y=90)
         self.screen.blit(subtitle_surface, subtitle_rect)
         
@@ -145,31 +168,24 @@ class TicTacToeGame:
         board_card_y = 150
         board_card_rect = pygame.Rect(board_card_x, board_card_y, board_card_size, board_card_size)
         
-        # Draw rounded card
-        pygame.draw.rect(self.screen, self.colors['card_bg'], board_card_rect, border_radius=30)
-        
         # Game board
         board_size = 300
         board_x = board_card_x + (board_card_size - board_size) // 2
         board_y = board_card_y + (board_card_size - board_size) // 2
         cell_size = board_size // 3
         
-        # Grid lines
-        for i in range(1, 3):
-            # Vertical lines
-            x = board_x + i * cell_size
-            pygame.draw.line(self.screen, self.colors['border_light'], (x, board_y), (x, board_y + board_size), 3)
-            # Horizontal lines
-            y = board_y + i * cell_size
-            pygame.draw.line(self.screen, self.colors['border_light'], (board_x, y), (board_x + board_size, y), 3)
+        # Card and grid lines come from the cached board layer
+        layer_key = (board_card_rect.size, self.colors['card_bg'], self.colors['border_light'],
+                     self.colors['accent_red'], self.colors['accent_blue'])
+        if layer_key != self.board_layer_key:
+            self.build_board_layer(board_card_size, board_size, cell_size)
+            self.board_layer_key = layer_key
+        self.screen.blit(self.board_layer, board_card_rect)
         
         # Draw X's and O's
         for i in range(9):
             row = i // 3
             col = i % 3
-            x = board_x + col * cell_size + cell_size // 2
-            y = board_y + row * cell_size + cell_size // 2
-            
             cell_rect = pygame.Rect(board_x + col * cell_size, board_y + row * cell_size, cell_size, cell_size)
             is_hovered = cell_rect.collidepoint(mouse_pos) and self.board[i] == ''
             
@@ -177,16 +193,8 @@ class TicTacToeGame:
                 # Hover preview with rounded corners
                 pygame.draw.rect(self.screen, (240, 240, 240), cell_rect, border_radius=15)
             
-            if self.board[i] == 'X':
-                # Draw X
-                offset = 30
-                pygame.draw.line(self.screen, self.colors['accent_red'], 
-                               (x - offset, y - offset), (x + offset, y + offset), 6)
-                pygame.draw.line(self.screen, self.colors['accent_red'], 
-                               (x + offset, y - offset), (x - offset, y + offset), 6)
-            elif self.board[i] == 'O':
-                # Draw O
-                pygame.draw.circle(self.screen, self.colors['accent_blue'], (x, y), 30, 6)
+            if self.board[i]:
+                self.screen.blit(self.piece_sprites[self.board[i]], cell_rect)
         
         # Game status
         status_y = board_card_y + board_card_size + 30
@@ -205,7 +213,7 @@ class TicTacToeGame:
                 status = "Your turn - Click a cell"
                 status_color = self.colors['text_white']
         
-        status_surface = subheading_font.render(status, True, status_color)
+        status_surface = render_text(subheading_font, status, status_color)
         status_rect = status_surface.get_rect(centerx=self.screen.get_width() // 2, y=status_y)
         self.screen.blit(status_surface, status_rect)
         
@@ -216,12 +224,10 @@ class TicTacToeGame:
         reset_color = self.colors['button_hover'] if reset_hovered else self.colors['button_primary']
         pygame.draw.rect(self.screen, reset_color, reset_button, border_radius=25)
         
-        reset_text = body_font.render("Reset", True, self.colors['text_white'])
+        reset_text = render_text(body_font, "Reset", self.colors['text_white'])
         reset_text_rect = reset_text.get_rect(center=reset_button.center)
         self.screen.blit(reset_text, reset_text_rect)
         
         self.reset_button = reset_button
         self.board_rect = pygame.Rect(board_x, board_y, board_size, board_size)
         self.cell_size = cell_size
-
-print("TicTacToe module loaded successfully!")
\ No newline at end of file